@@ -4,11 +4,18 @@ import numpy as np
 import time
 from datetime import datetime
 from utils.data_processor import DataProcessor
+from utils.csv_ingestion import load_csv_in_chunks
+from utils.schema import SchemaCoercer
+from utils.processed_cache import ProcessedDataCache
+from utils.incremental_ingestion import IncrementalIngestor
+from utils.dataset_store import get_dataset_store
 from components.vigilancia_tab import VigilanciaTab
 from components.control_larvario_tab import ControlLarvarioTab
 from components.cerco_tab import CercoTab
 from components.inspector_tab import InspectorTab
 from components.housing_management import HousingManagement
+from components.lazy_tabs import render_lazy_tabs, keep_widget_state
+from components.filters import FILTER_KEY_PREFIXES
 
 # Page configuration
 st.set_page_config(
@@ -22,10 +29,11 @@ st.set_page_config(
 st.session_state.max_upload_size = 200 * 1024 * 1024  # 200MB
 
 # Initialize session state
-if 'data' not in st.session_state:
-    st.session_state.data = None
-if 'data_processor' not in st.session_state:
-    st.session_state.data_processor = None
+# La sesión solo guarda un handle al dataset compartido del proceso (y sus filtros en los widgets)
+if 'dataset_handle' not in st.session_state:
+    st.session_state.dataset_handle = None
+if 'dataset_file_id' not in st.session_state:
+    st.session_state.dataset_file_id = None
 if 'app_start_time' not in st.session_state:
     st.session_state.app_start_time = datetime.now()
 
@@ -495,6 +503,9 @@ def main():
     st.title("📊 Sistema de Vigilancia Epidemiológica")
     st.markdown("---")
     
+    # Datasets procesados compartidos por todas las sesiones del servidor
+    dataset_store = get_dataset_store()
+    
     # Sidebar for file upload
     with st.sidebar:
         st.markdown("---")
@@ -507,6 +518,12 @@ def main():
                 "- Tamaño máximo: 200MB\n"
                 "- Registros: Hasta 150,000+")
         
+        incremental_mode = st.checkbox(
+            "🔁 Ingesta incremental",
+            value=False,
+            help="Para exportaciones acumulativas: solo se procesan los registros nuevos o modificados respecto a la última carga"
+        )
+        
         uploaded_file = st.file_uploader(
             "Seleccione o arrastre el archivo CSV",
             type=['csv'],
@@ -524,66 +541,124 @@ def main():
                 return
                 
             try:
-                with st.spinner("🔄 Procesando archivo... Esto puede tomar unos minutos para archivos grandes."):
-                    # Múltiples intentos con diferentes codificaciones para compatibilidad de despliegue
-                    data = None
-                    encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'iso-8859-1']
-                    successful_encoding = None
-                    
-                    for encoding in encodings:
-                        try:
-                            # Reset file pointer for each attempt
-                            uploaded_file.seek(0)
-                            
-                            # Load data with optimizations for large files
-                            data = pd.read_csv(
-                                uploaded_file, 
-                                encoding=encoding,
-                                low_memory=False,
-                                skipinitialspace=True,  # Skip spaces after delimiter
-                                na_values=['', 'NA', 'N/A', 'null', 'NULL', 'NaN'],  # Handle missing values
-                                keep_default_na=True
-                            )
-                            
-                            # If successful, store the encoding and break the loop
-                            successful_encoding = encoding
-                            break
-                            
-                        except (UnicodeDecodeError, UnicodeError) as e:
-                            # Try next encoding
-                            if encoding == encodings[-1]:  # Last encoding attempt
+                dataset_handle = st.session_state.dataset_handle
+                file_id = getattr(uploaded_file, 'file_id', None) or f"{uploaded_file.name}:{uploaded_file.size}"
+                
+                # Mismo archivo que en el rerun anterior: la sesión ya tiene su handle y no se relee nada
+                if dataset_handle is None or not dataset_handle.active or st.session_state.dataset_file_id != file_id:
+                    with st.spinner("🔄 Procesando archivo... Esto puede tomar unos minutos para archivos grandes."):
+                        # Caché en disco: un archivo idéntico ya procesado se recupera sin releer el CSV
+                        processed_cache = ProcessedDataCache()
+                        cache_key = processed_cache.compute_key(uploaded_file)
+                        
+                        def load_dataset():
+                            """Construye el DataProcessor del archivo (solo si ninguna sesión lo tiene ya cargado)"""
+                            cached_entry = processed_cache.get(cache_key)
+                            ingest_report = None
+
+                            if cached_entry is not None:
+                                cached_data, cache_metadata = cached_entry
+                                data_processor = DataProcessor(cached_data, processed=True, version=cache_key)
+                                return data_processor, {
+                                    'encoding': cache_metadata.get('encoding', 'caché'),
+                                    'schema_report': cache_metadata.get('schema_report'),
+                                    'ingest_report': None,
+                                    'from_cache': True
+                                }
+
+                            # Lectura por bloques: la codificación se detecta una sola vez sobre una muestra
+                            progress_bar = st.progress(0.0, text="📥 Leyendo archivo...")
+
+                            def update_progress(bytes_read, total_bytes, rows_read):
+                                progress_bar.progress(
+                                    min(bytes_read / total_bytes, 1.0),
+                                    text=f"📥 Leyendo archivo... {rows_read:,} registros"
+                                )
+
+                            # Tipos compactos declarados en el esquema, aplicados bloque a bloque
+                            schema_coercer = SchemaCoercer()
+
+                            try:
+                                raw_data, successful_encoding = load_csv_in_chunks(
+                                    uploaded_file,
+                                    progress_callback=update_progress,
+                                    chunk_transform=schema_coercer.coerce
+                                )
+                            except (UnicodeDecodeError, UnicodeError) as e:
                                 st.error(f"❌ Error de codificación: {str(e)}")
                                 st.info("💡 Intenta guardar tu archivo CSV con codificación UTF-8")
-                                return
-                            continue
-                        except Exception as e:
-                            # Other errors, show them but try next encoding
-                            if encoding == encodings[-1]:  # Last encoding attempt
+                                return None
+                            except Exception as e:
                                 st.error(f"❌ Error al procesar archivo: {str(e)}")
-                                return
-                            continue
-                    
-                    # Validate that we got data
-                    if data is None or data.empty:
-                        st.error("❌ No se pudo cargar el archivo o está vacío")
-                        return
-                    
-                    # Additional validation for epidemiological data structure
-                    if len(data.columns) < 90:  # Should have 91 columns
-                        st.warning(f"⚠️ El archivo tiene {len(data.columns)} columnas, se esperaban 91. Continuando con los datos disponibles...")
-                    
-                    st.session_state.data_processor = DataProcessor(data)
-                    st.session_state.data = data
-                    
-                    # Detectar establecimientos con viviendas faltantes
-                    housing_mgmt = HousingManagement()
-                    missing_facilities = housing_mgmt.detect_missing_facilities(data)
-                    
-                    if missing_facilities:
-                        # Mostrar diálogo para establecimientos faltantes
-                        housing_mgmt.show_missing_facilities_dialog(missing_facilities)
+                                return None
+                            finally:
+                                progress_bar.empty()
+
+                            # Validate that we got data
+                            if raw_data is None or raw_data.empty:
+                                st.error("❌ No se pudo cargar el archivo o está vacío")
+                                return None
+
+                            schema_report = schema_coercer.report
+                            if incremental_mode:
+                                # Solo el delta respecto al dataset base pasa por process_data
+                                processed_data, ingest_report = IncrementalIngestor().ingest(raw_data, uploaded_file.name)
+                                data_processor = DataProcessor(processed_data, processed=True, version=cache_key)
+                                del processed_data
+                            else:
+                                data_processor = DataProcessor(raw_data, version=cache_key)
+                            del raw_data
+
+                            processed_cache.put(cache_key, data_processor.data, {
+                                'file_name': uploaded_file.name,
+                                'encoding': successful_encoding,
+                                'schema_report': schema_report
+                            })
+                            return data_processor, {
+                                'encoding': successful_encoding,
+                                'schema_report': schema_report,
+                                'ingest_report': ingest_report,
+                                'from_cache': False
+                            }
+
+                        # Un único DataProcessor por contenido de archivo en todo el proceso
+                        new_handle = dataset_store.acquire(cache_key, load_dataset)
+                        if new_handle is None:
+                            return
+                        
+                        # Soltar el dataset anterior de la sesión (se libera si nadie más lo usa)
+                        if dataset_handle is not None:
+                            dataset_handle.release()
+                        st.session_state.dataset_handle = dataset_handle = new_handle
+                        st.session_state.dataset_file_id = file_id
+
+                data_processor = dataset_handle.processor
+                dataset_info = dataset_handle.info
+                data = data_processor.data
+
+                # Additional validation for epidemiological data structure
+                if len(data.columns) < 90:  # Should have 91 columns
+                    st.warning(f"⚠️ El archivo tiene {len(data.columns)} columnas, se esperaban 91. Continuando con los datos disponibles...")
+                
+                # Detectar establecimientos con viviendas faltantes
+                housing_mgmt = HousingManagement()
+                missing_facilities = housing_mgmt.detect_missing_facilities(data)
+                
+                if missing_facilities:
+                    # Mostrar diálogo para establecimientos faltantes
+                    housing_mgmt.show_missing_facilities_dialog(missing_facilities)
                     
-                st.success(f"✅ Archivo cargado exitosamente! (codificación: {successful_encoding})")
+                st.success(f"✅ Archivo cargado exitosamente! (codificación: {dataset_info.get('encoding')})")
+                if dataset_info.get('from_cache'):
+                    st.caption("⚡ Datos recuperados de la caché local (archivo ya procesado)")
+                shared_sessions = dataset_store.get_refcount(dataset_handle.key)
+                if shared_sessions > 1:
+                    st.caption(f"👥 Dataset compartido en memoria con {shared_sessions - 1} sesión(es) más")
+                calculation_stats = data_processor.calculation_cache.get_stats()
+                if calculation_stats['hits'] + calculation_stats['misses'] > 0:
+                    st.caption(f"🧮 Cálculos en caché: {calculation_stats['entries']} "
+                               f"({calculation_stats['hits']:,} aciertos / {calculation_stats['misses']:,} fallos, "
+                               f"{calculation_stats['hit_rate']:.0f}%)")
                 st.metric("📈 Registros", f"{len(data):,}")
                 st.metric("📋 Columnas", f"{len(data.columns)}")
                 
@@ -594,6 +669,40 @@ def main():
                     for activity, count in activity_types.items():
                         st.write(f"- {activity}: {count:,} registros")
                 
+                # Show incremental ingestion report
+                ingest_report = dataset_info.get('ingest_report')
+                if ingest_report:
+                    with st.expander("🔁 Ingesta Incremental"):
+                        if ingest_report['mode'] == 'incremental':
+                            st.write(f"- Nuevos: {ingest_report['new']:,}")
+                            st.write(f"- Modificados: {ingest_report['changed']:,}")
+                            st.write(f"- Retirados: {ingest_report['removed']:,}")
+                            st.write(f"- Sin cambios: {ingest_report['unchanged']:,}")
+                        else:
+                            st.write(f"Procesamiento completo: {ingest_report['reason']}")
+                        
+                        # Agregados mantenidos incrementalmente (sin recorrer el dataset completo)
+                        base_summary = IncrementalIngestor().get_summary()
+                        if not base_summary.empty:
+                            activity_summary = base_summary.groupby('tipoActividadInspeccion', observed=True)[
+                                ['registros', 'viviendas_inspeccionadas', 'viviendas_positivas']
+                            ].sum()
+                            st.dataframe(activity_summary, use_container_width=True)
+                
+                # Show schema coercion report
+                schema_report = dataset_info.get('schema_report')
+                if schema_report:
+                    with st.expander(f"🧬 Esquema de Datos (v{schema_report['version']})"):
+                        st.write(f"**Columnas compactadas:** {len(schema_report['coerced'])}")
+                        for col, change in schema_report['coerced'].items():
+                            st.write(f"- {col}: {change}")
+                        if schema_report['skipped']:
+                            st.write("**Columnas sin convertir:**")
+                            for col, reason in schema_report['skipped'].items():
+                                st.write(f"- {col}: {reason}")
+                        if schema_report['missing']:
+                            st.write(f"**Columnas faltantes:** {', '.join(schema_report['missing'])}")
+                
             except Exception as e:
                 st.error(f"❌ Error al cargar el archivo: {str(e)}")
                 st.info("💡 **Posibles soluciones:**\n"
@@ -603,31 +712,24 @@ def main():
                 return
     
     # Main content area
-    if st.session_state.data is not None:
-        # Create tabs
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["🔍 Vigilancia", "🦟 Control Larvario", "🔒 Cerco", "👤 Inspectores", "🏠 Gestión Viviendas"])
-        
-        with tab1:
-            vigilancia_tab = VigilanciaTab(st.session_state.data_processor)
-            vigilancia_tab.render()
-        
-        with tab2:
-            control_larvario_tab = ControlLarvarioTab(st.session_state.data_processor)
-            control_larvario_tab.render()
+    if st.session_state.dataset_handle is not None:
+        data_processor = st.session_state.dataset_handle.processor
         
-        with tab3:
-            cerco_tab = CercoTab(st.session_state.data_processor)
-            cerco_tab.render()
+        # Only the selected tab computes its content on each rerun
+        keep_widget_state(FILTER_KEY_PREFIXES + ("inspector_select",))
         
-        with tab4:
+        def render_inspector_tab():
             from utils.calculations import EpidemiologicalCalculations
-            calculations = EpidemiologicalCalculations(st.session_state.data_processor)
-            inspector_tab = InspectorTab(st.session_state.data_processor, calculations)
-            inspector_tab.render()
+            calculations = EpidemiologicalCalculations(data_processor)
+            InspectorTab(data_processor, calculations).render()
         
-        with tab5:
-            housing_mgmt = HousingManagement()
-            housing_mgmt.show_housing_management_interface()
+        render_lazy_tabs([
+            ("🔍 Vigilancia", lambda: VigilanciaTab(data_processor).render()),
+            ("🦟 Control Larvario", lambda: ControlLarvarioTab(data_processor).render()),
+            ("🔒 Cerco", lambda: CercoTab(data_processor).render()),
+            ("👤 Inspectores", render_inspector_tab),
+            ("🏠 Gestión Viviendas", lambda: HousingManagement().show_housing_management_interface())
+        ], key="main_tab")
     else:
         # Welcome screen
         st.markdown("""
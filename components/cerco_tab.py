@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
 from components.filters import FilterComponent
+from components.lazy_tabs import render_lazy_tabs
+from components.report_jobs import submit_presentation_job, render_presentation_job
 from utils.calculations import EpidemiologicalCalculations
+from utils.calculation_cache import memoized
+from utils.cerco_analytics import CERCO_RADIUS_M, summarize_cerco, summarize_positive_surroundings
 from utils.visualizations import VisualizationHelper
 from utils.powerpoint_generator import PowerPointGenerator
 import plotly.express as px
@@ -23,12 +27,13 @@ class CercoTab:
         # Render filters
         filters = self.filter_component.render_filters('cerco')
         
-        # Get filtered data for cerco activity
+        # Get filtered data for cerco activity (date range included, via the processor's sorted date index)
         filtered_data = self.data_processor.get_filtered_data('cerco', filters)
         
-        # Apply date range filter if present
-        if 'date_range' in filters:
-            filtered_data = self.filter_component.apply_date_filter(filtered_data, filters['date_range'])
+        # Aggregation cube cells for the same selection: additive metrics are rolled up
+        # from them, row-level views keep using filtered_data
+        cube_cells = self.data_processor.get_cube_cells('cerco', filters)
+        aggregate_data = cube_cells if cube_cells is not None else filtered_data
         
         # Show data summary
         st.markdown("---")
@@ -37,17 +42,24 @@ class CercoTab:
         with col1:
             st.metric("📊 Total Registros", f"{len(filtered_data):,}")
         
-        with col2:
+        if cube_cells is not None:
+            totals = self.data_processor.cube.totals(cube_cells)
+            houses_cerco = int(totals[['viviendas_inspeccionadas', 'viviendas_cerradas',
+                                       'viviendas_renuentes', 'viviendas_deshabitadas']].sum())
+            positive_cerco = int(totals['viviendas_positivas'])
+        else:
             # Calculate houses under cerco intervention
             houses_cerco = len(filtered_data[filtered_data['atencion_vivienda_indicador'].isin([1, 2, 3, 4])])
-            st.metric("🏠 Viviendas en Cerco", f"{houses_cerco:,}")
-        
-        with col3:
             # Calculate positive detections in cerco
             positive_cerco = len(filtered_data[
                 (filtered_data['viv_positiva'] == 1) & 
                 (filtered_data['atencion_vivienda_indicador'] == 1)
             ])
+        
+        with col2:
+            st.metric("🏠 Viviendas en Cerco", f"{houses_cerco:,}")
+        
+        with col3:
             st.metric("⚠️ Detecciones Positivas", f"{positive_cerco:,}")
         
         with col4:
@@ -68,34 +80,18 @@ class CercoTab:
         with col_ppt2:
             if st.button("📄 Generar PPT", key="cerco_ppt", help="Generar presentación PowerPoint organizada por redes de salud"):
                 self.generate_powerpoint_presentation(filtered_data)
+        render_presentation_job(key="cerco_ppt", filename_prefix="reporte_cerco")
         
         # Create tabs for different visualizations
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-            "📊 Cobertura de Viviendas",
-            "📦 Análisis de Recipientes",
-            "🧪 Consumo Larvicida",
-            "🤒 Casos Febriles",
-            "📈 Tendencias",
-            "📊 Índice Aédico Mensual"
-        ])
-        
-        with tab1:
-            self.render_coverage_analysis_tab(filtered_data)
-        
-        with tab2:
-            self.render_container_analysis_tab(filtered_data)
-        
-        with tab3:
-            self.render_larvicide_analysis_tab(filtered_data)
-        
-        with tab4:
-            self.render_febril_cases_tab(filtered_data)
-        
-        with tab5:
-            self.render_trends_tab(filtered_data)
-        
-        with tab6:
-            self.render_monthly_aedic_analysis_tab(filtered_data)
+        render_lazy_tabs([
+            ("📊 Cobertura de Viviendas", lambda: self.render_coverage_analysis_tab(aggregate_data)),
+            ("📦 Análisis de Recipientes", lambda: self.render_container_analysis_tab(aggregate_data)),
+            ("🧪 Consumo Larvicida", lambda: self.render_larvicide_analysis_tab(aggregate_data)),
+            ("🤒 Casos Febriles", lambda: self.render_febril_cases_tab(aggregate_data)),
+            ("📈 Tendencias", lambda: self.render_trends_tab(aggregate_data)),
+            ("📍 Alrededor de Positivas", lambda: self.render_positive_surroundings_tab(filtered_data)),
+            ("📊 Índice Aédico Mensual", lambda: self.render_monthly_aedic_analysis_tab(filtered_data))
+        ], key="cerco_subtab")
     
     def render_coverage_analysis_tab(self, filtered_data):
         st.subheader("📊 Análisis de Cobertura de Viviendas - Cerco")
@@ -371,6 +367,48 @@ class CercoTab:
         else:
             st.info("No hay datos de casos febriles disponibles.")
 
+    def render_positive_surroundings_tab(self, filtered_data):
+        st.subheader(f"📍 Viviendas a menos de {CERCO_RADIUS_M} m de cada Vivienda Positiva - Cerco")
+        
+        # Batched radius join over the spatial index (rows of the current selection only)
+        surroundings = self.calculate_houses_around_positives(filtered_data)
+        
+        if surroundings.empty:
+            st.info("No hay viviendas positivas georreferenciadas en la selección.")
+            return
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("⚠️ Positivas Georreferenciadas", f"{len(surroundings):,}")
+        with col2:
+            st.metric("🏠 Promedio de Viviendas en el Radio", f"{surroundings['viviendas_en_radio'].mean():.1f}")
+        with col3:
+            clustered = int((surroundings['positivas_en_radio'] > 0).sum())
+            st.metric("🔴 Positivas con otra Positiva Cercana", f"{clustered:,}")
+        
+        # Location of each positive house for the table
+        table = surroundings.drop(columns=['posicion'])
+        if 'codigo_manzana' in self.data_processor.data.columns:
+            table.insert(1, 'codigo_manzana', self.data_processor.data['codigo_manzana'].to_numpy()[surroundings['posicion'].to_numpy()])
+        if 'fecha_inspeccion' in self.data_processor.data.columns:
+            table.insert(1, 'fecha_inspeccion', self.data_processor.data['fecha_inspeccion'].to_numpy()[surroundings['posicion'].to_numpy()])
+        table = table.sort_values('positivas_en_radio', ascending=False, kind='stable')
+        
+        st.dataframe(
+            table,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'localidad_eess': 'Establecimiento',
+                'fecha_inspeccion': 'Fecha de Inspección',
+                'codigo_manzana': 'Manzana',
+                'viviendas_en_radio': 'Viviendas en el Radio',
+                'inspeccionadas_en_radio': 'Inspeccionadas en el Radio',
+                'positivas_en_radio': 'Positivas en el Radio'
+            }
+        )
+        create_excel_download_button(table, "cerco_alrededor_positivas", key_suffix="cerco")
+
     def render_trends_tab(self, filtered_data):
         st.subheader("📈 Tendencias de Cerco")
         
@@ -695,97 +733,28 @@ class CercoTab:
                 
                 st.plotly_chart(fig, use_container_width=True)
     
+    @memoized
+    def calculate_cerco_analytics(self, data):
+        """Effectiveness, geographic coverage, intervention density and monthly trends from one grouped pass"""
+        return summarize_cerco(data)
+    
+    @memoized
+    def calculate_houses_around_positives(self, data, radius_m=CERCO_RADIUS_M):
+        """Houses of the selection within radius_m metres of each positive house (spatial index join)"""
+        pairs = self.data_processor.get_houses_around_positives(data, radius_m)
+        return summarize_positive_surroundings(self.data_processor.data, pairs)
+    
     def calculate_cerco_effectiveness(self, data):
         """Calculate cerco effectiveness by facility"""
-        if data.empty:
-            return pd.DataFrame()
-        
-        effectiveness_data = []
-        
-        for facility in data['localidad_eess'].unique():
-            facility_data = data[data['localidad_eess'] == facility]
-            
-            # Get RENIPRESS code
-            renipress_code = facility_data['cod_renipress'].iloc[0] if len(facility_data) > 0 else 0
-            
-            # Calculate metrics
-            total_houses = len(facility_data[facility_data['atencion_vivienda_indicador'].isin([1, 2, 3, 4])])
-            positive_houses = len(facility_data[
-                (facility_data['viv_positiva'] == 1) & 
-                (facility_data['atencion_vivienda_indicador'] == 1)
-            ])
-            
-            # Calculate effectiveness (higher is better)
-            effectiveness = ((total_houses - positive_houses) / total_houses * 100) if total_houses > 0 else 0
-            
-            # Calculate intervention score
-            intervention_score = min(10, (total_houses / max(1, positive_houses)) * 2)
-            
-            effectiveness_data.append({
-                'cod_renipress': renipress_code,
-                'localidad_eess': facility,
-                'total_houses': total_houses,
-                'positive_houses': positive_houses,
-                'effectiveness_percentage': effectiveness,
-                'intervention_score': intervention_score
-            })
-        
-        return pd.DataFrame(effectiveness_data)
+        return self.calculate_cerco_analytics(data)[0]
     
     def calculate_geographic_coverage(self, data):
         """Calculate geographic coverage statistics"""
-        coverage = {}
-        
-        if 'departamento_x' in data.columns:
-            for dept in data['departamento_x'].unique():
-                dept_data = data[data['departamento_x'] == dept]
-                
-                facilities = dept_data['localidad_eess'].nunique()
-                houses = len(dept_data[dept_data['atencion_vivienda_indicador'].isin([1, 2, 3, 4])])
-                positive = len(dept_data[
-                    (dept_data['viv_positiva'] == 1) & 
-                    (dept_data['atencion_vivienda_indicador'] == 1)
-                ])
-                
-                effectiveness = ((houses - positive) / houses * 100) if houses > 0 else 0
-                
-                coverage[dept] = {
-                    'facilities': facilities,
-                    'houses': houses,
-                    'effectiveness': effectiveness
-                }
-        
-        return coverage
+        return self.calculate_cerco_analytics(data)[1]
     
     def calculate_intervention_density(self, data):
         """Calculate intervention density metrics"""
-        if data.empty:
-            return pd.DataFrame()
-        
-        density_data = []
-        
-        for facility in data['localidad_eess'].unique():
-            facility_data = data[data['localidad_eess'] == facility]
-            
-            # Calculate density (interventions per area unit - simplified)
-            total_houses = len(facility_data[facility_data['atencion_vivienda_indicador'].isin([1, 2, 3, 4])])
-            positive_houses = len(facility_data[
-                (facility_data['viv_positiva'] == 1) & 
-                (facility_data['atencion_vivienda_indicador'] == 1)
-            ])
-            
-            # Simplified density calculation
-            intervention_density = total_houses / max(1, len(facility_data.groupby('codigo_manzana')))
-            effectiveness = ((total_houses - positive_houses) / total_houses * 100) if total_houses > 0 else 0
-            
-            density_data.append({
-                'localidad_eess': facility,
-                'intervention_density': intervention_density,
-                'effectiveness': effectiveness,
-                'total_houses': total_houses
-            })
-        
-        return pd.DataFrame(density_data)
+        return self.calculate_cerco_analytics(data)[2]
     
     def calculate_cerco_indicators(self, data):
         """Calculate cerco-specific indicators"""
@@ -833,35 +802,7 @@ class CercoTab:
         if 'fecha_inspeccion' not in data.columns:
             return pd.DataFrame()
         
-        data['month_year'] = data['fecha_inspeccion'].dt.to_period('M')
-        
-        monthly_data = []
-        
-        for period in data['month_year'].unique():
-            period_data = data[data['month_year'] == period]
-            
-            detections = len(period_data[
-                (period_data['viv_positiva'] == 1) & 
-                (period_data['atencion_vivienda_indicador'] == 1)
-            ])
-            
-            total_houses = len(period_data[period_data['atencion_vivienda_indicador'].isin([1, 2, 3, 4])])
-            effectiveness = ((total_houses - detections) / total_houses * 100) if total_houses > 0 else 0
-            
-            coverage = (total_houses / len(period_data) * 100) if len(period_data) > 0 else 0
-            
-            # Simplified response time calculation
-            response_time = 5.0  # Placeholder value
-            
-            monthly_data.append({
-                'month_year': str(period),
-                'detections': detections,
-                'effectiveness': effectiveness,
-                'coverage': coverage,
-                'response_time': response_time
-            })
-        
-        return pd.DataFrame(monthly_data)
+        return self.calculate_cerco_analytics(data)[3]
     
     def calculate_recovery_metrics(self, data):
         """Calculate recovery metrics"""
@@ -924,57 +865,8 @@ class CercoTab:
         return summary
     
     def generate_powerpoint_presentation(self, filtered_data):
-        """Genera presentación PowerPoint con datos organizados por redes de salud"""
-        try:
-            with st.spinner("🔄 Generando presentación PowerPoint..."):
-                # Generar presentación
-                presentation = self.ppt_generator.generate_presentation(filtered_data)
-                
-                # Guardar presentación
-                filename = self.ppt_generator.save_presentation(presentation)
-                
-                st.success(f"✅ Presentación generada exitosamente: {filename}")
-                
-                # Leer archivo para descarga automática
-                with open(filename, "rb") as file:
-                    file_data = file.read()
-                
-                # Generar nombre de archivo para descarga
-                from datetime import datetime
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                download_filename = f"reporte_cerco_{timestamp}.pptx"
-                
-                # Botón de descarga automática
-                st.download_button(
-                    label="📥 Descargar Presentación PowerPoint",
-                    data=file_data,
-                    file_name=download_filename,
-                    mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                    key="download_ppt_cerco",
-                    help="Hacer clic para descargar automáticamente la presentación"
-                )
-                
-                # Información adicional
-                st.info(f"""
-                📄 **Presentación PowerPoint creada**
-                
-                **Contenido incluido:**
-                - 📋 Diapositiva de título con resumen general
-                - 📊 Resumen estadístico del sistema
-                - 🌐 Análisis por cada red de salud:
-                  * RED UTCUBAMBA
-                  * RED BAGUA  
-                  * RED CONDORCANQUI
-                  * RED CHACHAPOYAS
-                - 🏥 Detalle por establecimientos de salud
-                - 📈 Métricas de cobertura y eficiencia
-                
-                **Archivo guardado en:** `{filename}`
-                **Haz clic en el botón de arriba para descargar automáticamente**
-                """)
-                
-        except Exception as e:
-            st.error(f"❌ Error al generar presentación: {str(e)}")
+        """Queue the PowerPoint presentation organized by health network in the background job runner"""
+        submit_presentation_job(self.ppt_generator, filtered_data, key="cerco_ppt")
     
     def render_monthly_aedic_analysis_tab(self, filtered_data):
         """Renderiza análisis de índice aédico mensual por establecimiento"""
@@ -991,7 +883,7 @@ class CercoTab:
         
         try:
             # Preparar datos para análisis mensual
-            monthly_data = self._prepare_monthly_aedic_data(filtered_data)
+            monthly_data = self.calculations.calculate_monthly_aedic_by_facility(filtered_data)
             
             if monthly_data.empty:
                 st.warning("⚠️ No se pudieron calcular índices aédicos mensuales")
@@ -1062,61 +954,3 @@ class CercoTab:
             
         except Exception as e:
             st.error(f"❌ Error en el análisis mensual: {str(e)}")
-    
-    def _prepare_monthly_aedic_data(self, filtered_data):
-        """Prepara datos para análisis de índice aédico mensual"""
-        try:
-            # Filtrar solo datos con fecha válida
-            data_with_date = filtered_data.dropna(subset=['fecha_inspeccion'])
-            
-            if data_with_date.empty:
-                return pd.DataFrame()
-            
-            # Crear columna de mes-año
-            data_with_date = data_with_date.copy()
-            data_with_date['mes_year'] = data_with_date['fecha_inspeccion'].dt.to_period('M').astype(str)
-            
-            # Obtener nombres de establecimientos
-            establishment_names = {}
-            for est_id, info in self.data_processor.health_facilities.items():
-                establishment_names[est_id] = info['name']
-            
-            # Agrupar por establecimiento y mes
-            monthly_aedic = []
-            
-            for establecimiento_id in data_with_date['cod_renipress'].unique():
-                establecimiento_nombre = establishment_names.get(establecimiento_id, f"Establecimiento {establecimiento_id}")
-                
-                est_data = data_with_date[data_with_date['cod_renipress'] == establecimiento_id]
-                
-                # Agrupar por mes
-                monthly_groups = est_data.groupby('mes_year')
-                
-                for mes, mes_data in monthly_groups:
-                    # Calcular viviendas inspeccionadas y positivas
-                    viviendas_inspeccionadas = len(mes_data[mes_data['atencion_vivienda_indicador'] == 1])
-                    viviendas_positivas = len(mes_data[
-                        (mes_data['atencion_vivienda_indicador'] == 1) & 
-                        (mes_data['viv_positiva'] == 1)
-                    ])
-                    
-                    # Calcular índice aédico
-                    if viviendas_inspeccionadas > 0:
-                        indice_aedico = (viviendas_positivas / viviendas_inspeccionadas) * 100
-                    else:
-                        indice_aedico = 0
-                    
-                    monthly_aedic.append({
-                        'establecimiento_id': establecimiento_id,
-                        'establecimiento': establecimiento_nombre,
-                        'mes_year': mes,
-                        'viviendas_inspeccionadas': viviendas_inspeccionadas,
-                        'viviendas_positivas': viviendas_positivas,
-                        'indice_aedico': indice_aedico
-                    })
-            
-            return pd.DataFrame(monthly_aedic)
-            
-        except Exception as e:
-            st.error(f"Error preparando datos mensuales: {str(e)}")
-            return pd.DataFrame()
@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
 from components.filters import FilterComponent
+from components.lazy_tabs import render_lazy_tabs
+from components.report_jobs import submit_presentation_job, render_presentation_job
 from utils.calculations import EpidemiologicalCalculations
+from utils.calculation_cache import memoized
+from utils.larval_control import summarize_larval_control
 from utils.visualizations import VisualizationHelper
 from utils.powerpoint_generator import PowerPointGenerator
 import plotly.express as px
@@ -23,12 +27,13 @@ class ControlLarvarioTab:
         # Render filters
         filters = self.filter_component.render_filters('control larvario')
         
-        # Get filtered data for control larvario activity
+        # Get filtered data for control larvario activity (date range included, via the processor's sorted date index)
         filtered_data = self.data_processor.get_filtered_data('control larvario', filters)
         
-        # Apply date range filter if present
-        if 'date_range' in filters:
-            filtered_data = self.filter_component.apply_date_filter(filtered_data, filters['date_range'])
+        # Aggregation cube cells for the same selection: additive metrics are rolled up
+        # from them, row-level views keep using filtered_data
+        cube_cells = self.data_processor.get_cube_cells('control larvario', filters)
+        aggregate_data = cube_cells if cube_cells is not None else filtered_data
         
         # Show data summary
         st.markdown("---")
@@ -38,12 +43,12 @@ class ControlLarvarioTab:
             st.metric("🏠 Total Viviendas", f"{len(filtered_data):,}")
         
         with col2:
-            total_larvicide = filtered_data['consumo_larvicida'].sum() if 'consumo_larvicida' in filtered_data.columns else 0
+            total_larvicide = aggregate_data['consumo_larvicida'].sum() if 'consumo_larvicida' in aggregate_data.columns else 0
             st.metric("🧪 Consumo Total Larvicida", f"{total_larvicide:.2f} g")
         
         with col3:
             # Calculate inspected and positive containers
-            containers_stats = self.calculate_container_statistics(filtered_data)
+            containers_stats = self.calculate_container_statistics(aggregate_data)
             inspected_containers = containers_stats.get('inspected', 0)
             positive_containers = containers_stats.get('positive', 0)
             st.metric("🔍 Recipientes Inspeccionados", f"{inspected_containers:,}")
@@ -55,16 +60,16 @@ class ControlLarvarioTab:
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            treated_containers = self.calculate_treated_containers(filtered_data)
+            treated_containers = self.calculate_treated_containers(aggregate_data)
             st.metric("📦 Recipientes Tratados", f"{treated_containers:,}")
         
         with col2:
-            facilities = filtered_data['localidad_eess'].nunique() if 'localidad_eess' in filtered_data.columns else 0
+            facilities = aggregate_data['localidad_eess'].nunique() if 'localidad_eess' in aggregate_data.columns else 0
             st.metric("🏥 Establecimientos", facilities)
         
         with col3:
             # Container frequency by type - show most common type
-            container_frequency = self.get_container_frequency(filtered_data)
+            container_frequency = self.get_container_frequency(aggregate_data)
             if container_frequency:
                 most_common_type, count = container_frequency[0]
                 st.metric("📊 Tipo Más Frecuente", f"{most_common_type}")
@@ -84,49 +89,28 @@ class ControlLarvarioTab:
         with col_ppt2:
             if st.button("📄 Generar PPT", key="control_larvario_ppt", help="Generar presentación PowerPoint organizada por redes de salud"):
                 self.generate_powerpoint_presentation(filtered_data)
+        render_presentation_job(key="control_larvario_ppt", filename_prefix="reporte_control_larvario")
         
         # Create tabs for different visualizations
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-            "📊 Cobertura de Viviendas",
-            "🧪 Análisis Larvicida", 
-            "📦 Tratamiento de Recipientes", 
-            "🤒 Casos Febriles",
-            "📈 Tendencias",
-            "📊 Índice Aédico Mensual"
-        ])
-        
-        with tab1:
-            self.render_coverage_analysis_tab(filtered_data)
-        
-        with tab2:
-            self.render_larvicide_analysis_tab(filtered_data)
-        
-        with tab3:
-            self.render_container_treatment_tab(filtered_data)
-        
-        with tab4:
-            self.render_febril_cases_tab(filtered_data)
-        
-        with tab5:
-            self.render_trends_tab(filtered_data)
-        
-        with tab6:
-            self.render_monthly_aedic_analysis_tab(filtered_data)
+        render_lazy_tabs([
+            ("📊 Cobertura de Viviendas", lambda: self.render_coverage_analysis_tab(aggregate_data)),
+            ("🧪 Análisis Larvicida", lambda: self.render_larvicide_analysis_tab(aggregate_data)),
+            ("📦 Tratamiento de Recipientes", lambda: self.render_container_treatment_tab(aggregate_data)),
+            ("🤒 Casos Febriles", lambda: self.render_febril_cases_tab(aggregate_data)),
+            ("📈 Tendencias", lambda: self.render_trends_tab(aggregate_data)),
+            ("📊 Índice Aédico Mensual", lambda: self.render_monthly_aedic_analysis_tab(filtered_data))
+        ], key="control_larvario_subtab")
+    
+    @memoized
+    def calculate_larval_control_analytics(self, data):
+        """Facility performance, treatment by container type and treatment totals from one grouped reduction"""
+        return summarize_larval_control(data, self.data_processor.container_matrix,
+                                        self.data_processor.get_container_block(data))
     
     def calculate_treated_containers(self, data):
         """Calculate total number of treated containers (TQ + TF)"""
-        containers = self.data_processor.get_container_columns()
-        total_treated = 0
-        
-        for container_type, columns in containers.items():
-            tq_columns = [col for col in columns if col.endswith('_TQ')]
-            tf_columns = [col for col in columns if col.endswith('_TF')]
-            
-            for col in tq_columns + tf_columns:
-                if col in data.columns:
-                    total_treated += data[col].sum()
-        
-        return int(total_treated)
+        treatment_stats = self.calculate_treatment_statistics(data)
+        return treatment_stats['chemical'] + treatment_stats['physical']
     
     def render_coverage_analysis_tab(self, filtered_data):
         st.subheader("📊 Análisis de Cobertura de Viviendas")
@@ -554,73 +538,18 @@ class ControlLarvarioTab:
     
     def calculate_treatment_statistics(self, data):
         """Calculate treatment statistics"""
-        containers = self.data_processor.get_container_columns()
-        
-        chemical_treatment = 0
-        physical_treatment = 0
-        
-        for container_type, columns in containers.items():
-            for col in columns:
-                if col in data.columns:
-                    if col.endswith('_TQ'):
-                        chemical_treatment += data[col].sum()
-                    elif col.endswith('_TF'):
-                        physical_treatment += data[col].sum()
-        
-        return {
-            'chemical': int(chemical_treatment),
-            'physical': int(physical_treatment)
-        }
+        return self.calculate_larval_control_analytics(data)[2]
     
     def calculate_container_type_treatment(self, data):
         """Calculate treatment statistics by container type"""
-        containers = self.data_processor.get_container_columns()
-        results = []
-        
-        for container_type, columns in containers.items():
-            stats = {'container_type': container_type}
-            
-            tq_cols = [col for col in columns if col.endswith('_TQ')]
-            tf_cols = [col for col in columns if col.endswith('_TF')]
-            
-            stats['Tratamiento Químico'] = sum(data[col].sum() for col in tq_cols if col in data.columns)
-            stats['Tratamiento Físico'] = sum(data[col].sum() for col in tf_cols if col in data.columns)
-            
-            results.append(stats)
-        
-        return pd.DataFrame(results)
+        return self.calculate_larval_control_analytics(data)[1]
     
     def calculate_facility_performance(self, data):
         """Calculate performance metrics by facility"""
         if data.empty:
             return pd.DataFrame()
         
-        performance_data = []
-        
-        for facility in data['localidad_eess'].unique():
-            facility_data = data[data['localidad_eess'] == facility]
-            
-            # Get RENIPRESS code
-            renipress_code = facility_data['cod_renipress'].iloc[0] if len(facility_data) > 0 else 0
-            
-            # Calculate metrics
-            total_activities = len(facility_data)
-            larvicide_used = facility_data['consumo_larvicida'].sum() if 'consumo_larvicida' in facility_data.columns else 0
-            containers_treated = self.calculate_treated_containers(facility_data)
-            
-            # Calculate efficiency rating (0-10 scale)
-            efficiency_rating = min(10, (containers_treated / max(1, total_activities)) * 5)
-            
-            performance_data.append({
-                'cod_renipress': renipress_code,
-                'localidad_eess': facility,
-                'total_activities': total_activities,
-                'larvicide_used': larvicide_used,
-                'containers_treated': containers_treated,
-                'efficiency_rating': efficiency_rating
-            })
-        
-        return pd.DataFrame(performance_data)
+        return self.calculate_larval_control_analytics(data)[0]
     
     def calculate_activity_summary(self, data):
         """Calculate summary statistics for activities"""
@@ -650,98 +579,26 @@ class ControlLarvarioTab:
 
     def calculate_container_statistics(self, data):
         """Calculate total inspected and positive containers"""
-        containers = self.data_processor.get_container_columns()
-        
-        total_inspected = 0
-        total_positive = 0
-        
-        for container_type, columns in containers.items():
-            # Count inspected containers (columns ending with _I)
-            inspected_cols = [col for col in columns if col.endswith('_I') and col in data.columns]
-            for col in inspected_cols:
-                total_inspected += data[col].sum()
-            
-            # Count positive containers (columns ending with _P)
-            positive_cols = [col for col in columns if col.endswith('_P') and col in data.columns]
-            for col in positive_cols:
-                total_positive += data[col].sum()
+        totals = self.data_processor.get_container_totals(data)
         
         return {
-            'inspected': int(total_inspected),
-            'positive': int(total_positive)
+            'inspected': int(totals['_I'].sum()),
+            'positive': int(totals['_P'].sum())
         }
 
     def get_container_frequency(self, data):
         """Get container frequency by type, sorted by most common"""
-        containers = self.data_processor.get_container_columns()
-        container_counts = []
-        
-        for container_type, columns in containers.items():
-            # Count all containers for this type (sum all columns)
-            total_count = 0
-            for col in columns:
-                if col in data.columns:
-                    total_count += data[col].sum()
-            
-            if total_count > 0:
-                container_counts.append((container_type, int(total_count)))
+        # All statuses of each container type
+        type_totals = self.data_processor.get_container_totals(data).sum(axis=1)
+        container_counts = [(container_type, int(total)) for container_type, total in type_totals.items() if total > 0]
         
         # Sort by count (descending)
         container_counts.sort(key=lambda x: x[1], reverse=True)
         return container_counts
     
     def generate_powerpoint_presentation(self, filtered_data):
-        """Genera presentación PowerPoint con datos organizados por redes de salud"""
-        try:
-            with st.spinner("🔄 Generando presentación PowerPoint..."):
-                # Generar presentación
-                presentation = self.ppt_generator.generate_presentation(filtered_data)
-                
-                # Guardar presentación
-                filename = self.ppt_generator.save_presentation(presentation)
-                
-                st.success(f"✅ Presentación generada exitosamente: {filename}")
-                
-                # Leer archivo para descarga automática
-                with open(filename, "rb") as file:
-                    file_data = file.read()
-                
-                # Generar nombre de archivo para descarga
-                from datetime import datetime
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                download_filename = f"reporte_control_larvario_{timestamp}.pptx"
-                
-                # Botón de descarga automática
-                st.download_button(
-                    label="📥 Descargar Presentación PowerPoint",
-                    data=file_data,
-                    file_name=download_filename,
-                    mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                    key="download_ppt_control_larvario",
-                    help="Hacer clic para descargar automáticamente la presentación"
-                )
-                
-                # Información adicional
-                st.info(f"""
-                📄 **Presentación PowerPoint creada**
-                
-                **Contenido incluido:**
-                - 📋 Diapositiva de título con resumen general
-                - 📊 Resumen estadístico del sistema
-                - 🌐 Análisis por cada red de salud:
-                  * RED UTCUBAMBA
-                  * RED BAGUA  
-                  * RED CONDORCANQUI
-                  * RED CHACHAPOYAS
-                - 🏥 Detalle por establecimientos de salud
-                - 📈 Métricas de cobertura y eficiencia
-                
-                **Archivo guardado en:** `{filename}`
-                **Haz clic en el botón de arriba para descargar automáticamente**
-                """)
-                
-        except Exception as e:
-            st.error(f"❌ Error al generar presentación: {str(e)}")
+        """Queue the PowerPoint presentation organized by health network in the background job runner"""
+        submit_presentation_job(self.ppt_generator, filtered_data, key="control_larvario_ppt")
     
     def render_monthly_aedic_analysis_tab(self, filtered_data):
         """Renderiza análisis de índice aédico mensual por establecimiento"""
@@ -758,7 +615,7 @@ class ControlLarvarioTab:
         
         try:
             # Preparar datos para análisis mensual
-            monthly_data = self._prepare_monthly_aedic_data(filtered_data)
+            monthly_data = self.calculations.calculate_monthly_aedic_by_facility(filtered_data)
             
             if monthly_data.empty:
                 st.warning("⚠️ No se pudieron calcular índices aédicos mensuales")
@@ -829,61 +686,3 @@ class ControlLarvarioTab:
             
         except Exception as e:
             st.error(f"❌ Error en el análisis mensual: {str(e)}")
-    
-    def _prepare_monthly_aedic_data(self, filtered_data):
-        """Prepara datos para análisis de índice aédico mensual"""
-        try:
-            # Filtrar solo datos con fecha válida
-            data_with_date = filtered_data.dropna(subset=['fecha_inspeccion'])
-            
-            if data_with_date.empty:
-                return pd.DataFrame()
-            
-            # Crear columna de mes-año
-            data_with_date = data_with_date.copy()
-            data_with_date['mes_year'] = data_with_date['fecha_inspeccion'].dt.to_period('M').astype(str)
-            
-            # Obtener nombres de establecimientos
-            establishment_names = {}
-            for est_id, info in self.data_processor.health_facilities.items():
-                establishment_names[est_id] = info['name']
-            
-            # Agrupar por establecimiento y mes
-            monthly_aedic = []
-            
-            for establecimiento_id in data_with_date['cod_renipress'].unique():
-                establecimiento_nombre = establishment_names.get(establecimiento_id, f"Establecimiento {establecimiento_id}")
-                
-                est_data = data_with_date[data_with_date['cod_renipress'] == establecimiento_id]
-                
-                # Agrupar por mes
-                monthly_groups = est_data.groupby('mes_year')
-                
-                for mes, mes_data in monthly_groups:
-                    # Calcular viviendas inspeccionadas y positivas
-                    viviendas_inspeccionadas = len(mes_data[mes_data['atencion_vivienda_indicador'] == 1])
-                    viviendas_positivas = len(mes_data[
-                        (mes_data['atencion_vivienda_indicador'] == 1) & 
-                        (mes_data['viv_positiva'] == 1)
-                    ])
-                    
-                    # Calcular índice aédico
-                    if viviendas_inspeccionadas > 0:
-                        indice_aedico = (viviendas_positivas / viviendas_inspeccionadas) * 100
-                    else:
-                        indice_aedico = 0
-                    
-                    monthly_aedic.append({
-                        'establecimiento_id': establecimiento_id,
-                        'establecimiento': establecimiento_nombre,
-                        'mes_year': mes,
-                        'viviendas_inspeccionadas': viviendas_inspeccionadas,
-                        'viviendas_positivas': viviendas_positivas,
-                        'indice_aedico': indice_aedico
-                    })
-            
-            return pd.DataFrame(monthly_aedic)
-            
-        except Exception as e:
-            st.error(f"Error preparando datos mensuales: {str(e)}")
-            return pd.DataFrame()
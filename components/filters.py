@@ -2,6 +2,13 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date
 
+# Prefixes of the filter widget keys (suffixed with the activity type) and of the map view controls
+FILTER_KEY_PREFIXES = (
+    'year_filter_', 'dept_filter_', 'prov_filter_', 'dist_filter_',
+    'renipress_filter_', 'facility_filter_', 'start_date_', 'end_date_',
+    'vigilancia_map_'
+)
+
 class FilterComponent:
     def __init__(self, data_processor):
         self.data_processor = data_processor
@@ -100,7 +107,8 @@ class FilterComponent:
             with col1:
                 start_date = st.date_input(
                     "Fecha de inicio",
-                    value=min_date,
+                    # A value kept in session state takes precedence over the default
+                    value=None if f"start_date_{activity_type}" in st.session_state else min_date,
                     min_value=min_date,
                     max_value=max_date,
                     key=f"start_date_{activity_type}"
@@ -108,7 +116,8 @@ class FilterComponent:
             with col2:
                 end_date = st.date_input(
                     "Fecha de fin",
-                    value=max_date,
+                    # A value kept in session state takes precedence over the default
+                    value=None if f"end_date_{activity_type}" in st.session_state else max_date,
                     min_value=min_date,
                     max_value=max_date,
                     key=f"end_date_{activity_type}"
@@ -124,9 +133,15 @@ class FilterComponent:
         """Apply date range filter to data"""
         if date_range and 'fecha_inspeccion' in data.columns:
             start_date, end_date = date_range
+            # Half-open datetime bounds select the same days as comparing .dt.date
+            start = pd.Timestamp(start_date)
+            end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+            tz = getattr(data['fecha_inspeccion'].dt, 'tz', None)
+            if tz is not None:
+                start, end = start.tz_localize(tz), end.tz_localize(tz)
             data = data[
-                (data['fecha_inspeccion'].dt.date >= start_date) & 
-                (data['fecha_inspeccion'].dt.date <= end_date)
+                (data['fecha_inspeccion'] >= start) & 
+                (data['fecha_inspeccion'] < end)
             ]
         return data
     
@@ -7,44 +7,32 @@ import pandas as pd
 from io import BytesIO
 from datetime import datetime
 import os
-import psycopg2
+from components.lazy_tabs import render_lazy_tabs
 from utils.table_helpers import create_enhanced_dataframe
+from utils.db_pool import get_database_pool
+from utils.facility_registry import invalidate_facility_registry
+from utils.bulk_import import prepare_facility_rows, update_facilities
 
 class HousingManagement:
     def __init__(self):
         self.database_url = os.environ.get('DATABASE_URL')
+        # Pool compartido del proceso: sin conexión ni DDL nuevos en cada renderizado
+        self.pool = get_database_pool(self.database_url)
         self.db_available = self._check_database_availability()
     
     def _check_database_availability(self):
         """Verifica si la base de datos está disponible y configurada"""
-        if not self.database_url:
+        if self.pool is None:
             return False
         
-        try:
-            with psycopg2.connect(self.database_url) as conn:
-                cursor = conn.cursor()
-                # Verificar si la tabla existe y crearla si no existe
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS health_facilities (
-                        cod_renipress INTEGER PRIMARY KEY,
-                        nombre_establecimiento VARCHAR(255) NOT NULL,
-                        total_viviendas INTEGER DEFAULT 0,
-                        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        usuario_actualizacion VARCHAR(100) DEFAULT 'sistema',
-                        activo BOOLEAN DEFAULT TRUE
-                    );
-                """)
-                conn.commit()
-                return True
-        except Exception as e:
-            print(f"Database not available: {str(e)}")
-            return False
+        # La tabla se crea una vez por proceso y el resultado se reutiliza unos segundos
+        return self.pool.is_available()
     
     def get_connection(self):
-        """Obtiene conexión a la base de datos con validación"""
+        """Presta una conexión del pool con validación (usar con 'with'; se devuelve al salir)"""
         if not self.db_available:
             raise Exception("Base de datos no disponible")
-        return psycopg2.connect(self.database_url)
+        return self.pool.connection()
     
     def detect_missing_facilities(self, data):
         """
@@ -188,6 +176,8 @@ class HousingManagement:
                             errors.append(f"Error con {facility['nombre']}: {str(e)}")
                 
                 conn.commit()
+            
+            invalidate_facility_registry()
         
         except Exception as e:
             st.error(f"Error al guardar en la base de datos: {str(e)}")
@@ -221,20 +211,16 @@ class HousingManagement:
             """)
             return
         
-        tab1, tab2, tab3 = st.tabs([
-            "👁️ Ver Establecimientos", 
-            "✏️ Editar Individual", 
-            "📊 Edición Masiva"
-        ])
-        
-        with tab1:
-            self._show_facilities_list()
-        
-        with tab2:
-            self._show_individual_edit()
+        pool_stats = self.pool.get_stats()
+        st.caption(f"🗄️ Pool de conexiones: {pool_stats['connections_opened']}/{pool_stats['max_connections']} abiertas · "
+                   f"{pool_stats['queries']:,} consultas · {pool_stats['avg_ms']:.1f} ms promedio · "
+                   f"máx. {pool_stats['slowest_ms']:.1f} ms")
         
-        with tab3:
-            self._show_bulk_edit()
+        render_lazy_tabs([
+            ("👁️ Ver Establecimientos", self._show_facilities_list),
+            ("✏️ Editar Individual", self._show_individual_edit),
+            ("📊 Edición Masiva", self._show_bulk_edit)
+        ], key="housing_subtab")
     
     def _show_facilities_list(self):
         """Muestra lista de todos los establecimientos con sus datos de viviendas"""
@@ -423,6 +409,9 @@ class HousingManagement:
                 """, (nuevo_total, 'usuario_manual', cod_renipress))
                 conn.commit()
             
+            # Los cálculos deben ver el nuevo total de viviendas en el siguiente rerun
+            invalidate_facility_registry()
+            
             st.success(f"✅ Se actualizó {nombre} con {nuevo_total} viviendas")
             st.rerun()
             
@@ -481,46 +470,28 @@ class HousingManagement:
                 st.error(f"❌ El archivo debe contener las columnas: {required_cols}")
                 return
             
-            # Validar datos
-            df = df.dropna(subset=['Código RENIPRESS', 'Total de Viviendas'])
-            df['Total de Viviendas'] = pd.to_numeric(df['Total de Viviendas'], errors='coerce')
-            df = df[df['Total de Viviendas'] >= 0]
+            # Validar datos (todas las filas a la vez; los errores se reportan juntos)
+            rows, errors = prepare_facility_rows(df.rename(columns={
+                'Código RENIPRESS': 'cod_renipress',
+                'Nombre del Establecimiento': 'nombre_establecimiento',
+                'Total de Viviendas': 'total_viviendas'
+            }), require_name=False)
             
-            if df.empty:
+            if rows.empty:
                 st.error("❌ No hay datos válidos para importar")
+                for error in errors[:5]:
+                    st.text(f"• {error}")
                 return
             
-            # Importar a la base de datos
-            updated_count = 0
-            errors = []
-            
+            # Importar a la base de datos: COPY a tabla temporal + un único UPDATE
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                for _, row in df.iterrows():
-                    try:
-                        cursor.execute("""
-                            UPDATE health_facilities 
-                            SET nombre_establecimiento = %s,
-                                total_viviendas = %s,
-                                fecha_actualizacion = CURRENT_TIMESTAMP,
-                                usuario_actualizacion = %s
-                            WHERE cod_renipress = %s
-                        """, (
-                            str(row['Nombre del Establecimiento']),
-                            int(row['Total de Viviendas']),
-                            'excel_import',
-                            int(row['Código RENIPRESS'])
-                        ))
-                        
-                        if cursor.rowcount > 0:
-                            updated_count += 1
-                        
-                    except Exception as e:
-                        errors.append(f"Código {row['Código RENIPRESS']}: {str(e)}")
-                
+                updated_count, missing_codes = update_facilities(conn, rows, 'excel_import')
                 conn.commit()
             
+            errors.extend(f"Código {code}: no existe en la base de datos" for code in missing_codes)
+            
+            invalidate_facility_registry()
+            
             if updated_count > 0:
                 st.success(f"✅ Se actualizaron {updated_count} establecimientos exitosamente")
             
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from components.lazy_tabs import render_lazy_tabs
 from utils.visualizations import VisualizationHelper
 from utils.table_helpers import create_enhanced_dataframe
 
@@ -15,31 +16,17 @@ class InspectorTab:
         st.header("👤 Análisis por Inspector")
         
         # Check if data is available
-        if st.session_state.data is None:
+        if st.session_state.get('dataset_handle') is None:
             st.warning("⚠️ Por favor, carga un archivo CSV primero.")
             return
         
-        # Use processed data from data_processor
-        filtered_data = self.data_processor.data
+        # Inspector directory built once per dataset: DNI list, names and row positions
+        directory = self.data_processor.inspector_directory
         
         # Inspector filter
         st.subheader("🔍 Filtrar por Inspector")
         
-        # Get list of inspectors (DNI) and create DNI to name mapping
-        # Convert usuario_registra to string to ensure consistent type handling
-        filtered_data['usuario_registra'] = filtered_data['usuario_registra'].astype(str)
-        
-        inspector_mapping = {}
-        if 'nombre_inspector' in filtered_data.columns:
-            # Create mapping from DNI to full name
-            for dni in filtered_data['usuario_registra'].dropna().unique():
-                names = filtered_data[filtered_data['usuario_registra'] == dni]['nombre_inspector'].dropna().unique()
-                if len(names) > 0 and names[0] != '':
-                    inspector_mapping[str(dni)] = names[0]
-                else:
-                    inspector_mapping[str(dni)] = f"Inspector {dni}"
-        
-        inspectors = sorted(filtered_data['usuario_registra'].dropna().unique())
+        inspectors = directory.dnis
         
         if not inspectors:
             st.warning("No se encontraron datos de inspectores.")
@@ -48,38 +35,28 @@ class InspectorTab:
         # Inspector selection with names if available
         col1, col2 = st.columns([2, 1])
         
-        # Initialize selected_inspector
-        selected_inspector = inspectors[0] if inspectors else None
-        
         with col1:
             # Create display options with both DNI and name
-            inspector_options = []
+            inspector_options = {}
             for dni in inspectors:
-                dni_str = str(dni)
-                if dni_str in inspector_mapping:
-                    display_name = f"{inspector_mapping[dni_str]} (DNI: {dni})"
+                if directory.has_names:
+                    display_name = f"{directory.get_name(dni, f'Inspector {dni}')} (DNI: {dni})"
                 else:
                     display_name = f"Inspector {dni}"
-                inspector_options.append(display_name)
+                inspector_options[display_name] = dni
             
             selected_display = st.selectbox(
                 "Selecciona el Inspector:",
-                options=inspector_options,
+                options=list(inspector_options),
                 key="inspector_select"
             )
-            
-            # Extract DNI from selected display option and ensure string type
-            if selected_display:
-                if "(DNI: " in selected_display:
-                    selected_inspector = str(selected_display.split("(DNI: ")[1].replace(")", ""))
-                else:
-                    selected_inspector = str(selected_display.replace("Inspector ", ""))
+            selected_inspector = inspector_options.get(selected_display, inspectors[0])
         
         with col2:
             st.metric("📋 Total Inspectores", len(inspectors))
         
-        # Filter data by selected inspector
-        inspector_data = filtered_data[filtered_data['usuario_registra'] == selected_inspector]
+        # Rows of the selected inspector (index lookup, no full-table scan)
+        inspector_data = self.data_processor.get_inspector_data(selected_inspector)
         
         if inspector_data.empty:
             st.warning(f"No se encontraron registros para el inspector {selected_inspector}")
@@ -89,61 +66,31 @@ class InspectorTab:
         self.display_inspector_summary(inspector_data, selected_inspector)
         
         # Create tabs for detailed analysis
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "📊 Resumen General",
-            "🏠 Inspecciones por Fecha",
-            "📦 Recipientes Analizados",
-            "🗺️ Mapa de Inspecciones",
-            "📈 Productividad"
-        ])
-        
-        with tab1:
-            self.render_general_summary_tab(inspector_data, selected_inspector)
-        
-        with tab2:
-            self.render_daily_inspections_tab(inspector_data, selected_inspector)
-        
-        with tab3:
-            self.render_containers_tab(inspector_data, selected_inspector)
-        
-        with tab4:
-            self.render_map_tab(inspector_data, selected_inspector)
-        
-        with tab5:
-            self.render_productivity_tab(inspector_data, selected_inspector)
+        render_lazy_tabs([
+            ("📊 Resumen General", lambda: self.render_general_summary_tab(inspector_data, selected_inspector)),
+            ("🏠 Inspecciones por Fecha", lambda: self.render_daily_inspections_tab(inspector_data, selected_inspector)),
+            ("📦 Recipientes Analizados", lambda: self.render_containers_tab(inspector_data, selected_inspector)),
+            ("🗺️ Mapa de Inspecciones", lambda: self.render_map_tab(inspector_data, selected_inspector)),
+            ("📈 Productividad", lambda: self.render_productivity_tab(inspector_data, selected_inspector))
+        ], key="inspector_subtab")
     
     def display_inspector_summary(self, inspector_data, inspector_dni):
         """Display summary metrics for the selected inspector"""
-        # Get inspector name if available
-        inspector_name = "Inspector desconocido"
-        if 'nombre_inspector' in inspector_data.columns:
-            names = inspector_data['nombre_inspector'].dropna().unique()
-            if len(names) > 0 and names[0] != '':
-                inspector_name = names[0]
+        inspector_name = self.data_processor.inspector_directory.get_name(inspector_dni)
         
         st.subheader(f"📋 Resumen del Inspector: {inspector_name} (DNI: {inspector_dni})")
         
-        # Calculate key metrics
-        total_inspections = len(inspector_data)
-        inspected_houses = len(inspector_data[inspector_data['atencion_vivienda_indicador'] == 1])
-        positive_houses = len(inspector_data[
-            (inspector_data['viv_positiva'] == 1) & 
-            (inspector_data['atencion_vivienda_indicador'] == 1)
-        ])
-        total_larvicide = inspector_data['consumo_larvicida'].sum()
-        total_febriles = inspector_data['febriles'].sum()
+        # Precomputed inspector totals
+        summary = self.data_processor.inspector_directory.get_summary(inspector_dni)
+        total_inspections = int(summary['registros'])
+        inspected_houses = int(summary['viviendas_inspeccionadas'])
+        positive_houses = int(summary['viviendas_positivas'])
+        total_larvicide = summary['consumo_larvicida']
+        total_febriles = int(summary['febriles'])
         
         # Date range
-        if 'fecha_inspeccion' in inspector_data.columns:
-            try:
-                # Ensure dates are datetime objects
-                dates = pd.to_datetime(inspector_data['fecha_inspeccion'], errors='coerce').dropna()
-                if len(dates) > 0:
-                    date_range = f"{dates.min().strftime('%Y-%m-%d')} a {dates.max().strftime('%Y-%m-%d')}"
-                else:
-                    date_range = "No disponible"
-            except Exception as e:
-                date_range = "No disponible"
+        if pd.notna(summary['fecha_inicio']):
+            date_range = f"{summary['fecha_inicio'].strftime('%Y-%m-%d')} a {summary['fecha_fin'].strftime('%Y-%m-%d')}"
         else:
             date_range = "No disponible"
         
@@ -175,7 +122,7 @@ class InspectorTab:
             st.metric("🤒 Casos Febriles", f"{total_febriles:,}")
         
         with col2:
-            unique_facilities = inspector_data['localidad_eess'].nunique()
+            unique_facilities = int(summary['establecimientos'])
             st.metric("🏥 Establecimientos", f"{unique_facilities}")
         
         with col3:
@@ -183,12 +130,7 @@ class InspectorTab:
     
     def render_general_summary_tab(self, inspector_data, inspector_dni):
         """Render general summary tab"""
-        # Get inspector name if available
-        inspector_name = "Inspector desconocido"
-        if 'nombre_inspector' in inspector_data.columns:
-            names = inspector_data['nombre_inspector'].dropna().unique()
-            if len(names) > 0 and names[0] != '':
-                inspector_name = names[0]
+        inspector_name = self.data_processor.inspector_directory.get_name(inspector_dni)
         
         st.subheader(f"📊 Resumen General - {inspector_name} (DNI: {inspector_dni})")
         
@@ -222,6 +164,8 @@ class InspectorTab:
         # Facilities worked on
         st.subheader("🏥 Establecimientos de Salud Trabajados")
         facility_counts = inspector_data['localidad_eess'].value_counts()
+        # localidad_eess es categórica: descartar establecimientos sin registros del inspector
+        facility_counts = facility_counts[facility_counts > 0]
         
         facility_df = pd.DataFrame({
             'Establecimiento': facility_counts.index,
@@ -238,12 +182,7 @@ class InspectorTab:
     
     def render_daily_inspections_tab(self, inspector_data, inspector_dni):
         """Render daily inspections analysis"""
-        # Get inspector name if available
-        inspector_name = "Inspector desconocido"
-        if 'nombre_inspector' in inspector_data.columns:
-            names = inspector_data['nombre_inspector'].dropna().unique()
-            if len(names) > 0 and names[0] != '':
-                inspector_name = names[0]
+        inspector_name = self.data_processor.inspector_directory.get_name(inspector_dni)
         
         st.subheader(f"🏠 Inspecciones por Fecha - {inspector_name} (DNI: {inspector_dni})")
         
@@ -253,8 +192,9 @@ class InspectorTab:
         
         # Ensure dates are datetime objects
         try:
-            inspector_data_copy = inspector_data.copy()
-            inspector_data_copy['fecha_inspeccion'] = pd.to_datetime(inspector_data_copy['fecha_inspeccion'], errors='coerce')
+            inspector_data_copy = inspector_data.assign(
+                fecha_inspeccion=pd.to_datetime(inspector_data['fecha_inspeccion'], errors='coerce')
+            )
             
             # Remove rows with invalid dates
             inspector_data_copy = inspector_data_copy.dropna(subset=['fecha_inspeccion'])
@@ -263,12 +203,13 @@ class InspectorTab:
                 st.info("No hay datos de fecha válidos disponibles.")
                 return
             
-            # Group by date
-            daily_inspections = inspector_data_copy.groupby(inspector_data_copy['fecha_inspeccion'].dt.date).agg({
-                'atencion_vivienda_indicador': lambda x: (x == 1).sum(),
-                'viv_positiva': lambda x: ((x == 1) & (inspector_data_copy.loc[x.index, 'atencion_vivienda_indicador'] == 1)).sum(),
-                'consumo_larvicida': 'sum'
-            }).reset_index()
+            # Group by date (vectorized flags instead of per-group lambdas)
+            inspected = inspector_data_copy['atencion_vivienda_indicador'] == 1
+            daily_inspections = pd.DataFrame({
+                'atencion_vivienda_indicador': inspected.astype('int64'),
+                'viv_positiva': (inspected & (inspector_data_copy['viv_positiva'] == 1)).astype('int64'),
+                'consumo_larvicida': inspector_data_copy['consumo_larvicida']
+            }).groupby(inspector_data_copy['fecha_inspeccion'].dt.date.rename('fecha_inspeccion')).sum().reset_index()
         except Exception as e:
             st.error(f"Error al procesar fechas: {str(e)}")
             return
@@ -306,12 +247,7 @@ class InspectorTab:
     
     def render_containers_tab(self, inspector_data, inspector_dni):
         """Render container analysis tab"""
-        # Get inspector name if available
-        inspector_name = "Inspector desconocido"
-        if 'nombre_inspector' in inspector_data.columns:
-            names = inspector_data['nombre_inspector'].dropna().unique()
-            if len(names) > 0 and names[0] != '':
-                inspector_name = names[0]
+        inspector_name = self.data_processor.inspector_directory.get_name(inspector_dni)
         
         st.subheader(f"📦 Recipientes Analizados - {inspector_name} (DNI: {inspector_dni})")
         
@@ -335,12 +271,7 @@ class InspectorTab:
     
     def render_map_tab(self, inspector_data, inspector_dni):
         """Render map visualization for inspector"""
-        # Get inspector name if available
-        inspector_name = "Inspector desconocido"
-        if 'nombre_inspector' in inspector_data.columns:
-            names = inspector_data['nombre_inspector'].dropna().unique()
-            if len(names) > 0 and names[0] != '':
-                inspector_name = names[0]
+        inspector_name = self.data_processor.inspector_directory.get_name(inspector_dni)
         
         st.subheader(f"🗺️ Mapa de Inspecciones - {inspector_name} (DNI: {inspector_dni})")
         
@@ -359,12 +290,7 @@ class InspectorTab:
     
     def render_productivity_tab(self, inspector_data, inspector_dni):
         """Render productivity analysis"""
-        # Get inspector name if available
-        inspector_name = "Inspector desconocido"
-        if 'nombre_inspector' in inspector_data.columns:
-            names = inspector_data['nombre_inspector'].dropna().unique()
-            if len(names) > 0 and names[0] != '':
-                inspector_name = names[0]
+        inspector_name = self.data_processor.inspector_directory.get_name(inspector_dni)
         
         st.subheader(f"📈 Análisis de Productividad - {inspector_name} (DNI: {inspector_dni})")
         
@@ -372,44 +298,37 @@ class InspectorTab:
             st.info("No hay datos de fecha para análisis de productividad.")
             return
         
-        # Ensure dates are datetime objects
-        try:
-            inspector_data_copy = inspector_data.copy()
-            inspector_data_copy['fecha_inspeccion'] = pd.to_datetime(inspector_data_copy['fecha_inspeccion'], errors='coerce')
-            
-            # Remove rows with invalid dates
-            inspector_data_copy = inspector_data_copy.dropna(subset=['fecha_inspeccion'])
-            
-            if len(inspector_data_copy) == 0:
-                st.info("No hay datos de fecha válidos disponibles.")
-                return
-            
-            # Calculate working days
-            working_days = inspector_data_copy['fecha_inspeccion'].dt.date.nunique()
-            total_inspections = len(inspector_data_copy[inspector_data_copy['atencion_vivienda_indicador'] == 1])
-            
-            # Productivity metrics
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                avg_daily = total_inspections / working_days if working_days > 0 else 0
-                st.metric("📊 Promedio Diario", f"{avg_daily:.1f} viviendas")
-            
-            with col2:
-                st.metric("📅 Días Trabajados", f"{working_days}")
-            
-            with col3:
-                efficiency = (total_inspections / len(inspector_data_copy) * 100) if len(inspector_data_copy) > 0 else 0
-                st.metric("⚡ Eficiencia", f"{efficiency:.1f}%")
-            
-            # Monthly productivity trend
-            monthly_productivity = inspector_data_copy.groupby(inspector_data_copy['fecha_inspeccion'].dt.to_period('M')).agg({
-                'atencion_vivienda_indicador': lambda x: (x == 1).sum()
-            }).reset_index()
-        except Exception as e:
-            st.error(f"Error al procesar fechas: {str(e)}")
+        directory = self.data_processor.inspector_directory
+        summary = directory.get_summary(inspector_dni)
+        dated_records = int(summary['registros_con_fecha'])
+        
+        if dated_records == 0:
+            st.info("No hay datos de fecha válidos disponibles.")
             return
         
+        # Working days and inspections from the precomputed directory
+        working_days = int(summary['dias_trabajados'])
+        total_inspections = int(summary['inspeccionadas_con_fecha'])
+        
+        # Productivity metrics
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            avg_daily = total_inspections / working_days if working_days > 0 else 0
+            st.metric("📊 Promedio Diario", f"{avg_daily:.1f} viviendas")
+        
+        with col2:
+            st.metric("📅 Días Trabajados", f"{working_days}")
+        
+        with col3:
+            efficiency = (total_inspections / dated_records * 100) if dated_records > 0 else 0
+            st.metric("⚡ Eficiencia", f"{efficiency:.1f}%")
+        
+        # Monthly productivity trend
+        monthly_productivity = directory.get_monthly_productivity(inspector_dni).rename(columns={
+            'mes': 'fecha_inspeccion',
+            'viviendas_inspeccionadas': 'atencion_vivienda_indicador'
+        })
         monthly_productivity['fecha_inspeccion'] = monthly_productivity['fecha_inspeccion'].astype(str)
         
         if not monthly_productivity.empty:
@@ -436,10 +355,7 @@ class InspectorTab:
         st.subheader("📊 Comparación de Rendimiento")
         
         # Get average performance of all inspectors for comparison
-        all_inspectors_data = self.data_processor.data
-        avg_performance = all_inspectors_data.groupby('usuario_registra').agg({
-            'atencion_vivienda_indicador': lambda x: (x == 1).sum()
-        }).mean().iloc[0]
+        avg_performance = directory.average_inspected()
         
         inspector_performance = total_inspections
         
@@ -0,0 +1,60 @@
+"""
+Pestañas con renderizado diferido
+Solo la pestaña seleccionada ejecuta su contenido en cada rerun; las demás no
+calculan nada hasta que el usuario las abre. Al volver a una pestaña, los
+cálculos se sirven desde la caché de EpidemiologicalCalculations
+"""
+import inspect
+
+import streamlit as st
+
+# Las versiones recientes de st.tabs informan la pestaña activa (TabContainer.open)
+STATEFUL_TABS = 'on_change' in inspect.signature(st.tabs).parameters
+
+
+def render_lazy_tabs(tabs, key):
+    """
+    Muestra pestañas y ejecuta solo el contenido de la seleccionada.
+
+    Args:
+        tabs: Lista de pares (etiqueta, función sin argumentos que dibuja el contenido)
+        key: Clave única del grupo de pestañas en session_state
+    """
+    labels = [label for label, _ in tabs]
+
+    if STATEFUL_TABS:
+        containers = st.tabs(labels, key=key, on_change='rerun')
+        for container, (_, render) in zip(containers, tabs):
+            # open es None si la versión no lleva estado: se dibuja todo como antes
+            if container.open is False:
+                continue
+            with container:
+                render()
+        return
+
+    # Versiones anteriores: un selector horizontal reemplaza a las pestañas
+    selected = st.radio(
+        "Sección",
+        options=labels,
+        horizontal=True,
+        label_visibility="collapsed",
+        key=key
+    )
+    with st.container():
+        tabs[labels.index(selected)][1]()
+
+
+def keep_widget_state(prefixes):
+    """
+    Conserva el valor de widgets que no se dibujan en este rerun.
+
+    Streamlit descarta el estado de un widget cuando no se renderiza; los
+    filtros de una pestaña inactiva perderían su selección al volver a ella.
+    Reasignar el valor lo convierte en estado de sesión y evita el descarte.
+
+    Args:
+        prefixes: Prefijos de las claves de widget a conservar
+    """
+    for widget_key in list(st.session_state.keys()):
+        if isinstance(widget_key, str) and widget_key.startswith(tuple(prefixes)):
+            st.session_state[widget_key] = st.session_state[widget_key]
@@ -0,0 +1,162 @@
+"""
+Presentaciones PowerPoint en segundo plano
+El botón "Generar PPT" encola la presentación en el JobRunner del proceso y la
+pestaña sigue respondiendo mientras se genera. La sesión guarda solo el
+identificador del trabajo: un rerun no pierde el avance y la descarga aparece
+cuando el trabajo termina
+"""
+import inspect
+import io
+from datetime import datetime
+
+import streamlit as st
+
+from utils.job_runner import get_job_runner, DONE, FAILED, CANCELLED
+
+# Segundos entre actualizaciones del progreso mientras el trabajo está en curso
+POLL_INTERVAL = 1.0
+
+# Fragmentos con actualización periódica (st.fragment, antes st.experimental_fragment)
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+POLLING_FRAGMENTS = _fragment is not None and 'run_every' in inspect.signature(_fragment).parameters
+
+PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+def _build_presentation(job, ppt_generator, filtered_data):
+    """Trabajo en segundo plano: genera y guarda la presentación"""
+    presentation = ppt_generator.generate_presentation(filtered_data, progress=job.report)
+    job.report(0.95, "Guardando presentación")
+    # La descarga sale de memoria: nunca depende de un archivo que otro trabajo pueda reemplazar
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    filename = ppt_generator.save_presentation(presentation, tag=job.id[:8])
+    return {'filename': filename, 'data': buffer.getvalue()}
+
+
+def _job_key(key):
+    return f"{key}_job_id"
+
+
+def submit_presentation_job(ppt_generator, filtered_data, key):
+    """
+    Encola la generación de la presentación de una pestaña.
+
+    Un trabajo anterior de la misma pestaña se cancela y se descarta.
+
+    Args:
+        ppt_generator: PowerPointGenerator de la pestaña
+        filtered_data: Filas filtradas que se incluyen en la presentación
+        key: Clave de la pestaña en session_state
+    """
+    runner = get_job_runner()
+    previous = st.session_state.get(_job_key(key))
+    if previous is not None:
+        runner.discard(previous)
+    st.session_state[_job_key(key)] = runner.submit(
+        _build_presentation, ppt_generator, filtered_data, label="Presentación PowerPoint"
+    )
+
+
+def render_presentation_job(key, filename_prefix):
+    """
+    Muestra el estado del trabajo de presentación de una pestaña.
+
+    Mientras el trabajo está en curso, un fragmento actualiza el progreso cada
+    POLL_INTERVAL segundos sin volver a ejecutar la pestaña; al terminar se
+    muestra la descarga o el error. En versiones sin fragmentos periódicos el
+    progreso se actualiza con un botón.
+
+    Args:
+        key: Clave de la pestaña en session_state
+        filename_prefix: Prefijo del archivo descargado (p.ej. "reporte_vigilancia")
+    """
+    job_id = st.session_state.get(_job_key(key))
+    if job_id is None:
+        return
+
+    runner = get_job_runner()
+    # Estado y resultado juntos: el trabajo no puede desaparecer entre ambas lecturas
+    job = runner.get(job_id, include_result=True)
+    if job is None:
+        # El trabajo venció o el servidor se reinició
+        del st.session_state[_job_key(key)]
+        return
+
+    if job['status'] not in (DONE, FAILED, CANCELLED):
+        if POLLING_FRAGMENTS:
+            _fragment(run_every=POLL_INTERVAL)(_render_progress)(key, job_id)
+        else:
+            _render_progress(key, job_id, refresh_button=True)
+        return
+
+    if job['status'] == DONE:
+        result = job['result']
+        st.success(f"✅ Presentación generada exitosamente: {result['filename']}")
+
+        timestamp = datetime.fromtimestamp(job['finished_at']).strftime("%Y%m%d_%H%M%S")
+        col_download, col_close = st.columns([3, 1])
+        with col_download:
+            st.download_button(
+                label="📥 Descargar Presentación PowerPoint",
+                data=result['data'],
+                file_name=f"{filename_prefix}_{timestamp}.pptx",
+                mime=PPTX_MIME,
+                key=f"download_{key}",
+                help="Hacer clic para descargar la presentación"
+            )
+        with col_close:
+            if st.button("✖️ Cerrar", key=f"{key}_job_close"):
+                _close_job(key, job_id)
+                st.rerun()
+
+        st.info(f"""
+        📄 **Presentación PowerPoint creada**
+
+        **Contenido incluido:**
+        - 📋 Diapositiva de título con resumen general
+        - 📊 Resumen estadístico del sistema
+        - 🌐 Análisis por cada red de salud:
+          * RED UTCUBAMBA
+          * RED BAGUA
+          * RED CONDORCANQUI
+          * RED CHACHAPOYAS
+        - 🏥 Detalle por establecimientos de salud
+        - 📈 Métricas de cobertura y eficiencia
+
+        **Archivo guardado en:** `{result['filename']}`
+        """)
+        return
+
+    if job['status'] == FAILED:
+        st.error(f"❌ Error al generar presentación: {job['error']}")
+    else:
+        st.warning("⚠️ Generación de la presentación cancelada")
+    if st.button("✖️ Cerrar", key=f"{key}_job_close"):
+        _close_job(key, job_id)
+        st.rerun()
+
+
+def _render_progress(key, job_id, refresh_button=False):
+    """Progreso del trabajo en curso (dentro de un fragmento, o con botón de actualizar)"""
+    job = get_job_runner().get(job_id)
+    if job is None or job['status'] in (DONE, FAILED, CANCELLED):
+        # Un rerun completo de la app reemplaza el fragmento por la descarga o el error
+        st.rerun()
+
+    st.progress(job['progress'], text=f"🔄 Generando presentación PowerPoint... {job['message']}")
+    col_cancel, col_refresh = st.columns([1, 3])
+    with col_cancel:
+        if st.button("⏹️ Cancelar", key=f"{key}_job_cancel"):
+            get_job_runner().cancel(job_id)
+            st.rerun()
+    if refresh_button:
+        with col_refresh:
+            # Cualquier interacción vuelve a ejecutar el script y muestra el progreso actual
+            st.button("🔄 Actualizar", key=f"{key}_job_refresh")
+
+
+def _close_job(key, job_id):
+    """Descarta el trabajo y su resultado de la sesión"""
+    get_job_runner().discard(job_id)
+    st.session_state.pop(_job_key(key), None)
@@ -1,7 +1,9 @@
 import streamlit as st
-import pandas as pd
 from components.filters import FilterComponent
+from components.lazy_tabs import render_lazy_tabs
+from components.report_jobs import submit_presentation_job, render_presentation_job
 from utils.calculations import EpidemiologicalCalculations
+from utils.map_preparation import MAP_MODES, MAX_ZOOM, MIN_DETAIL_ZOOM, facility_center
 from utils.visualizations import VisualizationHelper
 from utils.powerpoint_generator import PowerPointGenerator
 import plotly.express as px
@@ -23,12 +25,13 @@ class VigilanciaTab:
         # Render filters
         filters = self.filter_component.render_filters('vigilancia')
         
-        # Get filtered data
+        # Get filtered data (date range included, via the processor's sorted date index)
         filtered_data = self.data_processor.get_filtered_data('vigilancia', filters)
         
-        # Apply date range filter if present
-        if 'date_range' in filters:
-            filtered_data = self.filter_component.apply_date_filter(filtered_data, filters['date_range'])
+        # Aggregation cube cells for the same selection: additive metrics are rolled up
+        # from them, row-level views keep using filtered_data
+        cube_cells = self.data_processor.get_cube_cells('vigilancia', filters)
+        aggregate_data = cube_cells if cube_cells is not None else filtered_data
         
         # Show data summary
         st.markdown("---")
@@ -37,15 +40,21 @@ class VigilanciaTab:
         with col1:
             st.metric("📊 Total Registros", f"{len(filtered_data):,}")
         
-        with col2:
+        if cube_cells is not None:
+            totals = self.data_processor.cube.totals(cube_cells)
+            inspected = int(totals['viviendas_inspeccionadas'])
+            positive = int(totals['viviendas_positivas'])
+        else:
             inspected = len(filtered_data[filtered_data['atencion_vivienda_indicador'] == 1])
-            st.metric("🏠 Viviendas Inspeccionadas", f"{inspected:,}")
-        
-        with col3:
             positive = len(filtered_data[
                 (filtered_data['viv_positiva'] == 1) & 
                 (filtered_data['atencion_vivienda_indicador'] == 1)
             ])
+        
+        with col2:
+            st.metric("🏠 Viviendas Inspeccionadas", f"{inspected:,}")
+        
+        with col3:
             st.metric("⚠️ Viviendas Positivas", f"{positive:,}")
         
         with col4:
@@ -65,42 +74,19 @@ class VigilanciaTab:
         with col_ppt2:
             if st.button("📄 Generar PPT", key="vigilancia_ppt", help="Generar presentación PowerPoint organizada por redes de salud"):
                 self.generate_powerpoint_presentation(filtered_data)
+        render_presentation_job(key="vigilancia_ppt", filename_prefix="reporte_vigilancia")
         
         # Create tabs for different visualizations
-        tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
-            "📊 Índices Entomológicos", 
-            "📦 Recipientes", 
-            "🧪 Larvicida", 
-            "📈 Tendencias",
-            "🗺️ Mapa",
-            "📊 Índices Detalle",
-            "📅 Días de Vigilancia",
-            "📊 Índice Aédico Mensual"
-        ])
-        
-        with tab1:
-            self.render_entomological_indices_tab(filtered_data)
-        
-        with tab2:
-            self.render_containers_tab(filtered_data)
-        
-        with tab3:
-            self.render_larvicide_tab(filtered_data)
-        
-        with tab4:
-            self.render_trends_tab(filtered_data)
-        
-        with tab5:
-            self.render_map_tab(filtered_data)
-        
-        with tab6:
-            self.render_indices_detail_tab(filtered_data)
-        
-        with tab7:
-            self.render_surveillance_days_tab(filtered_data)
-        
-        with tab8:
-            self.render_monthly_aedic_analysis_tab(filtered_data)
+        render_lazy_tabs([
+            ("📊 Índices Entomológicos", lambda: self.render_entomological_indices_tab(aggregate_data)),
+            ("📦 Recipientes", lambda: self.render_containers_tab(aggregate_data)),
+            ("🧪 Larvicida", lambda: self.render_larvicide_tab(aggregate_data)),
+            ("📈 Tendencias", lambda: self.render_trends_tab(aggregate_data)),
+            ("🗺️ Mapa", lambda: self.render_map_tab(filtered_data)),
+            ("📊 Índices Detalle", lambda: self.render_indices_detail_tab(aggregate_data)),
+            ("📅 Días de Vigilancia", lambda: self.render_surveillance_days_tab(aggregate_data)),
+            ("📊 Índice Aédico Mensual", lambda: self.render_monthly_aedic_analysis_tab(filtered_data))
+        ], key="vigilancia_subtab")
     
     def render_entomological_indices_tab(self, filtered_data):
         st.subheader("📊 Índices Entomológicos - Resumen General")
@@ -179,173 +165,174 @@ class VigilanciaTab:
     def render_indices_detail_tab(self, filtered_data):
         st.subheader("📊 Índices Entomológicos - Detalle por Establecimiento")
         
-        # Calculate detailed data for each index
+        # Create sub-tabs for each index (only the selected one computes its data)
+        render_lazy_tabs([
+            ("🏠 Índice Aédico (IA)", lambda: self.render_aedic_detail(filtered_data)),
+            ("📦 Índice de Recipiente (IC)", lambda: self.render_container_detail(filtered_data)),
+            ("🔢 Índice Breteau (IB)", lambda: self.render_breteau_detail(filtered_data))
+        ], key="vigilancia_indices_subtab")
+    
+    def render_aedic_detail(self, filtered_data):
         aedic_data = self.calculations.calculate_aedic_index(filtered_data)
+        
+        st.subheader("📊 Índice Aédico por Establecimiento")
+        st.markdown("**Fórmula:** (Viviendas Positivas / Viviendas Inspeccionadas) × 100")
+        
+        if not aedic_data.empty:
+            # Display chart
+            fig = self.viz_helper.create_aedic_index_chart(aedic_data)
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Display table
+            st.subheader("📋 Detalle por Establecimiento")
+            aedic_table_data = aedic_data.sort_values('aedic_index', ascending=False)
+            
+            # Agregar fila de totales
+            enhanced_aedic_data = create_enhanced_dataframe(
+                aedic_table_data,
+                label_column='localidad_eess',
+                exclude_from_total=['cod_renipress', 'aedic_index']  # Excluir porcentajes
+            )
+            
+            st.dataframe(
+                enhanced_aedic_data,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'cod_renipress': 'Código',
+                    'localidad_eess': 'Establecimiento de Salud',
+                    'total_houses': 'Viv. Totales',
+                    'inspected_houses': 'Viv. Inspeccionadas',
+                    'viviendas_positivas': 'Viv. Positivas',
+                    'aedic_index': 'IA (%)'
+                }
+            )
+            
+            # Botón de descarga XLSX
+            create_excel_download_button(
+                aedic_table_data, 
+                "indice_aedico_establecimientos", 
+                "📥 Descargar Índice Aédico XLSX",
+                "aedic"
+            )
+        else:
+            st.info("No hay datos suficientes para calcular el Índice Aédico.")
+    
+    def render_container_detail(self, filtered_data):
         container_data = self.calculations.calculate_container_index(filtered_data)
+        
+        st.subheader("📦 Índice de Recipiente por Establecimiento")
+        st.markdown("**Fórmula:** (Recipientes Positivos / Recipientes Inspeccionados) × 100")
+        
+        if not container_data.empty:
+            # Create visualization for container index
+            import plotly.express as px
+            fig = px.bar(
+                container_data.sort_values('container_index', ascending=True),
+                x='container_index',
+                y='localidad_eess',
+                orientation='h',
+                title='Índice de Recipiente por Establecimiento',
+                labels={
+                    'container_index': 'Índice de Recipiente (%)',
+                    'localidad_eess': 'Establecimiento de Salud'
+                },
+                color='container_index',
+                color_continuous_scale='Reds'
+            )
+            
+            # Add value labels
+            fig.update_traces(
+                texttemplate='%{x:.1f}%',
+                textposition='outside'
+            )
+            
+            fig.update_layout(height=max(400, len(container_data) * 25))
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Display table
+            st.subheader("📋 Detalle por Establecimiento")
+            container_table_data = container_data.sort_values('container_index', ascending=False)
+            
+            # Agregar fila de totales
+            enhanced_container_data = create_enhanced_dataframe(
+                container_table_data,
+                label_column='localidad_eess',
+                exclude_from_total=['cod_renipress', 'container_index']  # Excluir porcentajes
+            )
+            
+            st.dataframe(
+                enhanced_container_data,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'cod_renipress': 'Código',
+                    'localidad_eess': 'Establecimiento de Salud',
+                    'containers_inspected': 'Recipientes Inspeccionados',
+                    'containers_positive': 'Recipientes Positivos',
+                    'container_index': 'IC (%)'
+                }
+            )
+        else:
+            st.info("No hay datos suficientes para calcular el Índice de Recipiente.")
+    
+    def render_breteau_detail(self, filtered_data):
         breteau_data = self.calculations.calculate_breteau_index(filtered_data)
         
-        # Create sub-tabs for each index
-        detail_tab1, detail_tab2, detail_tab3 = st.tabs([
-            "🏠 Índice Aédico (IA)",
-            "📦 Índice de Recipiente (IC)", 
-            "🔢 Índice Breteau (IB)"
-        ])
+        st.subheader("🔢 Índice Breteau por Establecimiento")
+        st.markdown("**Fórmula:** (Recipientes Positivos / Viviendas Inspeccionadas) × 100")
         
-        with detail_tab1:
-            st.subheader("📊 Índice Aédico por Establecimiento")
-            st.markdown("**Fórmula:** (Viviendas Positivas / Viviendas Inspeccionadas) × 100")
+        if not breteau_data.empty:
+            # Create visualization for breteau index
+            import plotly.express as px
+            fig = px.bar(
+                breteau_data.sort_values('breteau_index', ascending=True),
+                x='breteau_index',
+                y='localidad_eess',
+                orientation='h',
+                title='Índice Breteau por Establecimiento',
+                labels={
+                    'breteau_index': 'Índice Breteau',
+                    'localidad_eess': 'Establecimiento de Salud'
+                },
+                color='breteau_index',
+                color_continuous_scale='Blues'
+            )
             
-            if not aedic_data.empty:
-                # Display chart
-                fig = self.viz_helper.create_aedic_index_chart(aedic_data)
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Display table
-                st.subheader("📋 Detalle por Establecimiento")
-                aedic_table_data = aedic_data.sort_values('aedic_index', ascending=False)
-                
-                # Agregar fila de totales
-                enhanced_aedic_data = create_enhanced_dataframe(
-                    aedic_table_data,
-                    label_column='localidad_eess',
-                    exclude_from_total=['cod_renipress', 'aedic_index']  # Excluir porcentajes
-                )
-                
-                st.dataframe(
-                    enhanced_aedic_data,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        'cod_renipress': 'Código',
-                        'localidad_eess': 'Establecimiento de Salud',
-                        'total_houses': 'Viv. Totales',
-                        'inspected_houses': 'Viv. Inspeccionadas',
-                        'viviendas_positivas': 'Viv. Positivas',
-                        'aedic_index': 'IA (%)'
-                    }
-                )
-                
-                # Botón de descarga XLSX
-                create_excel_download_button(
-                    aedic_table_data, 
-                    "indice_aedico_establecimientos", 
-                    "📥 Descargar Índice Aédico XLSX",
-                    "aedic"
-                )
-            else:
-                st.info("No hay datos suficientes para calcular el Índice Aédico.")
-        
-        with detail_tab2:
-            st.subheader("📦 Índice de Recipiente por Establecimiento")
-            st.markdown("**Fórmula:** (Recipientes Positivos / Recipientes Inspeccionados) × 100")
-            
-            if not container_data.empty:
-                # Create visualization for container index
-                import plotly.express as px
-                fig = px.bar(
-                    container_data.sort_values('container_index', ascending=True),
-                    x='container_index',
-                    y='localidad_eess',
-                    orientation='h',
-                    title='Índice de Recipiente por Establecimiento',
-                    labels={
-                        'container_index': 'Índice de Recipiente (%)',
-                        'localidad_eess': 'Establecimiento de Salud'
-                    },
-                    color='container_index',
-                    color_continuous_scale='Reds'
-                )
-                
-                # Add value labels
-                fig.update_traces(
-                    texttemplate='%{x:.1f}%',
-                    textposition='outside'
-                )
-                
-                fig.update_layout(height=max(400, len(container_data) * 25))
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Display table
-                st.subheader("📋 Detalle por Establecimiento")
-                container_table_data = container_data.sort_values('container_index', ascending=False)
-                
-                # Agregar fila de totales
-                enhanced_container_data = create_enhanced_dataframe(
-                    container_table_data,
-                    label_column='localidad_eess',
-                    exclude_from_total=['cod_renipress', 'container_index']  # Excluir porcentajes
-                )
-                
-                st.dataframe(
-                    enhanced_container_data,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        'cod_renipress': 'Código',
-                        'localidad_eess': 'Establecimiento de Salud',
-                        'containers_inspected': 'Recipientes Inspeccionados',
-                        'containers_positive': 'Recipientes Positivos',
-                        'container_index': 'IC (%)'
-                    }
-                )
-            else:
-                st.info("No hay datos suficientes para calcular el Índice de Recipiente.")
-        
-        with detail_tab3:
-            st.subheader("🔢 Índice Breteau por Establecimiento")
-            st.markdown("**Fórmula:** (Recipientes Positivos / Viviendas Inspeccionadas) × 100")
-            
-            if not breteau_data.empty:
-                # Create visualization for breteau index
-                import plotly.express as px
-                fig = px.bar(
-                    breteau_data.sort_values('breteau_index', ascending=True),
-                    x='breteau_index',
-                    y='localidad_eess',
-                    orientation='h',
-                    title='Índice Breteau por Establecimiento',
-                    labels={
-                        'breteau_index': 'Índice Breteau',
-                        'localidad_eess': 'Establecimiento de Salud'
-                    },
-                    color='breteau_index',
-                    color_continuous_scale='Blues'
-                )
-                
-                # Add value labels
-                fig.update_traces(
-                    texttemplate='%{x:.1f}',
-                    textposition='outside'
-                )
-                
-                fig.update_layout(height=max(400, len(breteau_data) * 25))
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Display table
-                st.subheader("📋 Detalle por Establecimiento")
-                breteau_table_data = breteau_data.sort_values('breteau_index', ascending=False)
-                
-                # Agregar fila de totales
-                enhanced_breteau_data = create_enhanced_dataframe(
-                    breteau_table_data,
-                    label_column='localidad_eess',
-                    exclude_from_total=['cod_renipress', 'breteau_index']  # Excluir índices
-                )
-                
-                st.dataframe(
-                    enhanced_breteau_data,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        'cod_renipress': 'Código',
-                        'localidad_eess': 'Establecimiento de Salud',
-                        'houses_inspected': 'Viviendas Inspeccionadas',
-                        'containers_positive': 'Recipientes Positivos',
-                        'breteau_index': 'IB'
-                    }
-                )
-            else:
-                st.info("No hay datos suficientes para calcular el Índice Breteau.")
+            # Add value labels
+            fig.update_traces(
+                texttemplate='%{x:.1f}',
+                textposition='outside'
+            )
+            
+            fig.update_layout(height=max(400, len(breteau_data) * 25))
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Display table
+            st.subheader("📋 Detalle por Establecimiento")
+            breteau_table_data = breteau_data.sort_values('breteau_index', ascending=False)
+            
+            # Agregar fila de totales
+            enhanced_breteau_data = create_enhanced_dataframe(
+                breteau_table_data,
+                label_column='localidad_eess',
+                exclude_from_total=['cod_renipress', 'breteau_index']  # Excluir índices
+            )
+            
+            st.dataframe(
+                enhanced_breteau_data,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'cod_renipress': 'Código',
+                    'localidad_eess': 'Establecimiento de Salud',
+                    'houses_inspected': 'Viviendas Inspeccionadas',
+                    'containers_positive': 'Recipientes Positivos',
+                    'breteau_index': 'IB'
+                }
+            )
+        else:
+            st.info("No hay datos suficientes para calcular el Índice Breteau.")
     
     def render_containers_tab(self, filtered_data):
         st.subheader("📦 Estadísticas de Recipientes")
@@ -478,8 +465,36 @@ class VigilanciaTab:
     def render_map_tab(self, filtered_data):
         st.subheader("🗺️ Distribución Geográfica")
         
+        # Map mode: sampled points or grid/hexagon aggregation (bounded payload)
+        map_mode = st.radio(
+            "Vista del mapa",
+            options=list(MAP_MODES),
+            format_func=MAP_MODES.get,
+            horizontal=True,
+            key="vigilancia_map_mode"
+        )
+        
+        # Level of detail: the zoom refines the cells over the visible area around the chosen center
+        col_zoom, col_center = st.columns(2)
+        with col_zoom:
+            map_zoom = st.select_slider(
+                "Nivel de detalle (zoom)",
+                options=[None] + list(range(MIN_DETAIL_ZOOM, MAX_ZOOM + 1)),
+                format_func=lambda zoom: "Todo el área" if zoom is None else str(zoom),
+                key="vigilancia_map_zoom"
+            )
+        with col_center:
+            facilities = sorted(filtered_data['localidad_eess'].dropna().astype(str).unique()) if 'localidad_eess' in filtered_data.columns else []
+            map_focus = st.selectbox(
+                "Centrar en",
+                options=[None] + facilities,
+                format_func=lambda facility: "Centro de los datos" if facility is None else facility,
+                key="vigilancia_map_center"
+            )
+        map_center = facility_center(filtered_data, map_focus) if map_focus is not None else None
+        
         # Display map
-        fig = self.viz_helper.create_map_visualization(filtered_data)
+        fig = self.viz_helper.create_map_visualization(filtered_data, mode=map_mode, zoom=map_zoom, center=map_center)
         st.plotly_chart(fig, use_container_width=True)
         
         # Summary by coordinates
@@ -631,57 +646,8 @@ class VigilanciaTab:
             st.info("No hay datos de fechas válidos para calcular días de vigilancia por semana.")
     
     def generate_powerpoint_presentation(self, filtered_data):
-        """Genera presentación PowerPoint con datos organizados por redes de salud"""
-        try:
-            with st.spinner("🔄 Generando presentación PowerPoint..."):
-                # Generar presentación
-                presentation = self.ppt_generator.generate_presentation(filtered_data)
-                
-                # Guardar presentación
-                filename = self.ppt_generator.save_presentation(presentation)
-                
-                st.success(f"✅ Presentación generada exitosamente: {filename}")
-                
-                # Leer archivo para descarga automática
-                with open(filename, "rb") as file:
-                    file_data = file.read()
-                
-                # Generar nombre de archivo para descarga
-                from datetime import datetime
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                download_filename = f"reporte_vigilancia_{timestamp}.pptx"
-                
-                # Botón de descarga automática
-                st.download_button(
-                    label="📥 Descargar Presentación PowerPoint",
-                    data=file_data,
-                    file_name=download_filename,
-                    mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                    key="download_ppt_vigilancia",
-                    help="Hacer clic para descargar automáticamente la presentación"
-                )
-                
-                # Información adicional
-                st.info(f"""
-                📄 **Presentación PowerPoint creada**
-                
-                **Contenido incluido:**
-                - 📋 Diapositiva de título con resumen general
-                - 📊 Resumen estadístico del sistema
-                - 🌐 Análisis por cada red de salud:
-                  * RED UTCUBAMBA
-                  * RED BAGUA  
-                  * RED CONDORCANQUI
-                  * RED CHACHAPOYAS
-                - 🏥 Detalle por establecimientos de salud
-                - 📈 Métricas de cobertura y eficiencia
-                
-                **Archivo guardado en:** `{filename}`
-                **Haz clic en el botón de arriba para descargar automáticamente**
-                """)
-                
-        except Exception as e:
-            st.error(f"❌ Error al generar presentación: {str(e)}")
+        """Queue the PowerPoint presentation organized by health network in the background job runner"""
+        submit_presentation_job(self.ppt_generator, filtered_data, key="vigilancia_ppt")
     
     def render_monthly_aedic_analysis_tab(self, filtered_data):
         """Renderiza análisis de índice aédico mensual por establecimiento"""
@@ -698,7 +664,7 @@ class VigilanciaTab:
         
         try:
             # Preparar datos para análisis mensual
-            monthly_data = self._prepare_monthly_aedic_data(filtered_data)
+            monthly_data = self.calculations.calculate_monthly_aedic_by_facility(filtered_data)
             
             if monthly_data.empty:
                 st.warning("⚠️ No se pudieron calcular índices aédicos mensuales")
@@ -854,61 +820,3 @@ class VigilanciaTab:
             
         except Exception as e:
             st.error(f"❌ Error en el análisis mensual: {str(e)}")
-    
-    def _prepare_monthly_aedic_data(self, filtered_data):
-        """Prepara datos para análisis de índice aédico mensual"""
-        try:
-            # Filtrar solo datos con fecha válida
-            data_with_date = filtered_data.dropna(subset=['fecha_inspeccion'])
-            
-            if data_with_date.empty:
-                return pd.DataFrame()
-            
-            # Crear columna de mes-año
-            data_with_date = data_with_date.copy()
-            data_with_date['mes_year'] = data_with_date['fecha_inspeccion'].dt.to_period('M').astype(str)
-            
-            # Obtener nombres de establecimientos
-            establishment_names = {}
-            for est_id, info in self.data_processor.health_facilities.items():
-                establishment_names[est_id] = info['name']
-            
-            # Agrupar por establecimiento y mes
-            monthly_aedic = []
-            
-            for establecimiento_id in data_with_date['cod_renipress'].unique():
-                establecimiento_nombre = establishment_names.get(establecimiento_id, f"Establecimiento {establecimiento_id}")
-                
-                est_data = data_with_date[data_with_date['cod_renipress'] == establecimiento_id]
-                
-                # Agrupar por mes
-                monthly_groups = est_data.groupby('mes_year')
-                
-                for mes, mes_data in monthly_groups:
-                    # Calcular viviendas inspeccionadas y positivas
-                    viviendas_inspeccionadas = len(mes_data[mes_data['atencion_vivienda_indicador'] == 1])
-                    viviendas_positivas = len(mes_data[
-                        (mes_data['atencion_vivienda_indicador'] == 1) & 
-                        (mes_data['viv_positiva'] == 1)
-                    ])
-                    
-                    # Calcular índice aédico
-                    if viviendas_inspeccionadas > 0:
-                        indice_aedico = (viviendas_positivas / viviendas_inspeccionadas) * 100
-                    else:
-                        indice_aedico = 0
-                    
-                    monthly_aedic.append({
-                        'establecimiento_id': establecimiento_id,
-                        'establecimiento': establecimiento_nombre,
-                        'mes_year': mes,
-                        'viviendas_inspeccionadas': viviendas_inspeccionadas,
-                        'viviendas_positivas': viviendas_positivas,
-                        'indice_aedico': indice_aedico
-                    })
-            
-            return pd.DataFrame(monthly_aedic)
-            
-        except Exception as e:
-            st.error(f"Error preparando datos mensuales: {str(e)}")
-            return pd.DataFrame()
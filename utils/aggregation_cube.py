@@ -0,0 +1,163 @@
+"""
+Cubo de agregación de inspecciones
+Precalcula medidas aditivas por actividad, establecimiento, geografía y día
+para que las métricas de los módulos se obtengan sumando celdas en lugar de
+recorrer todas las filas
+"""
+import numpy as np
+import pandas as pd
+
+# Dimensiones del cubo; 'fecha' es el día de fecha_inspeccion
+DIMENSIONS = ['tipoActividadInspeccion', 'cod_renipress', 'localidad_eess',
+              'departamento_x', 'nombre_prov', 'distrito', 'year', 'fecha']
+
+# Atributos derivados del día para agregaciones por semana epidemiológica y mes
+TIME_ATTRIBUTES = ['epi_year', 'epi_week', 'month']
+
+# Conteo de viviendas por código de atencion_vivienda_indicador
+STATUS_MEASURES = {
+    1: 'viviendas_inspeccionadas',
+    2: 'viviendas_cerradas',
+    3: 'viviendas_renuentes',
+    4: 'viviendas_deshabitadas'
+}
+
+COUNT_MEASURES = ['registros'] + list(STATUS_MEASURES.values()) + [
+    'viviendas_positivas', 'recipientes_inspeccionados', 'recipientes_positivos'
+]
+
+# Columnas que se suman tal cual y conservan su nombre original en el cubo
+SUM_COLUMNS = ['consumo_larvicida', 'febriles']
+
+
+def is_cube_cells(frame):
+    """Indica si un DataFrame contiene celdas del cubo en lugar de filas de inspección"""
+    return 'registros' in frame.columns and 'atencion_vivienda_indicador' not in frame.columns
+
+
+def epidemiological_week(dates):
+    """
+    Calcula año y semana epidemiológica (semanas de domingo a sábado; la semana 1
+    es la que contiene el 4 de enero).
+
+    Args:
+        dates: Serie datetime64 (los valores nulos producen semana nula)
+
+    Returns:
+        DataFrame con columnas epi_year y epi_week alineado con dates
+    """
+    days = dates.dt.normalize()
+    # Domingo que inicia la semana de cada fecha (weekday: lunes=0 ... domingo=6)
+    week_start = days - pd.to_timedelta((days.dt.weekday + 1) % 7, unit='D')
+    # El año epidemiológico es el del miércoles de la semana
+    epi_year = (week_start + pd.Timedelta(days=3)).dt.year
+
+    jan4 = pd.to_datetime(epi_year.astype('Int64').astype(str) + '-01-04', errors='coerce')
+    first_week_start = jan4 - pd.to_timedelta((jan4.dt.weekday + 1) % 7, unit='D')
+    epi_week = (week_start - first_week_start).dt.days // 7 + 1
+
+    return pd.DataFrame({
+        'epi_year': epi_year.astype('Int64'),
+        'epi_week': epi_week.astype('Int64')
+    }, index=dates.index)
+
+
+class AggregationCube:
+    """Cubo de medidas aditivas construido una vez al cargar los datos"""
+
+    def __init__(self, data, container_columns):
+        """
+        Args:
+            data: DataFrame procesado por DataProcessor
+            container_columns: Lista de columnas de recipientes a sumar
+        """
+        self.dimensions = [col for col in DIMENSIONS if col == 'fecha' or col in data.columns]
+        self.container_columns = [col for col in container_columns if col in data.columns]
+        self.measures = COUNT_MEASURES + [col for col in SUM_COLUMNS if col in data.columns] + self.container_columns
+        self.cells = self._build_cells(data)
+
+    def _build_cells(self, data):
+        """Agrupa las filas por todas las dimensiones sumando las medidas"""
+        rows = len(data)
+        status = data['atencion_vivienda_indicador'].to_numpy() if 'atencion_vivienda_indicador' in data.columns else np.zeros(rows)
+        positive = data['viv_positiva'].to_numpy() == 1 if 'viv_positiva' in data.columns else np.zeros(rows, dtype=bool)
+        inspected_cols = [col for col in self.container_columns if col.endswith('_I')]
+        positive_cols = [col for col in self.container_columns if col.endswith('_P')]
+
+        measures = {'registros': np.ones(rows, dtype=np.int32)}
+        for code, name in STATUS_MEASURES.items():
+            measures[name] = (status == code).astype(np.int32)
+        measures['viviendas_positivas'] = ((status == 1) & positive).astype(np.int32)
+        measures['recipientes_inspeccionados'] = data[inspected_cols].sum(axis=1).to_numpy() if inspected_cols else np.zeros(rows, dtype=np.int64)
+        measures['recipientes_positivos'] = data[positive_cols].sum(axis=1).to_numpy() if positive_cols else np.zeros(rows, dtype=np.int64)
+        for col in SUM_COLUMNS + self.container_columns:
+            if col in data.columns:
+                measures[col] = data[col].to_numpy()
+        measures = pd.DataFrame(measures, index=data.index)
+
+        if 'fecha_inspeccion' in data.columns and pd.api.types.is_datetime64_any_dtype(data['fecha_inspeccion']):
+            dates = data['fecha_inspeccion']
+            if getattr(dates.dt, 'tz', None) is not None:
+                dates = dates.dt.tz_localize(None)
+            day = dates.dt.normalize()
+        else:
+            day = pd.Series(pd.NaT, index=data.index, dtype='datetime64[ns]')
+
+        keys = [data[col] if col != 'fecha' else day.rename('fecha') for col in self.dimensions]
+
+        # sort=False: las celdas quedan en el orden de primera aparición de sus filas
+        cells = measures.groupby(keys, sort=False, dropna=False, observed=True).sum().reset_index()
+
+        # Atributos de tiempo calculados sobre los días distintos
+        unique_days = pd.Series(cells['fecha'].dropna().unique())
+        epi = epidemiological_week(unique_days)
+        epi['fecha'] = unique_days.to_numpy()
+        cells = cells.merge(epi, on='fecha', how='left', sort=False)
+        cells['month'] = cells['fecha'].dt.to_period('M')
+
+        return cells
+
+    def slice(self, activity_type=None, filters=None):
+        """
+        Selecciona las celdas que cumplen el tipo de actividad y los filtros.
+
+        Usa la misma semántica que DataProcessor.get_filtered_data. Si algún filtro
+        no es una dimensión del cubo retorna None para que se usen las filas.
+
+        Returns:
+            DataFrame de celdas o None
+        """
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+
+        if activity_type:
+            if 'tipoActividadInspeccion' not in cells.columns:
+                return None
+            activities = cells['tipoActividadInspeccion'].astype(str).str.lower()
+            mask &= (activities == activity_type.lower()).to_numpy(dtype=bool, na_value=False)
+
+        if filters:
+            for key, value in filters.items():
+                if not value:
+                    continue
+                if key == 'date_range':
+                    start_date, end_date = value
+                    start = pd.Timestamp(start_date)
+                    end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+                    mask &= ((cells['fecha'] >= start) & (cells['fecha'] < end)).to_numpy(dtype=bool, na_value=False)
+                elif key in self.dimensions:
+                    condition = cells[key].isin(value) if isinstance(value, list) else cells[key] == value
+                    mask &= condition.to_numpy(dtype=bool, na_value=False)
+                else:
+                    return None
+
+        return cells[mask]
+
+    def rollup(self, cells, by):
+        """Suma las medidas de las celdas agrupando por las dimensiones o atributos indicados"""
+        by = [by] if isinstance(by, str) else list(by)
+        return cells.groupby(by, sort=True, observed=True)[self.measures].sum().reset_index()
+
+    def totals(self, cells):
+        """Suma total de cada medida"""
+        return cells[self.measures].sum()
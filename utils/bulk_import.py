@@ -0,0 +1,142 @@
+"""
+Importación masiva de establecimientos de salud
+Valida todas las filas de una vez, las copia con COPY a una tabla temporal y
+las integra en health_facilities con una única sentencia basada en conjuntos,
+en lugar de un INSERT/UPDATE por fila
+"""
+import io
+
+import pandas as pd
+
+FACILITY_COLUMNS = ['cod_renipress', 'nombre_establecimiento', 'total_viviendas']
+
+# Desplazamiento entre el índice del DataFrame y la fila de Excel (encabezado en la fila 1)
+EXCEL_ROW_OFFSET = 2
+
+
+def prepare_facility_rows(df, require_name=True, row_offset=EXCEL_ROW_OFFSET):
+    """
+    Valida y normaliza las filas a importar.
+
+    Args:
+        df: DataFrame con columnas cod_renipress, nombre_establecimiento y total_viviendas
+        require_name: Si el nombre es obligatorio (altas); en actualizaciones un nombre
+                      vacío conserva el existente
+        row_offset: Número de fila mostrado para el índice 0 en los mensajes de error
+
+    Returns:
+        Tupla (DataFrame válido con FACILITY_COLUMNS, lista de errores por fila)
+    """
+    df = df.reset_index(drop=True)
+    # Filas completamente vacías (p.ej. al final de una hoja de Excel) se ignoran sin error
+    df = df[df[FACILITY_COLUMNS].notna().any(axis=1)]
+
+    codes = pd.to_numeric(df['cod_renipress'], errors='coerce')
+    totals = pd.to_numeric(df['total_viviendas'], errors='coerce')
+    names = df['nombre_establecimiento'].astype('string').str.strip()
+
+    problems = pd.Series('', index=df.index, dtype=object)
+    invalid_code = codes.isna() | (codes % 1 != 0) | (codes <= 0)
+    problems[invalid_code] = 'código RENIPRESS inválido'
+    invalid_total = ~invalid_code & (totals.isna() | (totals % 1 != 0) | (totals < 0))
+    problems[invalid_total] = 'total de viviendas inválido'
+    if require_name:
+        missing_name = ~invalid_code & ~invalid_total & (names.isna() | (names == ''))
+        problems[missing_name] = 'nombre del establecimiento vacío'
+
+    valid = problems == ''
+    # Un código repetido en el archivo se toma de su última aparición
+    duplicated = valid & codes.where(valid).duplicated(keep='last')
+    problems[duplicated] = 'código repetido en el archivo (se usa la última fila)'
+    valid &= ~duplicated
+
+    labels = ('código ' + df['cod_renipress'].astype(str)).where(df['cod_renipress'].notna(), 'sin código')
+    errors = [
+        f"Fila {index + row_offset} ({labels[index]}): {problem}"
+        for index, problem in problems[problems != ''].items()
+    ]
+
+    rows = pd.DataFrame({
+        'cod_renipress': codes[valid].astype('int64'),
+        'nombre_establecimiento': names[valid].str.slice(0, 255),
+        'total_viviendas': totals[valid].astype('int64')
+    })
+    return rows.reset_index(drop=True), errors
+
+
+def _stage_rows(cursor, rows):
+    """Crea la tabla temporal y carga las filas con una sola operación COPY"""
+    cursor.execute("""
+        CREATE TEMP TABLE staging_health_facilities (
+            cod_renipress INTEGER,
+            nombre_establecimiento VARCHAR(255),
+            total_viviendas INTEGER
+        ) ON COMMIT DROP;
+    """)
+    buffer = io.StringIO()
+    rows[FACILITY_COLUMNS].to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY staging_health_facilities (cod_renipress, nombre_establecimiento, total_viviendas) "
+        "FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+
+def upsert_facilities(conn, rows, usuario):
+    """
+    Inserta o actualiza los establecimientos en una sola sentencia.
+
+    Args:
+        conn: Conexión abierta (la transacción la confirma quien llama)
+        rows: DataFrame retornado por prepare_facility_rows
+        usuario: Valor para usuario_actualizacion
+
+    Returns:
+        Número de establecimientos insertados o actualizados
+    """
+    if rows.empty:
+        return 0
+    cursor = conn.cursor()
+    _stage_rows(cursor, rows)
+    cursor.execute("""
+        INSERT INTO health_facilities
+        (cod_renipress, nombre_establecimiento, total_viviendas, fecha_actualizacion, usuario_actualizacion)
+        SELECT cod_renipress, nombre_establecimiento, total_viviendas, CURRENT_TIMESTAMP, %s
+        FROM staging_health_facilities
+        ON CONFLICT (cod_renipress)
+        DO UPDATE SET
+            nombre_establecimiento = EXCLUDED.nombre_establecimiento,
+            total_viviendas = EXCLUDED.total_viviendas,
+            fecha_actualizacion = EXCLUDED.fecha_actualizacion,
+            usuario_actualizacion = EXCLUDED.usuario_actualizacion;
+    """, (usuario,))
+    return cursor.rowcount
+
+
+def update_facilities(conn, rows, usuario):
+    """
+    Actualiza establecimientos existentes en una sola sentencia.
+
+    Un nombre vacío conserva el nombre registrado.
+
+    Returns:
+        Tupla (número de establecimientos actualizados, códigos que no existen en la tabla)
+    """
+    if rows.empty:
+        return 0, []
+    cursor = conn.cursor()
+    _stage_rows(cursor, rows)
+    cursor.execute("""
+        UPDATE health_facilities AS f
+        SET nombre_establecimiento = COALESCE(NULLIF(s.nombre_establecimiento, ''), f.nombre_establecimiento),
+            total_viviendas = s.total_viviendas,
+            fecha_actualizacion = CURRENT_TIMESTAMP,
+            usuario_actualizacion = %s
+        FROM staging_health_facilities AS s
+        WHERE f.cod_renipress = s.cod_renipress
+        RETURNING f.cod_renipress;
+    """, (usuario,))
+    updated = {row[0] for row in cursor.fetchall()}
+    missing = [code for code in rows['cod_renipress'].tolist() if code not in updated]
+    return len(updated), missing
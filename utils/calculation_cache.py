@@ -0,0 +1,195 @@
+"""
+Memoización de cálculos epidemiológicos
+Guarda los resultados de EpidemiologicalCalculations por firma de consulta
+(versión del dataset + actividad + filtros normalizados + rango de fechas)
+para que los reruns de Streamlit no recalculen vistas que no cambiaron
+"""
+import functools
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import date, datetime
+
+import pandas as pd
+
+from utils.copy_on_write import independent_copy
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+
+
+def _normalize_value(value):
+    """Convierte un valor de filtro a una forma hashable y estable"""
+    if isinstance(value, (list, tuple, set)):
+        items = [_normalize_value(item) for item in value]
+        # Las listas de selección no dependen del orden; el rango de fechas sí
+        return tuple(sorted(items, key=repr)) if not isinstance(value, tuple) else tuple(items)
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return pd.Timestamp(value).isoformat()
+    if hasattr(value, 'item'):
+        # Escalares NumPy
+        return value.item()
+    return value
+
+
+def normalize_filters(filters):
+    """
+    Normaliza un diccionario de filtros: descarta los vacíos y ordena claves y listas.
+
+    Returns:
+        Tupla de pares (clave, valor) ordenada por clave
+    """
+    if not filters:
+        return ()
+    return tuple(sorted(
+        (key, _normalize_value(value)) for key, value in filters.items() if value
+    ))
+
+
+def query_signature(version, kind, activity_type=None, filters=None):
+    """
+    Firma de una consulta de DataProcessor.
+
+    Args:
+        version: Versión del dataset
+        kind: 'rows' para filas filtradas o 'cube' para celdas del cubo
+        activity_type: Tipo de actividad
+        filters: Diccionario de filtros (incluye date_range)
+    """
+    filters = dict(filters or {})
+    date_range = _normalize_value(filters.pop('date_range', None)) if filters.get('date_range') else None
+    activity = activity_type.lower() if activity_type else None
+    return (version, kind, activity, normalize_filters(filters), date_range)
+
+
+def _copy_result(result):
+    """Copia del resultado (superficial con Copy-on-Write): el llamador no puede alterar la caché"""
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return independent_copy(result)
+    if isinstance(result, tuple):
+        return tuple(_copy_result(item) for item in result)
+    if isinstance(result, dict):
+        return dict(result)
+    return result
+
+
+def _estimate_bytes(result):
+    """Tamaño aproximado en memoria de un resultado"""
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True, deep=False).sum())
+    if isinstance(result, pd.Series):
+        return int(result.memory_usage(index=True, deep=False))
+    if isinstance(result, (tuple, list)):
+        return sum(_estimate_bytes(item) for item in result)
+    if isinstance(result, dict):
+        return 64 * (len(result) + 1)
+    return 64
+
+
+class CalculationCache:
+    """Caché LRU de resultados acotada por número de entradas y memoria, con contadores de aciertos y fallos"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        # id(frame) -> (referencia débil, firma) de los DataFrames entregados por DataProcessor
+        self._frames = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register(self, frame, signature):
+        """Asocia un DataFrame entregado por DataProcessor con la firma de su consulta"""
+        frame_id = id(frame)
+
+        def forget(_, frame_id=frame_id):
+            with self._lock:
+                entry = self._frames.get(frame_id)
+                if entry is not None and entry[0]() is None:
+                    del self._frames[frame_id]
+
+        with self._lock:
+            self._frames[frame_id] = (weakref.ref(frame, forget), signature)
+        return frame
+
+    def signature_of(self, frame):
+        """Firma registrada para el DataFrame (None si no proviene de una consulta registrada)"""
+        with self._lock:
+            entry = self._frames.get(id(frame))
+        if entry is None or entry[0]() is not frame:
+            return None
+        return entry[1]
+
+    def get_or_compute(self, key, compute):
+        """Retorna el resultado en caché para key o lo calcula y lo guarda"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy_result(self._entries[key][0])
+            self.misses += 1
+
+        result = compute()
+        size = _estimate_bytes(result)
+
+        with self._lock:
+            if size <= self.max_bytes:
+                if key in self._entries:
+                    self._size -= self._entries.pop(key)[1]
+                self._entries[key] = (result, size)
+                self._size += size
+                while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self._size -= evicted_size
+                    self.evictions += 1
+
+        return _copy_result(result)
+
+    def clear(self):
+        """Descarta todos los resultados guardados"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self):
+        """Resumen de uso de la caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups * 100 if lookups else 0.0
+            }
+
+
+def memoized(method):
+    """
+    Decorador para métodos de EpidemiologicalCalculations que reciben los datos filtrados.
+
+    El resultado se guarda bajo (método, firma de la consulta, argumentos adicionales,
+    versión del registro de establecimientos) cuando los datos provienen de
+    DataProcessor.get_filtered_data o get_cube_cells; con cualquier otro DataFrame
+    (derivado o construido a mano) o argumentos no hashables se calcula sin caché.
+    """
+    @functools.wraps(method)
+    def wrapper(self, filtered_data, *args, **kwargs):
+        cache = getattr(self.data_processor, 'calculation_cache', None)
+        signature = cache.signature_of(filtered_data) if cache is not None else None
+        arguments = (args, tuple(sorted(kwargs.items())))
+        try:
+            hash(arguments)
+        except TypeError:
+            signature = None
+        if signature is None:
+            return method(self, filtered_data, *args, **kwargs)
+        return cache.get_or_compute(
+            (method.__name__, signature, arguments, getattr(self, 'facilities_version', None)),
+            lambda: method(self, filtered_data, *args, **kwargs)
+        )
+    return wrapper
@@ -1,14 +1,21 @@
 import pandas as pd
 import numpy as np
 import os
-import psycopg2
+from utils.aggregation_cube import STATUS_MEASURES, is_cube_cells
+from utils.calculation_cache import memoized
+from utils.db_pool import get_database_pool
+from utils.facility_registry import get_facility_registry
+from utils.time_buckets import aggregate_by_period
 
 class EpidemiologicalCalculations:
     def __init__(self, data_processor):
         self.data_processor = data_processor
         self.database_url = os.environ.get('DATABASE_URL')
-        # Cargar datos de establecimientos desde base de datos
-        self.health_facilities = self._load_health_facilities_from_db()
+        # Establecimientos desde el registro en memoria del proceso (sin consultas mientras
+        # siga vigente); su versión forma parte de la clave de los cálculos memoizados
+        self.health_facilities, self.facilities_version = get_facility_registry().snapshot(
+            self._load_health_facilities_from_db
+        )
         
     def _load_health_facilities_from_db(self):
         """Carga datos de establecimientos desde PostgreSQL"""
@@ -101,16 +108,15 @@ class EpidemiologicalCalculations:
         }
         
         try:
-            # Intentar cargar desde base de datos
-            conn = psycopg2.connect(self.database_url)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT cod_renipress, nombre_establecimiento, total_viviendas 
-                FROM health_facilities 
-                WHERE activo = TRUE
-            """)
-            results = cursor.fetchall()
-            conn.close()
+            # Intentar cargar desde base de datos (conexión prestada por el pool compartido)
+            with get_database_pool(self.database_url).connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT cod_renipress, nombre_establecimiento, total_viviendas 
+                    FROM health_facilities 
+                    WHERE activo = TRUE
+                """)
+                results = cursor.fetchall()
             
             # Convertir a diccionario en el formato esperado
             db_facilities = {}
@@ -131,67 +137,99 @@ class EpidemiologicalCalculations:
                 5044: {'name': 'GUSTAVO LANATTA LUJAN', 'total_houses': 4282}
             }
     
+    @memoized
+    def calculate_facility_indices(self, filtered_data):
+        """
+        Calculate houses, containers and entomological indices for every health facility
+        in a single grouped aggregation
+        Aedic Index: (Positive Houses / Inspected Houses) * 100
+        Container Index: (Positive containers / Total containers inspected) * 100
+        Breteau Index: (Positive containers / Houses inspected) * 100
+        
+        Accepts filtered rows or aggregation cube cells (DataProcessor.get_cube_cells).
+        """
+        if filtered_data.empty:
+            return pd.DataFrame()
+        
+        if is_cube_cells(filtered_data):
+            # Cells already hold the per-row measures summed
+            measures = filtered_data[['viviendas_inspeccionadas', 'viviendas_positivas',
+                                      'recipientes_inspeccionados', 'recipientes_positivos']]
+            measures.columns = ['inspected_houses', 'viviendas_positivas', 'containers_inspected', 'containers_positive']
+        else:
+            # Per-row container counts reduced over the container type axis of the block
+            block = self.data_processor.get_container_block(filtered_data)
+            matrix = self.data_processor.container_matrix
+            
+            # Per-row measures, then one groupby-sum by health facility code
+            inspected = filtered_data['atencion_vivienda_indicador'] == 1
+            measures = pd.DataFrame({
+                'inspected_houses': inspected.astype('int64'),
+                'viviendas_positivas': (inspected & (filtered_data['viv_positiva'] == 1)).astype('int64'),
+                'containers_inspected': block[:, :, matrix.status_position('_I')].sum(axis=1, dtype='int64'),
+                'containers_positive': block[:, :, matrix.status_position('_P')].sum(axis=1, dtype='int64')
+            }, index=filtered_data.index)
+        totals = measures.groupby(filtered_data['cod_renipress'], observed=True).sum()
+        
+        if totals.empty:
+            return pd.DataFrame()
+        
+        # Facility name from the first record of each group
+        first_rows = ~filtered_data['cod_renipress'].duplicated()
+        facility_names = dict(zip(filtered_data.loc[first_rows, 'cod_renipress'].tolist(),
+                                  filtered_data.loc[first_rows, 'localidad_eess'].tolist()))
+        
+        codes = totals.index.tolist()
+        houses_inspected = totals['inspected_houses'].tolist()
+        houses_positive = totals['viviendas_positivas'].tolist()
+        # Container totals stay NumPy scalars, as the per-column .sum() they replace
+        containers_inspected = totals['containers_inspected'].to_numpy()
+        containers_positive = totals['containers_positive'].to_numpy()
+        
+        def percentage(numerator, denominator):
+            return round(numerator / denominator * 100, 2) if denominator > 0 else 0
+        
+        return pd.DataFrame({
+            'cod_renipress': codes,
+            'localidad_eess': [facility_names.get(code, "Desconocido") for code in codes],
+            'total_houses': [self.health_facilities.get(code, {}).get('total_houses', 0) for code in codes],
+            'inspected_houses': houses_inspected,
+            'viviendas_positivas': houses_positive,
+            'containers_inspected': [int(value) for value in containers_inspected],
+            'containers_positive': [int(value) for value in containers_positive],
+            'aedic_index': [percentage(pos, total) for pos, total in zip(houses_positive, houses_inspected)],
+            'container_index': [percentage(pos, total) for pos, total in zip(containers_positive, containers_inspected)],
+            'breteau_index': [percentage(pos, total) for pos, total in zip(containers_positive, houses_inspected)]
+        })
+    
+    @memoized
     def calculate_aedic_index(self, filtered_data):
         """
         Calculate Aedic Index for each health facility
         Formula: (Positive Houses / Inspected Houses) * 100
         """
-        results = []
-        
-        # Group by health facility code
-        grouped = filtered_data.groupby('cod_renipress')
+        indices = self.calculate_facility_indices(filtered_data)
+        if indices.empty:
+            return indices
         
-        for renipress_code, group in grouped:
-            # Count inspected houses (atencion_vivienda_indicador == 1)
-            inspected_houses = len(group[group['atencion_vivienda_indicador'] == 1])
-            
-            # Count positive houses (viv_positiva == 1 and atencion_vivienda_indicador == 1)
-            positive_houses = len(group[
-                (group['viv_positiva'] == 1) & 
-                (group['atencion_vivienda_indicador'] == 1)
-            ])
-            
-            # Calculate Aedic Index
-            aedic_index = (positive_houses / inspected_houses * 100) if inspected_houses > 0 else 0
-            
-            # Get health facility info
-            facility_info = self.health_facilities.get(renipress_code, {})
-            facility_name = group['localidad_eess'].iloc[0] if len(group) > 0 else "Desconocido"
-            
-            results.append({
-                'cod_renipress': renipress_code,
-                'localidad_eess': facility_name,
-                'total_houses': facility_info.get('total_houses', 0),
-                'inspected_houses': inspected_houses,
-                'viviendas_positivas': positive_houses,
-                'aedic_index': round(aedic_index, 2)
-            })
-        
-        return pd.DataFrame(results)
+        return indices[['cod_renipress', 'localidad_eess', 'total_houses', 'inspected_houses',
+                        'viviendas_positivas', 'aedic_index']]
     
+    @memoized
     def calculate_container_statistics(self, filtered_data):
-        """Calculate statistics for all container types"""
-        containers = self.data_processor.get_container_columns()
-        status_labels = self.data_processor.get_container_status_labels()
-        
-        results = []
+        """Calculate statistics for all container types (filtered rows or cube cells)"""
+        matrix = self.data_processor.container_matrix
+        totals = self.data_processor.get_container_totals(filtered_data)
         
-        for container_type, columns in containers.items():
-            container_stats = {'container_type': container_type}
-            
-            # Group by status suffix
-            for suffix, label in status_labels.items():
-                matching_columns = [col for col in columns if col.endswith(suffix)]
-                if matching_columns:
-                    total = filtered_data[matching_columns].sum().sum()
-                    container_stats[label] = total
-            
-            results.append(container_stats)
+        # Status columns a container type does not record stay empty
+        stats = totals.where(matrix.has_status()).dropna(axis=1, how='all')
+        stats = stats.rename(columns=matrix.status_labels).rename_axis('container_type')
         
-        return pd.DataFrame(results)
+        return stats.reset_index()
     
+    @memoized
     def calculate_larvicide_consumption(self, filtered_data):
-        """Calculate total and per-facility larvicide consumption"""
+        """Calculate total and per-facility larvicide consumption (filtered rows or cube cells)"""
         if 'consumo_larvicida' not in filtered_data.columns:
             return pd.DataFrame(), 0
         
@@ -199,7 +237,7 @@ class EpidemiologicalCalculations:
         total_consumption = filtered_data['consumo_larvicida'].sum()
         
         # Consumption by health facility
-        facility_consumption = filtered_data.groupby(['cod_renipress', 'localidad_eess'])['consumo_larvicida'].sum().reset_index()
+        facility_consumption = filtered_data.groupby(['cod_renipress', 'localidad_eess'], observed=True)['consumo_larvicida'].sum().reset_index()
         facility_consumption = facility_consumption.sort_values('consumo_larvicida', ascending=False)
         
         return facility_consumption, total_consumption
@@ -235,73 +273,155 @@ class EpidemiologicalCalculations:
         
         return summary
     
+    @memoized
+    def calculate_period_trends(self, filtered_data, freq='M', size=1):
+        """
+        Inspected houses, positives, working days, larvicide and Aedic index per time bucket
+        (months, weeks or epidemiological weeks of any size; filtered rows or cube cells)
+        """
+        return aggregate_by_period(filtered_data, freq, size)
+    
+    @memoized
     def calculate_monthly_trends(self, filtered_data):
         """Calculate monthly trends for key metrics"""
-        if 'fecha_inspeccion' not in filtered_data.columns:
+        periods = self.calculate_period_trends(filtered_data, 'M')
+        if periods.empty:
             return pd.DataFrame()
         
-        # Create monthly aggregation
-        filtered_data['month_year'] = filtered_data['fecha_inspeccion'].dt.to_period('M')
-        
-        monthly_stats = filtered_data.groupby('month_year').agg({
-            'atencion_vivienda_indicador': lambda x: (x == 1).sum(),  # Inspected houses
-            'viv_positiva': lambda x: ((x == 1) & (filtered_data.loc[x.index, 'atencion_vivienda_indicador'] == 1)).sum(),  # Positive houses
-            'consumo_larvicida': 'sum'
-        }).reset_index()
-        
+        monthly_stats = pd.DataFrame({
+            'month_year': periods['inicio'].dt.to_period('M'),
+            'atencion_vivienda_indicador': periods['viviendas_inspeccionadas'],  # Inspected houses
+            'viv_positiva': periods['viviendas_positivas'],  # Positive houses
+            'consumo_larvicida': periods['consumo_larvicida']
+        })
         monthly_stats['month_year_str'] = monthly_stats['month_year'].astype(str)
-        monthly_stats['aedic_index'] = (monthly_stats['viv_positiva'] / monthly_stats['atencion_vivienda_indicador'] * 100).fillna(0)
+        monthly_stats['aedic_index'] = periods['indice_aedico']
         
         return monthly_stats
 
-    def calculate_coverage_percentages(self, filtered_data):
-        """Calculate coverage percentages for each health facility"""
-        results = []
-        
-        # Group by health facility code
-        grouped = filtered_data.groupby('cod_renipress')
-        
-        for renipress_code, group in grouped:
-            # Get facility info
-            facility_info = self.health_facilities.get(renipress_code, {})
-            facility_name = group['localidad_eess'].iloc[0] if len(group) > 0 else "Desconocido"
-            total_houses = facility_info.get('total_houses', 0)
-            
-            # Count by house status
-            inspected = len(group[group['atencion_vivienda_indicador'] == 1])
-            closed = len(group[group['atencion_vivienda_indicador'] == 2])
-            reluctant = len(group[group['atencion_vivienda_indicador'] == 3])
-            uninhabited = len(group[group['atencion_vivienda_indicador'] == 4])
-            
-            # Calculate non-intervened houses
-            total_intervened = inspected + closed + reluctant + uninhabited
-            non_intervened = max(0, total_houses - total_intervened)
-            
-            # Calculate percentages
-            def calc_percentage(value, total):
-                return (value / total * 100) if total > 0 else 0
-            
-            results.append({
-                'cod_renipress': renipress_code,
-                'localidad_eess': facility_name,
-                'total_houses': total_houses,
-                'viv_inspeccionadas': inspected,
-                'viv_cerradas': closed,
-                'viv_renuentes': reluctant,
-                'viv_deshabitadas': uninhabited,
-                'viv_no_intervenidas': non_intervened,
-                'porc_inspeccionadas': calc_percentage(inspected, total_houses),
-                'porc_cerradas': calc_percentage(closed, total_houses),
-                'porc_renuentes': calc_percentage(reluctant, total_houses),
-                'porc_deshabitadas': calc_percentage(uninhabited, total_houses),
-                'porc_no_intervenidas': calc_percentage(non_intervened, total_houses),
-                'cobertura_total': calc_percentage(total_intervened, total_houses)
-            })
+    @memoized
+    def calculate_monthly_aedic_by_facility(self, filtered_data):
+        """
+        Monthly Aedic index for every health facility (facility x month) in a single
+        grouped aggregation (filtered rows or cube cells)
+        """
+        if is_cube_cells(filtered_data):
+            cells = filtered_data[filtered_data['fecha'].notna()]
+            codes = cells['cod_renipress']
+            months = cells['month']
+            measures = cells[['viviendas_inspeccionadas', 'viviendas_positivas']]
+        else:
+            if 'fecha_inspeccion' not in filtered_data.columns:
+                return pd.DataFrame()
+            rows = filtered_data[filtered_data['fecha_inspeccion'].notna()]
+            codes = rows['cod_renipress']
+            months = rows['fecha_inspeccion'].dt.to_period('M')
+            inspected = rows['atencion_vivienda_indicador'] == 1
+            measures = pd.DataFrame({
+                'viviendas_inspeccionadas': inspected.astype('int64'),
+                'viviendas_positivas': (inspected & (rows['viv_positiva'] == 1)).astype('int64')
+            }, index=rows.index)
+        
+        if measures.empty:
+            return pd.DataFrame()
+        
+        # Facilities in order of first appearance, months in chronological order
+        facility_order = pd.Categorical(codes, categories=pd.unique(codes.dropna()))
+        monthly = measures.groupby(
+            [pd.Series(facility_order, index=measures.index, name='establecimiento_id'), months.rename('mes_year')],
+            observed=True
+        ).sum().reset_index()
+        
+        if monthly.empty:
+            return pd.DataFrame()
+        
+        establishment_names = {code: info['name'] for code, info in self.data_processor.health_facilities.items()}
+        facility_ids = monthly['establecimiento_id'].astype(codes.dtype)
+        inspected_houses = monthly['viviendas_inspeccionadas']
+        
+        return pd.DataFrame({
+            'establecimiento_id': facility_ids,
+            'establecimiento': [establishment_names.get(code, f"Establecimiento {code}") for code in facility_ids.tolist()],
+            'mes_year': monthly['mes_year'].astype(str),
+            'viviendas_inspeccionadas': inspected_houses,
+            'viviendas_positivas': monthly['viviendas_positivas'],
+            'indice_aedico': (monthly['viviendas_positivas'] / inspected_houses.where(inspected_houses > 0) * 100).fillna(0)
+        })
+    
+    def _status_counts(self, filtered_data, by):
+        """
+        Houses per attention status code (1-4) for every value of the grouping column
+        with a single bincount (filtered rows or cube cells)
+        
+        Returns (sorted group values, group code of each row, counts matrix of shape (groups, 4))
+        """
+        group_codes, groups = pd.factorize(filtered_data[by], sort=True)
+        valid = group_codes >= 0
+        
+        if is_cube_cells(filtered_data):
+            counts = np.column_stack([
+                np.bincount(group_codes[valid], weights=filtered_data[column].to_numpy()[valid], minlength=len(groups))
+                for column in STATUS_MEASURES.values()
+            ]).astype('int64')
+        else:
+            status = pd.to_numeric(filtered_data['atencion_vivienda_indicador'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            valid &= np.isin(status, list(STATUS_MEASURES))
+            flat_codes = group_codes[valid] * 4 + status[valid].astype('int64') - 1
+            counts = np.bincount(flat_codes, minlength=len(groups) * 4).reshape(len(groups), 4)
+        
+        return groups, group_codes, counts
+    
+    @memoized
+    def calculate_coverage_percentages(self, filtered_data, by='cod_renipress'):
+        """
+        Calculate coverage percentages for each health facility, or rolled up to another
+        level such as 'nombre_prov' (filtered rows or cube cells)
+        """
+        if filtered_data.empty or by not in filtered_data.columns:
+            return pd.DataFrame()
         
-        return pd.DataFrame(results)
+        groups, group_codes, counts = self._status_counts(filtered_data, by)
+        if len(groups) == 0:
+            return pd.DataFrame()
+        
+        def total_houses_of(codes):
+            return np.array([self.health_facilities.get(code, {}).get('total_houses', 0) for code in codes], dtype='int64')
+        
+        # Facility name from the first record of each group
+        first_rows = (group_codes >= 0) & ~filtered_data['cod_renipress'].duplicated().to_numpy()
+        if by == 'cod_renipress':
+            total_houses = total_houses_of(groups.tolist())
+            facility_names = dict(zip(filtered_data.loc[first_rows, 'cod_renipress'].tolist(),
+                                      filtered_data.loc[first_rows, 'localidad_eess'].tolist()))
+            result = pd.DataFrame({
+                'cod_renipress': groups,
+                'localidad_eess': [facility_names.get(code, "Desconocido") for code in groups.tolist()]
+            })
+        else:
+            # Each facility's registered houses count once, in the group where it first appears
+            facility_codes = filtered_data.loc[first_rows, 'cod_renipress'].tolist()
+            total_houses = np.bincount(group_codes[first_rows], weights=total_houses_of(facility_codes),
+                                       minlength=len(groups)).astype('int64')
+            result = pd.DataFrame({by: groups})
+        
+        intervened = counts.sum(axis=1)
+        non_intervened = np.maximum(0, total_houses - intervened)
+        houses = np.column_stack([counts, non_intervened, intervened])
+        percentages = np.divide(houses * 100, total_houses[:, None], out=np.zeros(houses.shape), where=total_houses[:, None] > 0)
+        
+        result['total_houses'] = total_houses
+        for position, column in enumerate(['viv_inspeccionadas', 'viv_cerradas', 'viv_renuentes',
+                                           'viv_deshabitadas', 'viv_no_intervenidas']):
+            result[column] = houses[:, position]
+        for position, column in enumerate(['porc_inspeccionadas', 'porc_cerradas', 'porc_renuentes',
+                                           'porc_deshabitadas', 'porc_no_intervenidas', 'cobertura_total']):
+            result[column] = percentages[:, position]
+        
+        return result
 
+    @memoized
     def calculate_febril_cases(self, filtered_data):
-        """Calculate febril cases by health facility"""
+        """Calculate febril cases by health facility (filtered rows or cube cells)"""
         if 'febriles' not in filtered_data.columns:
             return pd.DataFrame(), 0
         
@@ -309,158 +429,74 @@ class EpidemiologicalCalculations:
         total_febriles = filtered_data['febriles'].sum()
         
         # Febril cases by health facility
-        facility_febriles = filtered_data.groupby(['cod_renipress', 'localidad_eess'])['febriles'].sum().reset_index()
+        facility_febriles = filtered_data.groupby(['cod_renipress', 'localidad_eess'], observed=True)['febriles'].sum().reset_index()
         facility_febriles = facility_febriles.sort_values('febriles', ascending=False)
         
         return facility_febriles, total_febriles
 
+    @memoized
     def calculate_container_index(self, filtered_data):
         """
         Calculate Container Index for each health facility
         Formula: (Positive containers / Total containers inspected) * 100
         """
-        results = []
-        containers = self.data_processor.get_container_columns()
+        indices = self.calculate_facility_indices(filtered_data)
+        if indices.empty:
+            return indices
         
-        # Group by health facility code
-        grouped = filtered_data.groupby('cod_renipress')
-        
-        for renipress_code, group in grouped:
-            total_containers_inspected = 0
-            total_positive_containers = 0
-            
-            # Sum all container types
-            for container_type, columns in containers.items():
-                # Count inspected containers (columns ending with _I)
-                inspected_cols = [col for col in columns if col.endswith('_I') and col in group.columns]
-                for col in inspected_cols:
-                    total_containers_inspected += group[col].sum()
-                
-                # Count positive containers (columns ending with _P) 
-                positive_cols = [col for col in columns if col.endswith('_P') and col in group.columns]
-                for col in positive_cols:
-                    total_positive_containers += group[col].sum()
-            
-            # Calculate Container Index
-            container_index = (total_positive_containers / total_containers_inspected * 100) if total_containers_inspected > 0 else 0
-            
-            # Get health facility info
-            facility_name = group['localidad_eess'].iloc[0] if len(group) > 0 else "Desconocido"
-            
-            results.append({
-                'cod_renipress': renipress_code,
-                'localidad_eess': facility_name,
-                'containers_inspected': int(total_containers_inspected),
-                'containers_positive': int(total_positive_containers),
-                'container_index': round(container_index, 2)
-            })
-        
-        return pd.DataFrame(results)
+        return indices[['cod_renipress', 'localidad_eess', 'containers_inspected',
+                        'containers_positive', 'container_index']]
 
+    @memoized
     def calculate_breteau_index(self, filtered_data):
         """
         Calculate Breteau Index for each health facility
         Formula: (Positive containers / Houses inspected) * 100
         """
-        results = []
-        containers = self.data_processor.get_container_columns()
+        indices = self.calculate_facility_indices(filtered_data)
+        if indices.empty:
+            return indices
         
-        # Group by health facility code
-        grouped = filtered_data.groupby('cod_renipress')
-        
-        for renipress_code, group in grouped:
-            # Count inspected houses (atencion_vivienda_indicador == 1)
-            inspected_houses = len(group[group['atencion_vivienda_indicador'] == 1])
-            
-            total_positive_containers = 0
-            
-            # Sum all positive containers from all types
-            for container_type, columns in containers.items():
-                # Count positive containers (columns ending with _P)
-                positive_cols = [col for col in columns if col.endswith('_P') and col in group.columns]
-                for col in positive_cols:
-                    total_positive_containers += group[col].sum()
-            
-            # Calculate Breteau Index
-            breteau_index = (total_positive_containers / inspected_houses * 100) if inspected_houses > 0 else 0
-            
-            # Get health facility info
-            facility_name = group['localidad_eess'].iloc[0] if len(group) > 0 else "Desconocido"
-            
-            results.append({
-                'cod_renipress': renipress_code,
-                'localidad_eess': facility_name,
-                'houses_inspected': inspected_houses,
-                'containers_positive': int(total_positive_containers),
-                'breteau_index': round(breteau_index, 2)
-            })
-        
-        return pd.DataFrame(results)
+        return indices[['cod_renipress', 'localidad_eess', 'inspected_houses',
+                        'containers_positive', 'breteau_index']].rename(columns={'inspected_houses': 'houses_inspected'})
         
+    @memoized
     def calculate_entomological_indices_summary(self, filtered_data):
         """Calculate summary of all entomological indices"""
-        aedic_data = self.calculate_aedic_index(filtered_data)
-        container_data = self.calculate_container_index(filtered_data)
-        breteau_data = self.calculate_breteau_index(filtered_data)
+        # The three indices come from the same grouped aggregation
+        indices = self.calculate_facility_indices(filtered_data)
         
         summary = {}
         
-        if not aedic_data.empty:
-            summary['IA_promedio'] = aedic_data['aedic_index'].mean()
-            summary['IA_maximo'] = aedic_data['aedic_index'].max()
-        
-        if not container_data.empty:
-            summary['IC_promedio'] = container_data['container_index'].mean()
-            summary['IC_maximo'] = container_data['container_index'].max()
-            
-        if not breteau_data.empty:
-            summary['IB_promedio'] = breteau_data['breteau_index'].mean()
-            summary['IB_maximo'] = breteau_data['breteau_index'].max()
+        if not indices.empty:
+            summary['IA_promedio'] = indices['aedic_index'].mean()
+            summary['IA_maximo'] = indices['aedic_index'].max()
+            summary['IC_promedio'] = indices['container_index'].mean()
+            summary['IC_maximo'] = indices['container_index'].max()
+            summary['IB_promedio'] = indices['breteau_index'].mean()
+            summary['IB_maximo'] = indices['breteau_index'].max()
         
         return summary
     
+    @memoized
     def calculate_weekly_surveillance_days(self, filtered_data):
-        """Calculate surveillance days per week"""
-        if 'fecha_inspeccion' not in filtered_data.columns:
+        """Calculate surveillance days per week (Monday as start of week)"""
+        periods = self.calculate_period_trends(filtered_data, 'W')
+        if periods.empty:
             return pd.DataFrame()
         
-        # Create a copy and ensure dates are datetime objects
-        data_copy = filtered_data.copy()
-        data_copy['fecha_inspeccion'] = pd.to_datetime(data_copy['fecha_inspeccion'], errors='coerce')
-        
-        # Remove rows with invalid dates
-        data_copy = data_copy.dropna(subset=['fecha_inspeccion'])
-        
-        if data_copy.empty:
-            return pd.DataFrame()
-        
-        # Calculate week start consistently (Monday as start of week)
-        data_copy['week_start'] = data_copy['fecha_inspeccion'] - pd.to_timedelta(data_copy['fecha_inspeccion'].dt.weekday, unit='D')
-        data_copy['week_start'] = data_copy['week_start'].dt.date  # Convert to date to normalize times
-        
-        # Create a unique week identifier using the week start date
-        data_copy['week_year'] = data_copy['week_start'].astype(str)
-        
-        # Group by week_start only (more reliable than week_year + week_start)
-        weekly_stats = data_copy.groupby('week_start').agg({
-            'fecha_inspeccion': lambda x: x.dt.date.nunique(),  # Unique days per week
-            'atencion_vivienda_indicador': lambda x: (x == 1).sum(),  # Total inspections
-            'viv_positiva': lambda x: ((x == 1) & (data_copy.loc[x.index, 'atencion_vivienda_indicador'] == 1)).sum()  # Positive houses
-        }).reset_index()
-        
-        weekly_stats.columns = ['semana_inicio', 'dias_vigilancia', 'inspecciones_totales', 'viviendas_positivas']
-        
-        # Convert semana_inicio back to datetime for display formatting
-        weekly_stats['semana_inicio'] = pd.to_datetime(weekly_stats['semana_inicio'])
+        weekly_stats = pd.DataFrame({
+            'semana_inicio': periods['inicio'],
+            'dias_vigilancia': periods['dias_trabajados'],  # Unique days per week
+            'inspecciones_totales': periods['viviendas_inspeccionadas'],  # Total inspections
+            'viviendas_positivas': periods['viviendas_positivas']  # Positive houses
+        })
         
         # Format week display
         weekly_stats['week_display'] = weekly_stats['semana_inicio'].dt.strftime('%d/%m/%Y') + ' - ' + \
-                                      (weekly_stats['semana_inicio'] + pd.Timedelta(days=6)).dt.strftime('%d/%m/%Y')
+                                      periods['fin'].dt.strftime('%d/%m/%Y')
         
         # Calculate surveillance intensity (inspections per day)
         weekly_stats['intensity'] = weekly_stats['inspecciones_totales'] / weekly_stats['dias_vigilancia'].replace(0, 1)
         
-        # Sort by week start date
-        weekly_stats = weekly_stats.sort_values('semana_inicio')
-        
         return weekly_stats
@@ -0,0 +1,181 @@
+"""
+Analítica de cerco
+Calcula en una sola pasada agrupada (establecimiento × departamento × mes) la
+efectividad por establecimiento, la cobertura geográfica por departamento, la
+densidad de intervención y las tendencias mensuales, sin modificar los datos
+de entrada
+"""
+import numpy as np
+import pandas as pd
+
+# Estados de atención que cuentan como vivienda intervenida
+ATTENDED_STATUSES = [1, 2, 3, 4]
+
+# Radio del cerco alrededor de cada vivienda positiva (m)
+CERCO_RADIUS_M = 200
+
+
+def _codes(data, column):
+    """Códigos por fila (orden de aparición, -1 para nulos) y valores de una columna"""
+    if column not in data.columns:
+        return np.full(len(data), -1, dtype=np.int64), pd.Index([])
+    codes, values = pd.factorize(data[column])
+    return codes.astype(np.int64), values
+
+
+def _month_codes(data):
+    """Mes de cada fila como entero desde 1970-01 (-1 sin fecha)"""
+    if 'fecha_inspeccion' not in data.columns:
+        return np.full(len(data), -1, dtype=np.int64)
+    dates = pd.to_datetime(data['fecha_inspeccion'], errors='coerce')
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_localize(None)
+    valid = dates.notna().to_numpy()
+    months = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+    return np.where(valid, months, -1)
+
+
+def _rollup(keys, weights, size):
+    """Suma de pesos por clave (las claves -1 se descartan)"""
+    valid = keys >= 0
+    return np.bincount(keys[valid], weights=weights[valid], minlength=size).astype(np.int64)
+
+
+def _effectiveness(houses, positive):
+    """Porcentaje de viviendas intervenidas sin detección positiva"""
+    return np.where(houses > 0, (houses - positive) / np.maximum(houses, 1) * 100, 0.0)
+
+
+def summarize_cerco(data):
+    """
+    Tablas de analítica de cerco a partir de las filas filtradas.
+
+    Args:
+        data: Filas filtradas de DataProcessor (actividad cerco)
+
+    Returns:
+        Tupla (efectividad por establecimiento, cobertura por departamento como
+        diccionario, densidad de intervención, tendencias mensuales)
+    """
+    if data.empty:
+        return pd.DataFrame(), {}, pd.DataFrame(), pd.DataFrame()
+
+    status = data['atencion_vivienda_indicador'].to_numpy()
+    attended = np.isin(status, ATTENDED_STATUSES)
+    positive = (status == 1) & (data['viv_positiva'].to_numpy() == 1)
+
+    facility_codes, facilities = _codes(data, 'localidad_eess')
+    department_codes, departments = _codes(data, 'departamento_x')
+    month_codes = _month_codes(data)
+
+    # Pasada agrupada: (establecimiento, departamento, mes) con +1 para que los nulos (-1) queden en 0
+    dims = (len(facilities) + 1, len(departments) + 1)
+    month_offset = month_codes[month_codes >= 0].min() if (month_codes >= 0).any() else 0
+    month_keys = np.where(month_codes >= 0, month_codes - month_offset + 1, 0)
+    fine_keys = ((month_keys * dims[1]) + department_codes + 1) * dims[0] + facility_codes + 1
+    groups, group_index = np.unique(fine_keys, return_inverse=True)
+    rows = np.bincount(group_index, minlength=len(groups))
+    houses = np.bincount(group_index, weights=attended, minlength=len(groups))
+    positives = np.bincount(group_index, weights=positive, minlength=len(groups))
+
+    group_facility = groups % dims[0] - 1
+    group_department = (groups // dims[0]) % dims[1] - 1
+    group_month = groups // (dims[0] * dims[1]) - 1
+
+    # Efectividad y puntaje de intervención por establecimiento (orden de aparición)
+    facility_houses = _rollup(group_facility, houses, len(facilities))
+    facility_positive = _rollup(group_facility, positives, len(facilities))
+    with_facility = np.flatnonzero(facility_codes >= 0)
+    first_rows = with_facility[np.unique(facility_codes[with_facility], return_index=True)[1]]
+    renipress = data['cod_renipress'].to_numpy()[first_rows] if 'cod_renipress' in data.columns else 0
+    facility_effectiveness = _effectiveness(facility_houses, facility_positive)
+
+    effectiveness = pd.DataFrame({
+        'cod_renipress': renipress,
+        'localidad_eess': np.asarray(facilities, dtype=object),
+        'total_houses': facility_houses,
+        'positive_houses': facility_positive,
+        'effectiveness_percentage': facility_effectiveness,
+        'intervention_score': np.minimum(10, facility_houses / np.maximum(1, facility_positive) * 2)
+    })
+
+    # Densidad: viviendas intervenidas por manzana distinta del establecimiento
+    block_codes, blocks = _codes(data, 'codigo_manzana')
+    valid = (facility_codes >= 0) & (block_codes >= 0)
+    pairs = np.unique(facility_codes[valid] * (len(blocks) + 1) + block_codes[valid])
+    facility_blocks = np.bincount(pairs // (len(blocks) + 1), minlength=len(facilities))
+    density = pd.DataFrame({
+        'localidad_eess': np.asarray(facilities, dtype=object),
+        'intervention_density': facility_houses / np.maximum(1, facility_blocks),
+        'effectiveness': facility_effectiveness,
+        'total_houses': facility_houses
+    })
+
+    # Cobertura por departamento (orden de aparición)
+    coverage = {}
+    if 'departamento_x' in data.columns:
+        department_houses = _rollup(group_department, houses, len(departments))
+        department_positive = _rollup(group_department, positives, len(departments))
+        valid = (group_department >= 0) & (group_facility >= 0)
+        pairs = np.unique(group_department[valid] * dims[0] + group_facility[valid])
+        department_facilities = np.bincount(pairs // dims[0], minlength=len(departments))
+        department_effectiveness = _effectiveness(department_houses, department_positive)
+        for position, department in enumerate(departments):
+            coverage[department] = {
+                'facilities': int(department_facilities[position]),
+                'houses': int(department_houses[position]),
+                'effectiveness': float(department_effectiveness[position])
+            }
+
+    # Tendencias mensuales en orden cronológico
+    months, month_index = np.unique(group_month[group_month >= 0], return_inverse=True)
+    monthly = pd.DataFrame(columns=['month_year', 'detections', 'effectiveness', 'coverage', 'response_time'])
+    if len(months):
+        dated = group_month >= 0
+        month_rows = np.bincount(month_index, weights=rows[dated], minlength=len(months))
+        month_houses = np.bincount(month_index, weights=houses[dated], minlength=len(months))
+        month_positive = np.bincount(month_index, weights=positives[dated], minlength=len(months)).astype(np.int64)
+        monthly = pd.DataFrame({
+            'month_year': pd.PeriodIndex((months + month_offset).astype('datetime64[M]'), freq='M').astype(str),
+            'detections': month_positive,
+            'effectiveness': _effectiveness(month_houses, month_positive),
+            'coverage': month_houses / month_rows * 100,
+            # Tiempo de respuesta simplificado (valor de referencia)
+            'response_time': 5.0
+        })
+
+    return effectiveness, coverage, density, monthly
+
+
+def summarize_positive_surroundings(data, pairs):
+    """
+    Viviendas alrededor de cada vivienda positiva.
+
+    Args:
+        data: DataFrame completo de DataProcessor (las posiciones de pairs se refieren a él)
+        pairs: Pares de SpatialIndex.pairs_within (posicion_positiva, posicion_vecina, distancia_m)
+
+    Returns:
+        DataFrame por vivienda positiva con localidad_eess, viviendas, inspeccionadas
+        y positivas en el radio (sin contar la propia vivienda)
+    """
+    columns = ['posicion', 'localidad_eess', 'viviendas_en_radio', 'inspeccionadas_en_radio', 'positivas_en_radio']
+    if pairs.empty:
+        return pd.DataFrame(columns=columns)
+
+    centers, center_index = np.unique(pairs['posicion_positiva'].to_numpy(), return_inverse=True)
+    others = (pairs['posicion_positiva'] != pairs['posicion_vecina']).to_numpy()
+    owners = center_index[others]
+    neighbour_positions = pairs['posicion_vecina'].to_numpy()[others]
+
+    status = data['atencion_vivienda_indicador'].to_numpy()[neighbour_positions]
+    inspected = status == 1
+    positive = inspected & (data['viv_positiva'].to_numpy()[neighbour_positions] == 1)
+
+    return pd.DataFrame({
+        'posicion': centers,
+        'localidad_eess': data['localidad_eess'].to_numpy()[centers] if 'localidad_eess' in data.columns else '',
+        'viviendas_en_radio': np.bincount(owners, minlength=len(centers)),
+        'inspeccionadas_en_radio': np.bincount(owners, weights=inspected, minlength=len(centers)).astype(np.int64),
+        'positivas_en_radio': np.bincount(owners, weights=positive, minlength=len(centers)).astype(np.int64)
+    })
@@ -0,0 +1,71 @@
+"""
+Matriz de recipientes
+Agrupa las columnas de conteo de recipientes en un bloque NumPy contiguo de
+forma (filas, tipo de recipiente, estado) con ejes con nombre, para que las
+estadísticas de recipientes sean una sola reducción sobre el bloque en lugar
+de sumar columna por columna
+"""
+import numpy as np
+import pandas as pd
+
+
+class ContainerMatrix:
+    """Bloque filas × tipo × estado de los contadores de recipientes"""
+
+    def __init__(self, data, containers, status_labels):
+        """
+        Args:
+            data: DataFrame procesado por DataProcessor
+            containers: Diccionario tipo -> columnas (DataProcessor.get_container_columns)
+            status_labels: Diccionario sufijo -> etiqueta (DataProcessor.get_container_status_labels)
+        """
+        self.types = list(containers)
+        self.statuses = list(status_labels)
+        self.status_labels = dict(status_labels)
+
+        # Columna de cada celda (tipo, estado); None si el tipo no registra ese estado
+        self.columns = [[None] * len(self.statuses) for _ in self.types]
+        for type_position, columns in enumerate(containers.values()):
+            for column in columns:
+                suffix = '_' + column.rsplit('_', 1)[1]
+                if suffix in self.status_labels:
+                    self.columns[type_position][self.statuses.index(suffix)] = column
+
+        self.values = self.build_block(data)
+
+    def type_position(self, container_type):
+        """Posición de un tipo de recipiente en el eje 1"""
+        return self.types.index(container_type)
+
+    def status_position(self, suffix):
+        """Posición de un estado (sufijo '_I', '_P', ...) en el eje 2"""
+        return self.statuses.index(suffix)
+
+    def has_status(self):
+        """Matriz booleana tipo × estado de las combinaciones que existen como columna"""
+        return np.array([[column is not None for column in row] for row in self.columns], dtype=bool)
+
+    def build_block(self, frame):
+        """
+        Construye el bloque de un DataFrame con las columnas de recipientes.
+
+        Las combinaciones sin columna (o ausentes en frame) quedan en cero.
+        """
+        present = [column for row in self.columns for column in row if column is not None and column in frame.columns]
+        dtype = np.result_type(*[frame[column].dtype for column in present]) if present else np.int64
+        block = np.zeros((len(frame), len(self.types), len(self.statuses)), dtype=dtype)
+        for type_position, row in enumerate(self.columns):
+            for status_position, column in enumerate(row):
+                if column is not None and column in frame.columns:
+                    block[:, type_position, status_position] = frame[column].to_numpy()
+        return block
+
+    def totals(self, block):
+        """
+        Suma de un bloque sobre las filas.
+
+        Returns:
+            DataFrame tipo × estado (índice: tipos, columnas: sufijos de estado)
+        """
+        return pd.DataFrame(block.sum(axis=0, dtype=np.float64 if block.dtype.kind == 'f' else np.int64),
+                            index=self.types, columns=self.statuses)
@@ -0,0 +1,15 @@
+"""
+Copias que el llamador puede modificar sin alterar el original
+Con Copy-on-Write (siempre activo desde pandas 3.0) una copia superficial es
+suficiente y no duplica memoria; en versiones anteriores, donde no se activa
+globalmente para no cambiar el comportamiento del resto de la aplicación, se
+hace una copia completa como antes
+"""
+import pandas as pd
+
+COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3 or pd.get_option('mode.copy_on_write') is True
+
+
+def independent_copy(frame):
+    """Copia de un DataFrame o Series que puede modificarse sin afectar a frame"""
+    return frame.copy(deep=not COPY_ON_WRITE)
@@ -0,0 +1,207 @@
+"""
+Ingesta de archivos CSV por bloques para cargas de gran tamaño
+Detecta la codificación una sola vez y construye el DataFrame de forma incremental
+"""
+import codecs
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Codificaciones candidatas en orden de preferencia (latin-1 nunca falla)
+ENCODING_CANDIDATES = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'iso-8859-1']
+FALLBACK_ENCODING = 'latin-1'
+
+# Tamaño de la muestra de bytes usada para detectar la codificación
+SAMPLE_SIZE = 1024 * 1024  # 1MB
+
+# Filas por bloque: ~20k filas x 91 columnas mantiene cada bloque en pocas decenas de MB
+DEFAULT_CHUNK_ROWS = 20000
+
+NA_VALUES = ['', 'NA', 'N/A', 'null', 'NULL', 'NaN']
+
+
+def detect_encoding(file_obj, sample_size=SAMPLE_SIZE):
+    """
+    Detecta la codificación del archivo a partir de una muestra de bytes.
+
+    Args:
+        file_obj: Objeto tipo archivo en modo binario (ej. UploadedFile de Streamlit)
+        sample_size: Cantidad de bytes a inspeccionar
+
+    Returns:
+        Nombre de la codificación detectada
+    """
+    file_obj.seek(0)
+    sample = file_obj.read(sample_size)
+    file_obj.seek(0)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    for encoding in ENCODING_CANDIDATES:
+        try:
+            # Decodificador incremental: tolera un carácter multibyte cortado al final de la muestra
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except (UnicodeDecodeError, UnicodeError, LookupError):
+            continue
+
+    return FALLBACK_ENCODING
+
+
+def _get_total_size(file_obj):
+    """Obtiene el tamaño total del archivo en bytes"""
+    size = getattr(file_obj, 'size', None)
+    if size:
+        return size
+
+    current = file_obj.tell()
+    file_obj.seek(0, 2)
+    size = file_obj.tell()
+    file_obj.seek(current)
+    return size
+
+
+class _ColumnarBuilder:
+    """Acumula bloques columna por columna y los une al final liberando cada parte"""
+
+    def __init__(self):
+        self.columns = None
+        self.parts = {}
+        self.rows = 0
+
+    def append(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.parts = {col: [] for col in self.columns}
+
+        for col in self.columns:
+            self.parts[col].append(chunk[col])
+        self.rows += len(chunk)
+
+    def build(self):
+        if self.columns is None:
+            return pd.DataFrame()
+
+        result = {}
+        for col in self.columns:
+            parts = self.parts.pop(col)
+            result[col] = self._concat_parts(parts)
+            # Liberar los bloques de esta columna antes de unir la siguiente
+            parts.clear()
+
+        return pd.DataFrame(result, columns=self.columns)
+
+    @staticmethod
+    def _concat_parts(parts):
+        if len(parts) == 1:
+            return parts[0].reset_index(drop=True)
+
+        # Las categorías de cada bloque difieren; unirlas evita que pd.concat degrade a object
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            merged = union_categoricals([part.array for part in parts], sort_categories=True)
+            return pd.Series(merged, name=parts[0].name)
+
+        return pd.concat(parts, ignore_index=True)
+
+
+def _read_chunks(file_obj, encoding, chunk_rows, progress_callback, total_size, chunk_transform, dtype=None):
+    """
+    Lee el archivo completo por bloques con una codificación fija.
+
+    Returns:
+        Tupla (DataFrame, columnas con tipos mixtos entre bloques)
+    """
+    file_obj.seek(0)
+    builder = _ColumnarBuilder()
+    text_columns = set()
+    numeric_columns = set()
+
+    reader = pd.read_csv(
+        file_obj,
+        encoding=encoding,
+        chunksize=chunk_rows,
+        skipinitialspace=True,  # Skip spaces after delimiter
+        na_values=NA_VALUES,  # Handle missing values
+        keep_default_na=True,
+        dtype=dtype
+    )
+
+    with reader:
+        for chunk in reader:
+            # Cada bloque infiere sus tipos: se registra qué columnas salieron como texto y cuáles como número
+            for col in chunk.columns:
+                if pd.api.types.is_object_dtype(chunk[col]) or pd.api.types.is_string_dtype(chunk[col]):
+                    text_columns.add(col)
+                elif pd.api.types.is_numeric_dtype(chunk[col]) and chunk[col].notna().any():
+                    numeric_columns.add(col)
+
+            if chunk_transform:
+                chunk = chunk_transform(chunk)
+            builder.append(chunk)
+
+            if progress_callback:
+                try:
+                    bytes_read = file_obj.tell()
+                except (OSError, ValueError):
+                    bytes_read = 0
+                progress_callback(min(bytes_read, total_size), total_size, builder.rows)
+
+    return builder.build(), text_columns & numeric_columns
+
+
+def load_csv_in_chunks(file_obj, chunk_rows=DEFAULT_CHUNK_ROWS, progress_callback=None, chunk_transform=None):
+    """
+    Carga un CSV grande por bloques de tamaño acotado.
+
+    La codificación se detecta una vez sobre una muestra. Si aparece un error de
+    decodificación más adelante en el archivo, se realiza un único reintento con
+    latin-1 (que acepta cualquier byte) en lugar de probar cada codificación.
+
+    Si una columna se infiere como número en unos bloques y como texto en otros
+    (p.ej. DNIs '01234567' y un 'SIN DNI' al final), el archivo se relee con esas
+    columnas como texto: se obtiene el mismo valor que una lectura completa, sin
+    mezclar enteros y cadenas en la columna.
+
+    Args:
+        file_obj: Objeto tipo archivo en modo binario
+        chunk_rows: Número de filas por bloque
+        progress_callback: Función opcional f(bytes_leidos, bytes_totales, filas_leidas)
+        chunk_transform: Función opcional aplicada a cada bloque antes de acumularlo
+            (ej. SchemaCoercer.coerce para compactar tipos bloque a bloque)
+
+    Returns:
+        Tupla (DataFrame, codificación utilizada)
+    """
+    total_size = _get_total_size(file_obj) or 1
+    encoding = detect_encoding(file_obj)
+
+    try:
+        data, mixed_columns = _read_chunks(file_obj, encoding, chunk_rows, progress_callback, total_size, chunk_transform)
+    except (UnicodeDecodeError, UnicodeError):
+        if encoding == FALLBACK_ENCODING:
+            raise
+        encoding = FALLBACK_ENCODING
+        data, mixed_columns = _read_chunks(file_obj, encoding, chunk_rows, progress_callback, total_size, chunk_transform)
+
+    if mixed_columns:
+        text_dtypes = {col: str for col in mixed_columns}
+        data, _ = _read_chunks(file_obj, encoding, chunk_rows, progress_callback, total_size, chunk_transform,
+                               dtype=text_dtypes)
+
+    return data, encoding
+
+
+def concat_frames(frames):
+    """
+    Une varios DataFrames con las mismas columnas conservando los tipos categóricos.
+
+    Args:
+        frames: Lista de DataFrames con columnas idénticas
+
+    Returns:
+        DataFrame unido con índice consecutivo
+    """
+    builder = _ColumnarBuilder()
+    for frame in frames:
+        builder.append(frame)
+    return builder.build()
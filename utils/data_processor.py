@@ -1,11 +1,51 @@
 import pandas as pd
 import numpy as np
+import uuid
+import weakref
 from datetime import datetime
+from utils.aggregation_cube import AggregationCube, is_cube_cells
+from utils.container_matrix import ContainerMatrix
+from utils.inspector_directory import InspectorDirectory
+from utils.spatial_index import SpatialIndex
+from utils.calculation_cache import CalculationCache, query_signature
+from utils.copy_on_write import independent_copy
 
 class DataProcessor:
-    def __init__(self, data):
-        self.data = data.copy()
-        self.process_data()
+    # Columns with a precomputed value -> row positions index
+    INDEXED_COLUMNS = ['tipoActividadInspeccion', 'year', 'departamento_x', 'nombre_prov',
+                       'distrito', 'cod_renipress', 'localidad_eess']
+    # Column with a sorted position index for date range queries
+    DATE_INDEX_COLUMN = 'fecha_inspeccion'
+    
+    def __init__(self, data, processed=False, version=None, calculation_cache=None):
+        # Lazy copy under Copy-on-Write (full copy otherwise): process_data never alters the caller's frame
+        self.data = independent_copy(data)
+        # Dataset version (content hash when known) used to key memoized calculations
+        self.version = version or uuid.uuid4().hex
+        self.calculation_cache = calculation_cache if calculation_cache is not None else CalculationCache()
+        # Los datos recuperados de la caché ya pasaron por process_data
+        if not processed:
+            self.process_data()
+        
+        # Per-value row indexes for the filterable columns and sorted date index
+        self.build_row_indexes()
+        self.build_date_index()
+        
+        # Container counters as a rows x container type x status block
+        self.container_matrix = ContainerMatrix(self.data, self.get_container_columns(),
+                                                self.get_container_status_labels())
+        # id(frame) -> (weak reference, row positions, cached results) of the returned frames
+        self._selections = {}
+        
+        # Additive measures by activity x facility x geography x day
+        container_columns = [col for columns in self.get_container_columns().values() for col in columns]
+        self.cube = AggregationCube(self.data, container_columns)
+        
+        # DNI -> name, row positions and totals of each inspector
+        self.inspector_directory = InspectorDirectory(self.data)
+        
+        # Uniform grid over the georeferenced rows for radius, box and nearest-neighbour queries
+        self.spatial_index = SpatialIndex(self.data)
         
         # Health facilities reference data
         self.health_facilities = {
@@ -45,7 +85,16 @@ class DataProcessor:
             3760: {"name": "LECHEMAYO", "total_houses": 716},
             3749: {"name": "PALMAPAMPA", "total_houses": 1924}
         }
-    
+
+    @classmethod
+    def process(cls, data):
+        """Return a processed copy of data without building the query indexes"""
+        # Only process_data runs: callers that merge frames build a single DataProcessor afterwards
+        processor = cls.__new__(cls)
+        processor.data = independent_copy(data)
+        processor.process_data()
+        return processor.data
+
     def process_data(self):
         """Process and clean the data"""
         # Convert date columns
@@ -69,33 +118,287 @@ class DataProcessor:
         text_columns = self.data.select_dtypes(include=['object']).columns
         self.data[text_columns] = self.data[text_columns].fillna('')
     
-    def get_filtered_data(self, activity_type=None, filters=None):
-        """Filter data based on activity type and additional filters"""
-        filtered_data = self.data.copy()
+    def build_row_indexes(self):
+        """Build an inverted index (value -> sorted row positions) for each filterable column
+        
+        Each column keeps:
+        - codes: int32 code per row (-1 for missing values)
+        - lookup: {value: code}
+        - positions/offsets: rows sorted by code, so rows of code k are
+          positions[offsets[k]:offsets[k + 1]] in ascending order
+        """
+        self.row_indexes = {}
+        
+        for col in self.INDEXED_COLUMNS:
+            if col not in self.data.columns:
+                continue
+            
+            codes, uniques = pd.factorize(self.data[col])
+            codes = codes.astype(np.int32)
+            valid = codes >= 0
+            
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            order = order[(~valid).sum():]  # Missing values (-1) sort first
+            counts = np.bincount(codes[valid], minlength=len(uniques))
+            offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            
+            self.row_indexes[col] = {
+                'codes': codes,
+                'lookup': {value: code for code, value in enumerate(np.asarray(uniques).tolist())},
+                'positions': order,
+                'offsets': offsets
+            }
+    
+    def _get_filter_codes(self, col, value, case_insensitive=False):
+        """Codes of an indexed column matching a filter value (scalar or list)"""
+        lookup = self.row_indexes[col]['lookup']
+        values = value if isinstance(value, list) else [value]
+        
+        if case_insensitive:
+            targets = {str(v).lower() for v in values}
+            return [code for key, code in lookup.items() if str(key).lower() in targets]
+        
+        return [lookup[v] for v in values if v in lookup]
+    
+    def _get_postings(self, col, codes):
+        """Sorted row positions for a set of codes of an indexed column"""
+        index = self.row_indexes[col]
+        parts = [index['positions'][index['offsets'][code]:index['offsets'][code + 1]] for code in codes]
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+    
+    def build_date_index(self):
+        """Build a sorted datetime64 position index on fecha_inspeccion
+        
+        - values: non-missing dates in ascending order
+        - positions: row position of each entry in values
+        - row_values: datetime64 value per row (NaT for missing) to check candidate rows
+        """
+        self.date_index = None
+        col = self.DATE_INDEX_COLUMN
+        
+        if col not in self.data.columns or not pd.api.types.is_datetime64_any_dtype(self.data[col]):
+            return
+        
+        dates = self.data[col]
+        if getattr(dates.dt, 'tz', None) is not None:
+            # Keep wall-clock time so calendar days match .dt.date
+            dates = dates.dt.tz_localize(None)
+        
+        row_values = dates.to_numpy()
+        valid_positions = np.flatnonzero(~np.isnat(row_values)).astype(np.int32)
+        order = np.argsort(row_values[valid_positions], kind='stable')
+        
+        self.date_index = {
+            'values': row_values[valid_positions][order],
+            'positions': valid_positions[order],
+            'row_values': row_values
+        }
+    
+    def _get_date_bounds(self, date_range):
+        """Half-open datetime64 bounds [start 00:00, end + 1 day) and their sorted index span"""
+        start_date, end_date = date_range
+        values = self.date_index['values']
+        lower = np.datetime64(pd.Timestamp(start_date)).astype(values.dtype)
+        upper = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1)).astype(values.dtype)
+        return lower, upper, np.searchsorted(values, lower, 'left'), np.searchsorted(values, upper, 'left')
+    
+    def get_filtered_index(self, activity_type=None, filters=None):
+        """Resolve activity type and filters to sorted row positions without copying data
+        
+        Indexed filters and the date range (key 'date_range') are intersected starting
+        from the smallest candidate set; other columns are checked only on the surviving rows.
+        """
+        indexed = []
+        other = []
+        date_bounds = None
         
-        # Filter by activity type
         if activity_type:
-            filtered_data = filtered_data[
-                filtered_data['tipoActividadInspeccion'].str.lower() == activity_type.lower()
-            ]
+            if 'tipoActividadInspeccion' in self.row_indexes:
+                indexed.append(('tipoActividadInspeccion',
+                                self._get_filter_codes('tipoActividadInspeccion', activity_type, case_insensitive=True)))
+            else:
+                other.append(('tipoActividadInspeccion', activity_type, 'lower'))
         
-        # Apply additional filters
         if filters:
             for key, value in filters.items():
-                if value and key in filtered_data.columns:
-                    if isinstance(value, list):
-                        filtered_data = filtered_data[filtered_data[key].isin(value)]
+                if key == 'date_range':
+                    if value and self.date_index is not None:
+                        date_bounds = self._get_date_bounds(value)
+                    elif value and self.DATE_INDEX_COLUMN in self.data.columns:
+                        other.append((self.DATE_INDEX_COLUMN, value, 'date'))
+                elif value and key in self.data.columns:
+                    if key in self.row_indexes:
+                        indexed.append((key, self._get_filter_codes(key, value)))
                     else:
-                        filtered_data = filtered_data[filtered_data[key] == value]
+                        other.append((key, value, 'equal'))
+        
+        if any(len(codes) == 0 for _, codes in indexed):
+            return np.array([], dtype=np.int32)
+        
+        def posting_size(item):
+            col, codes = item
+            offsets = self.row_indexes[col]['offsets']
+            return sum(offsets[code + 1] - offsets[code] for code in codes)
         
-        return filtered_data
+        # Start from the most selective candidate set
+        indexed.sort(key=posting_size)
+        date_size = date_bounds[3] - date_bounds[2] if date_bounds is not None else None
+        
+        if date_bounds is not None and (not indexed or date_size <= posting_size(indexed[0])):
+            positions = np.sort(self.date_index['positions'][date_bounds[2]:date_bounds[3]])
+            date_bounds = None
+        elif indexed:
+            col, codes = indexed.pop(0)
+            positions = self._get_postings(col, codes)
+        else:
+            positions = np.arange(len(self.data), dtype=np.int32)
+        
+        for col, codes in indexed:
+            # np.take/np.compress avoid the overhead of fancy and boolean indexing
+            row_codes = np.take(self.row_indexes[col]['codes'], positions)
+            if len(codes) == 1:
+                positions = np.compress(row_codes == codes[0], positions)
+            else:
+                positions = np.compress(np.isin(row_codes, codes), positions)
+        
+        if date_bounds is not None:
+            lower, upper = date_bounds[0], date_bounds[1]
+            row_dates = np.take(self.date_index['row_values'], positions)
+            positions = np.compress((row_dates >= lower) & (row_dates < upper), positions)
+        
+        for key, value, kind in other:
+            column = self.data[key].iloc[positions]
+            if kind == 'lower':
+                condition = column.astype(str).str.lower() == str(value).lower()
+            elif kind == 'date':
+                start_date, end_date = value
+                condition = (column.dt.date >= start_date) & (column.dt.date <= end_date)
+            elif isinstance(value, list):
+                condition = column.isin(value)
+            else:
+                condition = column == value
+            positions = positions[condition.to_numpy(dtype=bool, na_value=False)]
+        
+        return positions
+    
+    def get_filtered_data(self, activity_type=None, filters=None):
+        """Filter data based on activity type and additional filters
+        
+        Returns a Copy-on-Write selection: only the matching rows are materialized
+        and callers may add or modify columns without affecting self.data.
+        """
+        positions = self.get_filtered_index(activity_type, filters)
+        
+        if len(positions) == len(self.data):
+            filtered = independent_copy(self.data)
+        else:
+            filtered = self.data.take(positions)
+        self._remember_selection(filtered, positions)
+        
+        # Calculations on this frame are memoized under the query signature
+        return self.calculation_cache.register(
+            filtered, query_signature(self.version, 'rows', activity_type, filters))
+    
+    def _remember_selection(self, frame, positions):
+        """Keep the row positions (None for cube cells) of a returned frame and a slot for its container totals"""
+        frame_id = id(frame)
+        
+        def forget(_, frame_id=frame_id):
+            entry = self._selections.get(frame_id)
+            if entry is not None and entry[0]() is None:
+                del self._selections[frame_id]
+        
+        self._selections[frame_id] = (weakref.ref(frame, forget), positions, {})
+    
+    def _get_selection(self, frame):
+        """Remembered (reference, positions, results) of a frame returned by this processor, or None"""
+        entry = self._selections.get(id(frame))
+        if entry is None or entry[0]() is not frame:
+            return None
+        return entry
+    
+    def get_container_block(self, frame):
+        """Container counters of a frame as a (rows, container type, status) NumPy block
+        
+        Selections returned by get_filtered_data slice the prebuilt block by row position;
+        any other frame (derived rows or cube cells) is stacked from its own columns.
+        """
+        entry = self._get_selection(frame)
+        if entry is not None and entry[1] is not None:
+            positions = entry[1]
+            if len(positions) == len(self.data):
+                return self.container_matrix.values
+            return self.container_matrix.values[positions]
+        return self.container_matrix.build_block(frame)
+    
+    def get_container_totals(self, frame):
+        """Container totals of a frame as a container type x status suffix DataFrame
+        
+        Computed once per frame returned by get_filtered_data or get_cube_cells.
+        """
+        entry = self._get_selection(frame)
+        if entry is None:
+            return self.container_matrix.totals(self.get_container_block(frame))
+        if 'container_totals' not in entry[2]:
+            entry[2]['container_totals'] = self.container_matrix.totals(self.get_container_block(frame))
+        return independent_copy(entry[2]['container_totals'])
+    
+    def get_cube_cells(self, activity_type=None, filters=None):
+        """Aggregation cube cells matching the same activity type and filters as get_filtered_data
+        
+        Returns None when a filter is not a cube dimension (use the filtered rows instead).
+        """
+        cells = self.cube.slice(activity_type, filters)
+        if cells is None:
+            return None
+        self._remember_selection(cells, None)
+        return self.calculation_cache.register(
+            cells, query_signature(self.version, 'cube', activity_type, filters))
+    
+    def get_inspector_data(self, inspector_dni):
+        """Rows registered by one inspector, looked up in the inspector directory"""
+        positions = self.inspector_directory.get_positions(inspector_dni)
+        inspector_rows = self.data.take(positions)
+        self._remember_selection(inspector_rows, positions)
+        return self.calculation_cache.register(
+            inspector_rows, query_signature(self.version, 'rows', None, {'usuario_registra': str(inspector_dni)}))
+    
+    def get_houses_around_positives(self, frame, radius_m):
+        """Pairs (positive house, house of the same frame within radius_m metres) as row positions of self.data
+        
+        Positive houses are the inspected ones with viv_positiva == 1; the join runs on the spatial index.
+        Only inspection rows of self.data are accepted: cube cells have no location.
+        """
+        if is_cube_cells(frame):
+            raise ValueError("Las celdas del cubo de agregación no tienen ubicación: se requieren filas de inspección")
+        
+        entry = self._get_selection(frame)
+        if entry is not None and entry[1] is not None:
+            positions = np.asarray(entry[1])
+        else:
+            positions = self.data.index.get_indexer(frame.index)
+            if (positions < 0).any():
+                raise ValueError("El DataFrame no es una selección de filas del dataset cargado")
+        
+        in_frame = np.zeros(len(self.data), dtype=bool)
+        in_frame[positions] = True
+        positive = ((self.data['atencion_vivienda_indicador'].to_numpy() == 1) &
+                    (self.data['viv_positiva'].to_numpy() == 1))
+        return self.spatial_index.pairs_within(np.flatnonzero(in_frame & positive), radius_m, candidates=in_frame)
     
     def get_unique_values(self, column_name, sorted_order=True):
         """Get unique values from a column"""
         if column_name not in self.data.columns:
             return []
         
-        unique_values = self.data[column_name].dropna().unique()
+        if column_name in self.row_indexes:
+            # Observed values are already known from the row index
+            unique_values = list(self.row_indexes[column_name]['lookup'])
+        else:
+            unique_values = self.data[column_name].dropna().unique()
         
         if sorted_order:
             # Try to sort numerically first, then alphabetically
@@ -115,6 +418,12 @@ class DataProcessor:
     
     def get_date_range(self):
         """Get min and max dates from fecha_inspeccion"""
+        if self.date_index is not None:
+            values = self.date_index['values']
+            if len(values) > 0:
+                return pd.Timestamp(values[0]).date(), pd.Timestamp(values[-1]).date()
+            return None, None
+        
         if 'fecha_inspeccion' in self.data.columns:
             dates = self.data['fecha_inspeccion'].dropna()
             if len(dates) > 0:
@@ -3,75 +3,46 @@ Gestor de base de datos para establecimientos de salud y datos de viviendas
 """
 import os
 import json
-import psycopg2
 import pandas as pd
 from datetime import datetime
 from housing_data_parser import parse_housing_data_file
+from utils.db_pool import get_database_pool
+from utils.bulk_import import prepare_facility_rows, upsert_facilities
 
 class DatabaseManager:
     def __init__(self):
         self.database_url = os.environ.get('DATABASE_URL')
         if not self.database_url:
             raise ValueError("DATABASE_URL no está configurada en las variables de entorno")
+        self.pool = get_database_pool(self.database_url)
     
     def get_connection(self):
-        """Obtiene conexión a la base de datos"""
-        return psycopg2.connect(self.database_url)
+        """Presta una conexión del pool compartido (usar con 'with'; se devuelve al salir)"""
+        return self.pool.connection()
     
     def initialize_database(self):
         """Inicializa las tablas necesarias en la base de datos"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Crear tabla de establecimientos de salud
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS health_facilities (
-                    cod_renipress INTEGER PRIMARY KEY,
-                    nombre_establecimiento VARCHAR(255) NOT NULL,
-                    total_viviendas INTEGER NOT NULL DEFAULT 0,
-                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    usuario_actualizacion VARCHAR(100) DEFAULT 'sistema',
-                    activo BOOLEAN DEFAULT TRUE
-                );
-            """)
-            
-            # Crear índice para búsquedas por nombre
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_health_facilities_nombre 
-                ON health_facilities (nombre_establecimiento);
-            """)
-            
-            conn.commit()
+        # Tabla health_facilities e índice por nombre (utils/db_pool.SCHEMA_STATEMENTS)
+        self.pool.ensure_schema(force=True)
     
     def load_housing_data_from_file(self, file_path):
         """Carga datos de viviendas desde archivo de texto al sistema"""
         housing_data = parse_housing_data_file(file_path)
         
+        rows, errors = prepare_facility_rows(pd.DataFrame({
+            'cod_renipress': list(housing_data.keys()),
+            'nombre_establecimiento': [data['nombre'] for data in housing_data.values()],
+            'total_viviendas': [data['total_viviendas'] for data in housing_data.values()]
+        }), row_offset=1)
+        
+        # Insertar o actualizar datos (COPY a tabla temporal + una sola sentencia)
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Insertar o actualizar datos
-            for cod_renipress, data in housing_data.items():
-                cursor.execute("""
-                    INSERT INTO health_facilities 
-                    (cod_renipress, nombre_establecimiento, total_viviendas, fecha_actualizacion, usuario_actualizacion)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (cod_renipress) 
-                    DO UPDATE SET 
-                        nombre_establecimiento = EXCLUDED.nombre_establecimiento,
-                        total_viviendas = EXCLUDED.total_viviendas,
-                        fecha_actualizacion = EXCLUDED.fecha_actualizacion,
-                        usuario_actualizacion = EXCLUDED.usuario_actualizacion;
-                """, (
-                    cod_renipress,
-                    data['nombre'],
-                    data['total_viviendas'],
-                    datetime.now(),
-                    'carga_inicial'
-                ))
-            
+            count = upsert_facilities(conn, rows, 'carga_inicial')
             conn.commit()
-            print(f"Se cargaron/actualizaron {len(housing_data)} establecimientos de salud")
+        
+        print(f"Se cargaron/actualizaron {count} establecimientos de salud")
+        for error in errors:
+            print(f"Registro omitido: {error}")
     
     def get_health_facility_data(self, cod_renipress=None):
         """
@@ -182,27 +153,16 @@ class DatabaseManager:
         if not all(col in df.columns for col in required_cols):
             raise ValueError(f"El archivo debe contener las columnas: {required_cols}")
         
+        # Validación de todas las filas a la vez; los errores se reportan juntos
+        rows, errors = prepare_facility_rows(df.rename(columns={
+            'Código RENIPRESS': 'cod_renipress',
+            'Nombre del Establecimiento': 'nombre_establecimiento',
+            'Total de Viviendas': 'total_viviendas'
+        }))
+        for error in errors:
+            print(f"Registro omitido: {error}")
+        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            for _, row in df.iterrows():
-                cursor.execute("""
-                    INSERT INTO health_facilities 
-                    (cod_renipress, nombre_establecimiento, total_viviendas, fecha_actualizacion, usuario_actualizacion)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (cod_renipress) 
-                    DO UPDATE SET 
-                        nombre_establecimiento = EXCLUDED.nombre_establecimiento,
-                        total_viviendas = EXCLUDED.total_viviendas,
-                        fecha_actualizacion = EXCLUDED.fecha_actualizacion,
-                        usuario_actualizacion = EXCLUDED.usuario_actualizacion;
-                """, (
-                    int(row['Código RENIPRESS']),
-                    str(row['Nombre del Establecimiento']),
-                    int(row['Total de Viviendas']),
-                    datetime.now(),
-                    usuario
-                ))
-            
+            count = upsert_facilities(conn, rows, usuario)
             conn.commit()
-            return len(df)
\ No newline at end of file
+            return count
\ No newline at end of file
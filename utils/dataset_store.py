@@ -0,0 +1,144 @@
+"""
+Almacén compartido de datasets por proceso del servidor
+Cada dataset (identificado por el hash de su contenido) se procesa una sola vez
+y su DataProcessor, de solo lectura, se comparte entre todas las sesiones que lo
+usan. Las sesiones guardan únicamente un handle; el dataset se libera cuando el
+último handle se suelta o su sesión termina.
+"""
+import threading
+import time
+import weakref
+
+import streamlit as st
+
+
+class DatasetHandle:
+    """Referencia de una sesión a un dataset del almacén (no retiene los datos)"""
+
+    def __init__(self, store, key):
+        self.key = key
+        self._store = store
+        # Al liberar explícitamente o al recolectar el handle (sesión cerrada) se descuenta la referencia
+        self._finalizer = weakref.finalize(self, store._release, key)
+
+    @property
+    def processor(self):
+        """DataProcessor compartido del dataset"""
+        return self._store.get_processor(self.key)
+
+    @property
+    def info(self):
+        """Metadatos de la carga (codificación, esquema, ingesta, origen)"""
+        return self._store.get_info(self.key)
+
+    @property
+    def active(self):
+        return self._finalizer.alive
+
+    def release(self):
+        """Suelta la referencia al dataset"""
+        self._finalizer()
+
+
+class DatasetStore:
+    """Datasets procesados compartidos y contados por referencia"""
+
+    def __init__(self):
+        self._entries = {}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, loader):
+        """
+        Obtiene un handle al dataset identificado por key, construyéndolo si no existe.
+
+        Si varias sesiones cargan el mismo archivo a la vez, solo una ejecuta loader
+        y las demás esperan y reutilizan el resultado.
+
+        Args:
+            key: Hash del contenido del archivo
+            loader: Función sin argumentos que retorna (DataProcessor, info) o None si falla
+
+        Returns:
+            DatasetHandle o None si loader falló
+        """
+        with self._lock:
+            # Lock de construcción por key, vivo solo mientras alguna sesión lo está usando
+            build = self._build_locks.setdefault(key, {'lock': threading.Lock(), 'waiters': 0})
+            build['waiters'] += 1
+
+        try:
+            with build['lock']:
+                return self._get_or_build(key, loader)
+        finally:
+            with self._lock:
+                build['waiters'] -= 1
+                if build['waiters'] == 0:
+                    del self._build_locks[key]
+
+    def _get_or_build(self, key, loader):
+        """Handle a la entrada existente o construida con loader (con el lock de construcción tomado)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['refcount'] += 1
+                entry['last_access'] = time.time()
+                return DatasetHandle(self, key)
+
+        loaded = loader()
+        if loaded is None:
+            return None
+
+        processor, info = loaded
+        with self._lock:
+            self._entries[key] = {
+                'processor': processor,
+                'info': dict(info or {}),
+                'refcount': 1,
+                'created_at': time.time(),
+                'last_access': time.time()
+            }
+            return DatasetHandle(self, key)
+
+    def _release(self, key):
+        """Descuenta una referencia y descarta el dataset cuando nadie lo usa"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['refcount'] -= 1
+            if entry['refcount'] <= 0:
+                del self._entries[key]
+
+    def get_processor(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry['last_access'] = time.time()
+            return entry['processor']
+
+    def get_info(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['info'] if entry is not None else {}
+
+    def get_refcount(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['refcount'] if entry is not None else 0
+
+    def get_stats(self):
+        """Resumen de datasets compartidos en el proceso"""
+        with self._lock:
+            return {
+                'datasets': len(self._entries),
+                'handles': sum(entry['refcount'] for entry in self._entries.values()),
+                'rows': sum(len(entry['processor'].data) for entry in self._entries.values())
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_dataset_store():
+    """Almacén único del proceso, compartido por todas las sesiones"""
+    return DatasetStore()
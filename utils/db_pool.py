@@ -0,0 +1,298 @@
+"""
+Pool de conexiones PostgreSQL compartido por el proceso
+Reutiliza conexiones entre reruns y sesiones, verifica su estado antes de
+entregarlas, mide el tiempo de cada consulta y ejecuta el DDL del esquema una
+sola vez por proceso en lugar de hacerlo en cada renderizado
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+DEFAULT_MIN_CONNECTIONS = 1
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get('DB_POOL_MAX_CONNECTIONS', 8))
+# Segundos máximos para establecer una conexión nueva
+CONNECT_TIMEOUT = 5
+# Segundos máximos esperando una conexión libre del pool
+CHECKOUT_TIMEOUT = 30
+# Una conexión inactiva por más de este tiempo se verifica con SELECT 1 antes de usarla
+HEALTH_CHECK_INTERVAL = 30
+# Vigencia del resultado de disponibilidad (evita reintentar la conexión en cada rerun)
+AVAILABILITY_TTL = 30
+# Consultas más lentas que esto se registran en el log
+SLOW_QUERY_SECONDS = 1.0
+
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS health_facilities (
+        cod_renipress INTEGER PRIMARY KEY,
+        nombre_establecimiento VARCHAR(255) NOT NULL,
+        total_viviendas INTEGER NOT NULL DEFAULT 0,
+        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        usuario_actualizacion VARCHAR(100) DEFAULT 'sistema',
+        activo BOOLEAN DEFAULT TRUE
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_health_facilities_nombre
+    ON health_facilities (nombre_establecimiento);
+    """,
+    # Contador de versión: cualquier escritura en health_facilities lo incrementa,
+    # así los registros en memoria de otros procesos detectan el cambio
+    """
+    CREATE TABLE IF NOT EXISTS health_facilities_version (
+        id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        version BIGINT NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    INSERT INTO health_facilities_version (id, version) VALUES (1, 0)
+    ON CONFLICT (id) DO NOTHING;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION bump_health_facilities_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE health_facilities_version SET version = version + 1 WHERE id = 1;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    DROP TRIGGER IF EXISTS trg_health_facilities_version ON health_facilities;
+    CREATE TRIGGER trg_health_facilities_version
+    AFTER INSERT OR UPDATE OR DELETE ON health_facilities
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_health_facilities_version();
+    """
+]
+
+
+class QueryStats:
+    """Tiempos de las consultas ejecutadas a través del pool"""
+
+    def __init__(self, history=200):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=history)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest = (0.0, None)
+
+    def record(self, statement, seconds):
+        text = ' '.join(str(statement).split())[:120]
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self.recent.append((text, seconds))
+            if seconds > self.slowest[0]:
+                self.slowest = (seconds, text)
+        if seconds >= SLOW_QUERY_SECONDS:
+            print(f"Consulta lenta ({seconds:.2f}s): {text}")
+
+    def summary(self):
+        with self._lock:
+            return {
+                'queries': self.count,
+                'total_seconds': self.total_seconds,
+                'avg_ms': self.total_seconds / self.count * 1000 if self.count else 0.0,
+                'slowest_ms': self.slowest[0] * 1000,
+                'slowest_query': self.slowest[1]
+            }
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor que registra la duración de cada execute en las estadísticas del pool"""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self.connection.query_stats.record(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self.connection.query_stats.record(query, time.perf_counter() - start)
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self.connection.query_stats.record(sql, time.perf_counter() - start)
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Conexión cuyos cursores son TimedCursor"""
+
+    query_stats = None
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', TimedCursor)
+        return super().cursor(*args, **kwargs)
+
+
+class DatabasePool:
+    """Pool de conexiones acotado con verificación de salud y medición de consultas"""
+
+    def __init__(self, database_url, min_connections=DEFAULT_MIN_CONNECTIONS,
+                 max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.database_url = database_url
+        self.max_connections = max_connections
+        self.min_connections = min_connections
+        self.query_stats = QueryStats()
+        self._pool = None
+        self._lock = threading.Lock()
+        # Limita las conexiones en uso: quien excede el máximo espera en lugar de fallar
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._last_used = {}
+        self._schema_ready = False
+        self._availability = (None, 0.0)
+        self.connections_opened = 0
+        self.health_check_failures = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.min_connections, self.max_connections, self.database_url,
+                    connect_timeout=CONNECT_TIMEOUT, connection_factory=TimedConnection
+                )
+                # psycopg2 cierra al devolverlas las conexiones que exceden minconn;
+                # se conservan inactivas hasta max_connections para reutilizarlas
+                self._pool.minconn = self.max_connections
+            return self._pool
+
+    def _checkout(self):
+        """Toma una conexión sana del pool (reemplaza las cerradas o caídas)"""
+        pool = self._get_pool()
+        for _ in range(self.max_connections + 1):
+            conn = pool.getconn()
+            if conn.query_stats is None:
+                conn.query_stats = self.query_stats
+                self.connections_opened += 1
+
+            healthy = not conn.closed
+            idle = time.monotonic() - self._last_used.get(id(conn), 0.0)
+            if healthy and idle > HEALTH_CHECK_INTERVAL:
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    conn.rollback()
+                except psycopg2.Error:
+                    healthy = False
+
+            if healthy:
+                return conn
+
+            self.health_check_failures += 1
+            self._last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+
+        raise psycopg2.OperationalError("No se pudo obtener una conexión válida del pool")
+
+    @contextmanager
+    def connection(self):
+        """
+        Presta una conexión del pool dentro de un bloque with.
+
+        Al salir confirma la transacción (o la revierte si hubo una excepción)
+        y devuelve la conexión al pool en lugar de cerrarla.
+        """
+        if not self._slots.acquire(timeout=CHECKOUT_TIMEOUT):
+            raise psycopg2.pool.PoolError("Pool de conexiones agotado")
+        conn = None
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+                if not conn.closed:
+                    conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+        finally:
+            if conn is not None:
+                self._last_used[id(conn)] = time.monotonic()
+                self._get_pool().putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def ensure_schema(self, force=False):
+        """Crea tablas e índices si no existen (una sola vez por proceso salvo force)"""
+        with self._lock:
+            if self._schema_ready and not force:
+                return
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                for statement in SCHEMA_STATEMENTS:
+                    cursor.execute(statement)
+        with self._lock:
+            self._schema_ready = True
+
+    def is_available(self):
+        """
+        Indica si la base de datos responde, preparando el esquema en la primera conexión.
+
+        El resultado se reutiliza durante AVAILABILITY_TTL segundos.
+        """
+        with self._lock:
+            available, checked_at = self._availability
+        if available is not None and time.monotonic() - checked_at < AVAILABILITY_TTL:
+            return available
+
+        try:
+            self.ensure_schema()
+            available = True
+        except Exception as e:
+            print(f"Database not available: {str(e)}")
+            available = False
+
+        with self._lock:
+            self._availability = (available, time.monotonic())
+        return available
+
+    def get_stats(self):
+        """Estado del pool y tiempos de consulta"""
+        stats = self.query_stats.summary()
+        stats.update({
+            'max_connections': self.max_connections,
+            'connections_opened': self.connections_opened,
+            'health_check_failures': self.health_check_failures
+        })
+        return stats
+
+    def close(self):
+        """Cierra todas las conexiones del pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._last_used.clear()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_database_pool(database_url=None):
+    """
+    Pool compartido del proceso para la URL indicada (por defecto DATABASE_URL).
+
+    Returns:
+        DatabasePool o None si no hay URL configurada
+    """
+    database_url = database_url or os.environ.get('DATABASE_URL')
+    if not database_url:
+        return None
+    with _pools_lock:
+        pool = _pools.get(database_url)
+        if pool is None:
+            pool = _pools[database_url] = DatabasePool(database_url)
+        return pool
@@ -0,0 +1,94 @@
+"""
+Registro de establecimientos de salud en memoria
+Los lectores obtienen un diccionario compartido sin consultar la base de datos;
+el registro se recarga cuando vence su TTL y la versión de health_facilities
+cambió, o de inmediato cuando este proceso modifica la tabla
+"""
+import threading
+import time
+
+from utils.db_pool import get_database_pool
+
+# Segundos durante los cuales el registro se usa sin verificar la base de datos
+DEFAULT_TTL = 60
+
+
+def _read_database_version():
+    """Versión de health_facilities (contador que incrementa un trigger en cada escritura; None sin base de datos)"""
+    pool = get_database_pool()
+    if pool is None or not pool.is_available():
+        return None
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM health_facilities_version WHERE id = 1")
+            row = cursor.fetchone()
+            return row[0] if row else None
+    except Exception as e:
+        print(f"No se pudo leer la versión de establecimientos: {e}")
+        return None
+
+
+class FacilityRegistry:
+    """Diccionario de establecimientos compartido por el proceso, con TTL e invalidación"""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._facilities = None
+        self._database_version = None
+        self._checked_at = 0.0
+        # Cambia con cada recarga: forma parte de la clave de los cálculos memoizados
+        self.version = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self, loader):
+        """
+        Retorna (establecimientos, versión) del registro.
+
+        Dentro del TTL no hay ninguna consulta; al vencer se compara la versión
+        de la tabla y solo se vuelve a cargar si cambió.
+
+        Args:
+            loader: Función sin argumentos que consulta los establecimientos
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._facilities is not None and now - self._checked_at < self.ttl:
+                return self._facilities, self.version
+
+            database_version = _read_database_version()
+            if (self._facilities is None or database_version is None
+                    or database_version != self._database_version):
+                facilities = loader()
+                if facilities != self._facilities:
+                    self.version += 1
+                self._facilities = facilities
+                self._database_version = database_version
+                self.reloads += 1
+            self._checked_at = now
+            return self._facilities, self.version
+
+    def get(self, loader):
+        """Diccionario compartido de establecimientos"""
+        return self.snapshot(loader)[0]
+
+    def invalidate(self):
+        """Descarta el registro: la siguiente lectura lo recarga desde la base de datos"""
+        with self._lock:
+            self._facilities = None
+            self._database_version = None
+            self._checked_at = 0.0
+
+
+_registry = FacilityRegistry()
+
+
+def get_facility_registry():
+    """Registro único del proceso"""
+    return _registry
+
+
+def invalidate_facility_registry():
+    """Invalida el registro tras modificar health_facilities desde este proceso"""
+    _registry.invalidate()
@@ -0,0 +1,410 @@
+"""
+Ingesta incremental de exportaciones acumulativas
+Compara cada carga con un dataset base persistido, procesa solo las filas
+nuevas o modificadas y actualiza el resumen persistido sin recalcularlo por
+completo. El resumen es solo un informe: el cubo de agregación se construye una
+vez, con el DataProcessor del dataset combinado
+Cada versión del base se escribe en su propio directorio y se publica con un
+reemplazo atómico del puntero CURRENT; las ingestas se serializan con un lock
+del proceso y un lock de archivo
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa dentro del proceso
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from utils.csv_ingestion import concat_frames
+from utils.data_processor import DataProcessor
+from utils.processed_cache import PARQUET_AVAILABLE, PROCESSING_VERSION
+
+DEFAULT_STORE_DIR = os.path.join('.cache', 'base')
+
+# Identificador de la inspección (_x) y de la vivienda (_y) del export unido
+KEY_COLUMNS = ['_id_x', '_id_y']
+# Marcas de tiempo que cambian cuando el registro se vuelve a guardar
+SIGNATURE_COLUMNS = ['_createdAt_x', '_createdAt_y']
+ROW_HASH_COLUMN = '_row_hash'
+
+# Archivos de cada generación del base
+DATA_FILE = 'base_dataset.parquet'
+KEYS_FILE = 'base_keys.parquet'
+SUMMARY_FILE = 'base_summary.parquet'
+META_FILE = 'base_meta.json'
+# Puntero al directorio de la generación vigente
+CURRENT_FILE = 'CURRENT'
+GENERATION_PREFIX = 'gen-'
+
+# Un lock por directorio de base: las sesiones de un mismo proceso comparten el base
+_store_locks = {}
+_store_locks_guard = threading.Lock()
+
+SUMMARY_KEYS = ['tipoActividadInspeccion', 'cod_renipress', 'year']
+SUMMARY_MEASURES = [
+    'registros', 'viviendas_inspeccionadas', 'viviendas_positivas',
+    'recipientes_inspeccionados', 'recipientes_positivos',
+    'consumo_larvicida', 'febriles'
+]
+
+
+def summarize(data):
+    """
+    Calcula agregados aditivos por actividad, establecimiento y año.
+
+    Todas las medidas son sumas, por lo que pueden restarse y sumarse
+    al aplicar un delta sin recorrer el dataset completo.
+
+    Args:
+        data: DataFrame procesado por DataProcessor
+
+    Returns:
+        DataFrame con SUMMARY_KEYS + SUMMARY_MEASURES
+    """
+    keys = [col for col in SUMMARY_KEYS if col in data.columns]
+    if data.empty or not keys:
+        return pd.DataFrame(columns=SUMMARY_KEYS + SUMMARY_MEASURES)
+
+    inspected = data['atencion_vivienda_indicador'] == 1 if 'atencion_vivienda_indicador' in data.columns else pd.Series(False, index=data.index)
+    positive = inspected & (data['viv_positiva'] == 1) if 'viv_positiva' in data.columns else pd.Series(False, index=data.index)
+    inspected_cols = [col for col in data.columns if col.endswith('_I') and pd.api.types.is_numeric_dtype(data[col])]
+    positive_cols = [col for col in data.columns if col.endswith('_P') and pd.api.types.is_numeric_dtype(data[col])]
+
+    measures = pd.DataFrame({
+        'registros': np.ones(len(data), dtype='int64'),
+        'viviendas_inspeccionadas': inspected.to_numpy(dtype='int64'),
+        'viviendas_positivas': positive.to_numpy(dtype='int64'),
+        'recipientes_inspeccionados': data[inspected_cols].sum(axis=1).to_numpy(dtype='int64') if inspected_cols else 0,
+        'recipientes_positivos': data[positive_cols].sum(axis=1).to_numpy(dtype='int64') if positive_cols else 0,
+        'consumo_larvicida': data['consumo_larvicida'].to_numpy(dtype='float64') if 'consumo_larvicida' in data.columns else 0.0,
+        'febriles': data['febriles'].to_numpy(dtype='int64') if 'febriles' in data.columns else 0
+    }, index=data.index)
+
+    for key in keys:
+        measures[key] = data[key]
+
+    summary = measures.groupby(keys, observed=True, dropna=False)[SUMMARY_MEASURES].sum().reset_index()
+    for key in SUMMARY_KEYS:
+        if key not in summary.columns:
+            summary[key] = ''
+    return summary[SUMMARY_KEYS + SUMMARY_MEASURES]
+
+
+def _combine_summaries(base, removed, added):
+    """Aplica un delta a los agregados: base - filas retiradas + filas nuevas"""
+    negated = removed.copy()
+    negated[SUMMARY_MEASURES] = -negated[SUMMARY_MEASURES]
+
+    parts = [part for part in (base, negated, added) if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=SUMMARY_KEYS + SUMMARY_MEASURES)
+
+    combined = pd.concat(parts, ignore_index=True)
+    # Claves categóricas de distintos orígenes se agrupan por su valor
+    for key in SUMMARY_KEYS:
+        if isinstance(combined[key].dtype, pd.CategoricalDtype):
+            combined[key] = combined[key].astype(str)
+
+    combined = combined.groupby(SUMMARY_KEYS, dropna=False)[SUMMARY_MEASURES].sum().reset_index()
+    combined = combined[combined['registros'] > 0]
+    return combined.reset_index(drop=True)
+
+
+class IncrementalIngestor:
+    """Mantiene un dataset base procesado y le aplica los cambios de cada nueva exportación"""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self.current_path = os.path.join(store_dir, CURRENT_FILE)
+        self.lock_path = os.path.join(store_dir, '.lock')
+        self.enabled = PARQUET_AVAILABLE
+
+        if self.enabled:
+            try:
+                os.makedirs(self.store_dir, exist_ok=True)
+            except OSError as e:
+                print(f"Ingesta incremental deshabilitada: {e}")
+                self.enabled = False
+
+        with _store_locks_guard:
+            self._lock = _store_locks.setdefault(os.path.abspath(store_dir), threading.Lock())
+
+    @contextmanager
+    def _locked(self):
+        """Serializa ingestas y reinicios sobre el base (hilos del proceso y otros procesos)"""
+        with self._lock:
+            if fcntl is None or not self.enabled:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _current_generation(self):
+        """Directorio de la generación vigente (None si no hay base)"""
+        try:
+            with open(self.current_path, 'r', encoding='utf-8') as f:
+                name = f.read().strip()
+        except OSError:
+            return None
+        return os.path.join(self.store_dir, name) if name else None
+
+    @staticmethod
+    def _paths(generation):
+        """Rutas de dataset, claves, agregados y metadatos de una generación"""
+        return {
+            'data': os.path.join(generation, DATA_FILE),
+            'keys': os.path.join(generation, KEYS_FILE),
+            'summary': os.path.join(generation, SUMMARY_FILE),
+            'meta': os.path.join(generation, META_FILE)
+        }
+
+    @staticmethod
+    def _load_meta(generation):
+        """Lee los metadatos de una generación (None si no existe)"""
+        if generation is None:
+            return None
+        try:
+            with open(os.path.join(generation, META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _is_compatible(self, generation):
+        """Indica si la generación está completa y fue procesada con la versión actual"""
+        meta = self._load_meta(generation)
+        paths = self._paths(generation) if generation else None
+        return bool(self.enabled and meta and meta.get('processing_version') == PROCESSING_VERSION
+                    and os.path.exists(paths['data']) and os.path.exists(paths['keys']))
+
+    def has_base(self):
+        """Indica si existe un dataset base compatible con la versión de procesamiento actual"""
+        return self._is_compatible(self._current_generation())
+
+    def get_base_info(self):
+        """Metadatos del dataset base vigente"""
+        generation = self._current_generation()
+        return self._load_meta(generation) if self._is_compatible(generation) else None
+
+    def get_summary(self):
+        """Agregados mantenidos incrementalmente para el dataset base"""
+        generation = self._current_generation()
+        empty = pd.DataFrame(columns=SUMMARY_KEYS + SUMMARY_MEASURES)
+        if not self._is_compatible(generation):
+            return empty
+        try:
+            return pd.read_parquet(self._paths(generation)['summary'])
+        except Exception:
+            # La generación fue reemplazada y descartada durante la lectura
+            return empty
+
+    def reset(self):
+        """Elimina el dataset base persistido"""
+        with self._locked():
+            self._clear()
+
+    def _clear(self, keep=None):
+        """Borra el puntero (salvo que se conserve keep) y las generaciones distintas de keep"""
+        if keep is None and os.path.exists(self.current_path):
+            os.remove(self.current_path)
+        try:
+            entries = os.listdir(self.store_dir)
+        except OSError:
+            return
+        for name in entries:
+            path = os.path.join(self.store_dir, name)
+            if name.startswith(GENERATION_PREFIX) and path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+            elif name in (DATA_FILE, KEYS_FILE, SUMMARY_FILE, META_FILE):
+                # Formato anterior: archivos sueltos en el directorio del base
+                os.remove(path)
+
+    @staticmethod
+    def _key_columns(data):
+        return [col for col in KEY_COLUMNS if col in data.columns]
+
+    @staticmethod
+    def _dtype_signature(data):
+        return [str(dtype) if not isinstance(dtype, pd.CategoricalDtype) else 'category'
+                for dtype in data.dtypes]
+
+    @staticmethod
+    def _row_hashes(data):
+        """Huella por fila de las marcas de tiempo para detectar registros modificados"""
+        columns = [col for col in SIGNATURE_COLUMNS if col in data.columns]
+        # Sin marcas de tiempo se compara el contenido completo de la fila
+        return pd.util.hash_pandas_object(data[columns or list(data.columns)], index=False).to_numpy()
+
+    def ingest(self, raw_data, source_name=None):
+        """
+        Integra una exportación acumulativa con el dataset base.
+
+        Las filas se identifican por _id_x/_id_y; una fila cuyo _createdAt_x o
+        _createdAt_y cambió se reprocesa, y las que ya no aparecen en la
+        exportación se retiran del base.
+
+        Args:
+            raw_data: DataFrame leído del CSV, sin procesar
+            source_name: Nombre del archivo de origen (informativo)
+
+        Returns:
+            Tupla (DataFrame procesado completo, reporte)
+        """
+        with self._locked():
+            return self._ingest(raw_data, source_name)
+
+    def _ingest(self, raw_data, source_name):
+        """Ingesta con el base bloqueado: la generación vigente no cambia durante la llamada"""
+        generation = self._current_generation()
+        keys = self._key_columns(raw_data)
+        row_hashes = self._row_hashes(raw_data)
+
+        reason = None
+        if not self.enabled:
+            reason = "pyarrow no disponible"
+        elif '_id_x' not in keys:
+            reason = "el archivo no contiene _id_x"
+        elif raw_data.duplicated(subset=keys).any():
+            reason = f"claves duplicadas en {', '.join(keys)}"
+        elif not self._is_compatible(generation):
+            reason = "no existe un dataset base compatible"
+        else:
+            base_meta = self._load_meta(generation)
+            if base_meta.get('raw_columns') != list(raw_data.columns):
+                reason = "las columnas difieren del dataset base"
+            elif base_meta.get('raw_dtypes') != self._dtype_signature(raw_data):
+                # Las huellas de fila solo son comparables con los mismos tipos
+                reason = "los tipos de columna difieren del dataset base"
+
+        if reason:
+            return self._full_rebuild(raw_data, keys, row_hashes, reason, source_name)
+
+        paths = self._paths(generation)
+        base_keys = pd.read_parquet(paths['keys'])
+        upload_keys = raw_data[keys].copy()
+        upload_keys[ROW_HASH_COLUMN] = row_hashes
+        upload_keys['_upload_pos'] = np.arange(len(raw_data))
+        base_keys['_base_pos'] = np.arange(len(base_keys))
+
+        merged = upload_keys.merge(base_keys, on=keys, how='outer',
+                                   suffixes=('', '_base'), indicator=True)
+        in_both = merged['_merge'] == 'both'
+        changed = in_both & (merged[ROW_HASH_COLUMN] != merged[f'{ROW_HASH_COLUMN}_base'])
+        new = merged['_merge'] == 'left_only'
+        removed = merged['_merge'] == 'right_only'
+
+        delta_positions = np.sort(merged.loc[new | changed, '_upload_pos'].to_numpy(dtype='int64'))
+        drop_positions = merged.loc[removed | changed, '_base_pos'].to_numpy(dtype='int64')
+
+        report = {
+            'mode': 'incremental',
+            'reason': None,
+            'new': int(new.sum()),
+            'changed': int(changed.sum()),
+            'removed': int(removed.sum()),
+            'unchanged': int((in_both & ~changed).sum())
+        }
+
+        base_data = pd.read_parquet(paths['data'])
+        if len(base_data) != len(base_keys):
+            # Las posiciones _base_pos solo son válidas si claves y dataset son de la misma generación
+            return self._full_rebuild(raw_data, keys, row_hashes,
+                                      "el dataset base y sus claves no coinciden", source_name)
+
+        if len(delta_positions) == 0 and len(drop_positions) == 0:
+            report['rows'] = len(base_data)
+            return base_data, report
+
+        # Solo el delta pasa por process_data
+        delta = DataProcessor.process(raw_data.iloc[delta_positions])
+
+        keep = np.ones(len(base_data), dtype=bool)
+        keep[drop_positions] = False
+        dropped = base_data[~keep]
+
+        data = concat_frames([base_data[keep], delta])
+        new_keys = concat_frames([
+            base_keys.loc[keep, keys + [ROW_HASH_COLUMN]],
+            upload_keys.iloc[delta_positions][keys + [ROW_HASH_COLUMN]]
+        ])
+
+        base_summary = pd.read_parquet(paths['summary']) if os.path.exists(paths['summary']) else summarize(base_data)
+        summary = _combine_summaries(base_summary, summarize(dropped), summarize(delta))
+        del base_data, dropped
+
+        self._save(data, new_keys, summary, raw_data, source_name)
+        report['rows'] = len(data)
+        return data, report
+
+    def _full_rebuild(self, raw_data, keys, row_hashes, reason, source_name):
+        """Procesa la exportación completa y la persiste como nuevo dataset base"""
+        data = DataProcessor.process(raw_data)
+        report = {
+            'mode': 'completo',
+            'reason': reason,
+            'new': len(data),
+            'changed': 0,
+            'removed': 0,
+            'unchanged': 0,
+            'rows': len(data)
+        }
+
+        # Sin clave única no es posible comparar cargas futuras: no se persiste base
+        if self.enabled and '_id_x' in keys and not raw_data.duplicated(subset=keys).any():
+            base_keys = raw_data[keys].reset_index(drop=True)
+            base_keys[ROW_HASH_COLUMN] = row_hashes
+            self._save(data, base_keys, summarize(data), raw_data, source_name)
+
+        return data, report
+
+    def _save(self, data, base_keys, summary, raw_data, source_name):
+        """
+        Persiste dataset, claves, agregados y metadatos como una nueva generación.
+
+        La generación se escribe completa en su propio directorio y se publica
+        reemplazando el puntero CURRENT de forma atómica: un lector ve siempre
+        los cuatro archivos de la misma generación.
+        """
+        generation = os.path.join(self.store_dir, f"{GENERATION_PREFIX}{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}")
+        paths = self._paths(generation)
+        try:
+            os.makedirs(generation)
+            data.to_parquet(paths['data'], index=False)
+            base_keys.to_parquet(paths['keys'], index=False)
+            summary.to_parquet(paths['summary'], index=False)
+
+            meta = {
+                'processing_version': PROCESSING_VERSION,
+                'raw_columns': list(raw_data.columns),
+                'raw_dtypes': self._dtype_signature(raw_data),
+                'rows': len(data),
+                'source': source_name,
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            with open(paths['meta'], 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            tmp_path = f"{self.current_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(os.path.basename(generation))
+            os.replace(tmp_path, self.current_path)
+        except Exception as e:
+            print(f"No se pudo guardar el dataset base: {e}")
+            # La generación vigente queda intacta
+            shutil.rmtree(generation, ignore_errors=True)
+            return
+
+        # Generaciones anteriores ya no referenciadas
+        self._clear(keep=generation)
@@ -0,0 +1,176 @@
+"""
+Directorio de inspectores
+Se construye una vez por dataset: DNI -> nombre, posiciones de sus filas,
+totales, días trabajados y productividad mensual. Seleccionar un inspector
+es una búsqueda en el índice en lugar de recorrer todo el dataset
+"""
+import numpy as np
+import pandas as pd
+
+INSPECTOR_COLUMN = 'usuario_registra'
+NAME_COLUMN = 'nombre_inspector'
+
+
+def _first_per_group(codes, values, groups):
+    """Primer valor no nulo de cada grupo en orden de filas (None si el grupo no tiene valores)"""
+    valid = pd.notna(values) & (codes >= 0)
+    group_codes = codes[valid]
+    first = np.unique(group_codes, return_index=True)
+    result = [None] * groups
+    valid_values = np.asarray(values, dtype=object)[valid]
+    for code, position in zip(*first):
+        result[code] = valid_values[position]
+    return result
+
+
+def _count_distinct(codes, keys, groups):
+    """Cantidad de claves distintas por grupo (pares código-clave únicos)"""
+    valid = (codes >= 0) & (keys >= 0)
+    if not valid.any():
+        return np.zeros(groups, dtype=np.int64)
+    width = int(keys[valid].max()) + 1
+    pairs = np.unique(codes[valid].astype(np.int64) * width + keys[valid])
+    return np.bincount(pairs // width, minlength=groups)
+
+
+class InspectorDirectory:
+    """Índice de filas y agregados por inspector (DNI como texto)"""
+
+    def __init__(self, data):
+        """
+        Args:
+            data: DataFrame procesado por DataProcessor
+        """
+        self.has_names = NAME_COLUMN in data.columns
+        if INSPECTOR_COLUMN not in data.columns:
+            self.dnis = []
+            self.names = {}
+            self.positions = np.array([], dtype=np.int32)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.lookup = {}
+            self.totals = pd.DataFrame()
+            self.monthly = pd.DataFrame(columns=['dni', 'mes', 'viviendas_inspeccionadas'])
+            return
+
+        # DNI como texto, igual que se muestra en el selector: se convierten solo los
+        # valores distintos y sort=True deja los DNI en orden alfabético
+        raw_codes, raw_values = pd.factorize(data[INSPECTOR_COLUMN], use_na_sentinel=False)
+        value_codes, dnis = pd.factorize(pd.Index(raw_values).astype(str), sort=True)
+        codes = value_codes.astype(np.int32)[raw_codes]
+        groups = len(dnis)
+        self.dnis = list(dnis)
+        self.lookup = {dni: code for code, dni in enumerate(self.dnis)}
+
+        # Filas de cada inspector: positions[offsets[k]:offsets[k + 1]] en orden ascendente
+        valid = codes >= 0
+        order = np.argsort(codes, kind='stable').astype(np.int32)
+        self.positions = order[(~valid).sum():]
+        self.offsets = np.zeros(groups + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes[valid], minlength=groups), out=self.offsets[1:])
+
+        # Nombre: primer nombre no nulo registrado por el inspector
+        if self.has_names:
+            first_names = _first_per_group(codes, data[NAME_COLUMN].to_numpy(dtype=object), groups)
+        else:
+            first_names = [None] * groups
+        self.names = {dni: name for dni, name in zip(self.dnis, first_names) if name not in (None, '')}
+
+        rows = len(data)
+        status = data['atencion_vivienda_indicador'].to_numpy() if 'atencion_vivienda_indicador' in data.columns else np.zeros(rows)
+        inspected = status == 1
+        if 'fecha_inspeccion' in data.columns:
+            dates = pd.to_datetime(data['fecha_inspeccion'], errors='coerce')
+        else:
+            dates = pd.Series(pd.NaT, index=data.index, dtype='datetime64[ns]')
+        if getattr(dates.dt, 'tz', None) is not None:
+            dates = dates.dt.tz_localize(None)
+
+        self.totals = self._build_totals(data, codes, groups, inspected, dates)
+        self.monthly = self._build_monthly(codes, inspected, dates)
+
+    def _build_totals(self, data, codes, groups, inspected, dates):
+        """Totales por inspector con bincount sobre los códigos de fila"""
+        rows = len(data)
+        positive = inspected & (data['viv_positiva'].to_numpy() == 1) if 'viv_positiva' in data.columns else np.zeros(rows, dtype=bool)
+        valid = codes >= 0
+
+        def total(weights):
+            return np.bincount(codes[valid], weights=np.asarray(weights, dtype=np.float64)[valid], minlength=groups)
+
+        def column_total(column):
+            if column not in data.columns:
+                return np.zeros(groups)
+            return total(pd.to_numeric(data[column], errors='coerce').fillna(0).to_numpy())
+
+        totals = pd.DataFrame({
+            'registros': np.bincount(codes[valid], minlength=groups),
+            'viviendas_inspeccionadas': total(inspected).astype(np.int64),
+            'viviendas_positivas': total(positive).astype(np.int64),
+            'consumo_larvicida': column_total('consumo_larvicida'),
+            'febriles': column_total('febriles')
+        }, index=pd.Index(self.dnis, name='dni'))
+
+        if 'localidad_eess' in data.columns:
+            facility_codes = pd.factorize(data['localidad_eess'])[0]
+            totals['establecimientos'] = _count_distinct(codes, facility_codes, groups)
+        else:
+            totals['establecimientos'] = 0
+
+        # Productividad sobre los registros con fecha válida
+        dated = dates.notna().to_numpy()
+        day_numbers = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+        day_codes = np.where(dated, day_numbers - (day_numbers[dated].min() if dated.any() else 0), -1)
+
+        totals['registros_con_fecha'] = total(dated).astype(np.int64)
+        totals['inspeccionadas_con_fecha'] = total(inspected & dated).astype(np.int64)
+        totals['dias_trabajados'] = _count_distinct(codes, day_codes, groups)
+        date_range = dates[dated & valid].groupby(codes[dated & valid]).agg(['min', 'max'])
+        totals['fecha_inicio'] = date_range['min'].reindex(range(groups)).to_numpy()
+        totals['fecha_fin'] = date_range['max'].reindex(range(groups)).to_numpy()
+        return totals
+
+    def _build_monthly(self, codes, inspected, dates):
+        """Viviendas inspeccionadas por inspector y mes (meses con registros fechados)"""
+        selected = dates.notna().to_numpy() & (codes >= 0)
+        if not selected.any():
+            return pd.DataFrame(columns=['dni', 'mes', 'viviendas_inspeccionadas'])
+
+        # Pares (inspector, mes) únicos y una sola suma con bincount
+        months = dates.to_numpy(dtype='datetime64[ns]')[selected].astype('datetime64[M]').astype(np.int64)
+        first_month = months.min()
+        width = int(months.max() - first_month) + 1
+        pairs, pair_index = np.unique(codes[selected].astype(np.int64) * width + (months - first_month),
+                                      return_inverse=True)
+        inspected_total = np.bincount(pair_index, weights=inspected[selected], minlength=len(pairs))
+        return pd.DataFrame({
+            'dni': np.asarray(self.dnis, dtype=object)[pairs // width],
+            'mes': pd.PeriodIndex((pairs % width + first_month).astype('datetime64[M]'), freq='M'),
+            'viviendas_inspeccionadas': inspected_total.astype(np.int64)
+        })
+
+    def get_positions(self, dni):
+        """Posiciones (ordenadas) de las filas del inspector; arreglo vacío si no existe"""
+        code = self.lookup.get(str(dni))
+        if code is None:
+            return np.array([], dtype=np.int32)
+        return self.positions[self.offsets[code]:self.offsets[code + 1]]
+
+    def get_name(self, dni, default="Inspector desconocido"):
+        """Nombre registrado del inspector"""
+        return self.names.get(str(dni), default)
+
+    def get_summary(self, dni):
+        """Totales del inspector como diccionario (None si no existe)"""
+        if str(dni) not in self.lookup:
+            return None
+        return self.totals.loc[str(dni)].to_dict()
+
+    def get_monthly_productivity(self, dni):
+        """Viviendas inspeccionadas por mes del inspector"""
+        return self.monthly[self.monthly['dni'] == str(dni)][['mes', 'viviendas_inspeccionadas']].reset_index(drop=True)
+
+    def average_inspected(self):
+        """Promedio de viviendas inspeccionadas por inspector"""
+        if self.totals.empty:
+            return 0
+        return self.totals['viviendas_inspeccionadas'].mean()
@@ -0,0 +1,208 @@
+"""
+Ejecución de tareas en segundo plano
+Un pool de hilos por proceso del servidor ejecuta trabajos largos (como la
+generación de presentaciones PowerPoint) fuera del script de Streamlit. Cada
+trabajo tiene un identificador, progreso, cancelación cooperativa y un
+resultado que la sesión recoge cuando termina; un rerun no interrumpe el trabajo
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Hilos del pool: pocos trabajos simultáneos para no competir con los reruns
+DEFAULT_WORKERS = 2
+
+# Segundos que se conserva un trabajo terminado antes de descartarlo
+DEFAULT_RETENTION = 3600
+
+# Estados de un trabajo
+PENDING = 'pendiente'
+RUNNING = 'en_curso'
+DONE = 'completado'
+FAILED = 'error'
+CANCELLED = 'cancelado'
+
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Se lanza dentro del trabajo cuando se solicitó su cancelación"""
+
+
+class Job:
+    """Estado de un trabajo en segundo plano"""
+
+    def __init__(self, label):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = "En cola"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def report(self, progress, message=None):
+        """
+        Actualiza el progreso desde el trabajo.
+
+        Es también el punto de cancelación: si se pidió cancelar, lanza JobCancelled.
+
+        Args:
+            progress: Fracción completada entre 0 y 1
+            message: Descripción del paso actual
+        """
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        with self._lock:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+            if message is not None:
+                self.message = message
+
+    def snapshot(self, include_result=False):
+        """Copia del estado para mostrar en la interfaz (con include_result, también el resultado)"""
+        with self._lock:
+            snapshot = {
+                'id': self.id,
+                'label': self.label,
+                'status': self.status,
+                'progress': self.progress,
+                'message': self.message,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+            if include_result:
+                snapshot['result'] = self.result if self.status == DONE else None
+            return snapshot
+
+    def _finish(self, status, result=None, error=None, message=None):
+        with self._lock:
+            self.status = status
+            self.result = result
+            self.error = error
+            if message is not None:
+                self.message = message
+            if status == DONE:
+                self.progress = 1.0
+            self.finished_at = time.time()
+
+
+class JobRunner:
+    """Pool de hilos compartido por el proceso con registro de trabajos"""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, retention=DEFAULT_RETENTION):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, label="Trabajo", **kwargs):
+        """
+        Encola un trabajo y retorna su identificador.
+
+        Args:
+            func: Función que se ejecuta como func(job, *args, **kwargs); usa
+                  job.report(progreso, mensaje) para informar avance y atender
+                  la cancelación. Su valor de retorno es el resultado del trabajo
+            label: Nombre del trabajo para la interfaz
+        """
+        job = Job(label)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job._finish(CANCELLED, message="Cancelado")
+            return
+        with job._lock:
+            job.status = RUNNING
+            job.message = "En curso"
+        try:
+            result = func(job, *args, **kwargs)
+        except JobCancelled:
+            job._finish(CANCELLED, message="Cancelado")
+        except Exception as e:
+            job._finish(FAILED, error=str(e), message="Error")
+        else:
+            job._finish(DONE, result=result, message="Completado")
+
+    def get(self, job_id, include_result=False):
+        """
+        Estado del trabajo (None si no existe o ya se descartó).
+
+        Con include_result el estado trae también 'result' (None si el trabajo no
+        terminó bien), leído en la misma operación: otra sesión no puede descartar
+        el trabajo entre la consulta del estado y la del resultado.
+        """
+        with self._lock:
+            # Las sesiones consultan su trabajo en cada rerun: los vencidos se liberan aquí también
+            self._prune()
+            job = self._jobs.get(job_id)
+            return job.snapshot(include_result) if job is not None else None
+
+    def result(self, job_id):
+        """Resultado de un trabajo completado (None si no existe o no terminó bien)"""
+        job = self.get(job_id, include_result=True)
+        return job['result'] if job is not None else None
+
+    def cancel(self, job_id):
+        """
+        Solicita la cancelación de un trabajo.
+
+        Un trabajo en cola no llega a ejecutarse; uno en curso se detiene en su
+        siguiente llamada a report. Retorna False si el trabajo ya terminó.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job._cancel_event.set()
+            return True
+
+    def discard(self, job_id):
+        """Cancela el trabajo si sigue activo y libera su resultado"""
+        self.cancel(job_id)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def _prune(self):
+        """Descarta los trabajos terminados hace más de retention segundos"""
+        limit = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get_stats(self):
+        """Cantidad de trabajos registrados por estado"""
+        with self._lock:
+            stats = {}
+            for job in self._jobs.values():
+                stats[job.status] = stats.get(job.status, 0) + 1
+            return stats
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_runner():
+    """Pool de trabajos único del proceso, compartido por todas las sesiones"""
+    return JobRunner()
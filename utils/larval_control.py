@@ -0,0 +1,86 @@
+"""
+Analítica de control larvario
+Reduce en una sola pasada agrupada el bloque de recipientes (establecimiento ×
+tipo de recipiente × tratamiento químico/físico) junto con los registros y el
+consumo de larvicida, y deriva de ella el rendimiento por establecimiento, el
+tratamiento por tipo de recipiente y los totales de tratamiento
+"""
+import numpy as np
+import pandas as pd
+
+from utils.aggregation_cube import is_cube_cells
+
+# Sufijos de tratamiento químico y físico
+TREATMENT_STATUSES = ['_TQ', '_TF']
+
+
+def summarize_larval_control(data, matrix, block):
+    """
+    Tablas de control larvario a partir de filas filtradas o celdas del cubo.
+
+    Args:
+        data: Filas filtradas de DataProcessor o celdas del cubo de agregación
+        matrix: ContainerMatrix del DataProcessor
+        block: Bloque (filas, tipo, estado) de data (DataProcessor.get_container_block)
+
+    Returns:
+        Tupla (rendimiento por establecimiento, tratamiento por tipo de recipiente,
+        diccionario con los totales 'chemical' y 'physical')
+    """
+    treatments = [matrix.status_position(suffix) for suffix in TREATMENT_STATUSES]
+    treated = block[:, :, treatments]
+    cells = treated.shape[1] * treated.shape[2]
+
+    if 'localidad_eess' in data.columns:
+        facility_codes, facilities = pd.factorize(data['localidad_eess'])
+    else:
+        facility_codes, facilities = np.full(len(data), -1), pd.Index([])
+    # Las filas sin establecimiento van a un grupo adicional para no perderlas en los totales por tipo
+    groups = len(facilities) + 1
+    group_codes = np.where(facility_codes >= 0, facility_codes, len(facilities)).astype(np.int64)
+
+    # Reducción agrupada: filas ordenadas por establecimiento y una sola suma por tramos
+    counts = np.bincount(group_codes, minlength=groups)
+    present = counts > 0
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[present]
+    grouped = np.zeros((groups, cells), dtype=np.int64)
+    if len(data):
+        order = np.argsort(group_codes, kind='stable')
+        grouped[present] = np.add.reduceat(treated.reshape(len(data), cells)[order], starts, axis=0, dtype=np.int64)
+    grouped = grouped.reshape(groups, treated.shape[1], treated.shape[2])
+
+    records = data['registros'].to_numpy(dtype=np.float64) if is_cube_cells(data) else np.ones(len(data))
+    activities = np.bincount(group_codes, weights=records, minlength=groups).astype(np.int64)[:-1]
+    if 'consumo_larvicida' in data.columns:
+        larvicide = pd.to_numeric(data['consumo_larvicida'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        larvicide_used = np.bincount(group_codes, weights=larvicide, minlength=groups)[:-1]
+    else:
+        larvicide_used = np.zeros(len(facilities))
+
+    # Rendimiento por establecimiento (orden de aparición)
+    containers_treated = grouped[:-1].sum(axis=(1, 2))
+    with_facility = np.flatnonzero(facility_codes >= 0)
+    first_rows = with_facility[np.unique(facility_codes[with_facility], return_index=True)[1]]
+    performance = pd.DataFrame({
+        'cod_renipress': data['cod_renipress'].to_numpy()[first_rows] if 'cod_renipress' in data.columns else 0,
+        'localidad_eess': np.asarray(facilities, dtype=object),
+        'total_activities': activities,
+        'larvicide_used': larvicide_used,
+        'containers_treated': containers_treated,
+        # Rating de eficiencia (escala 0-10)
+        'efficiency_rating': np.minimum(10, containers_treated / np.maximum(1, activities) * 5)
+    })
+
+    # Tratamiento por tipo de recipiente (todas las filas)
+    by_type = grouped.sum(axis=0)
+    container_treatment = pd.DataFrame({
+        'container_type': matrix.types,
+        'Tratamiento Químico': by_type[:, 0],
+        'Tratamiento Físico': by_type[:, 1]
+    })
+
+    treatment_totals = {
+        'chemical': int(by_type[:, 0].sum()),
+        'physical': int(by_type[:, 1].sum())
+    }
+    return performance, container_treatment, treatment_totals
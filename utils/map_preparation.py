@@ -0,0 +1,243 @@
+"""
+Preparación de datos para mapas
+Reduce los puntos georreferenciados antes de enviarlos al navegador: agregación
+en cuadrícula o hexágonos con conteos de positivas y negativas, nivel de detalle
+según el zoom (recortado al área visible) y muestreo acotado de puntos que conserva las viviendas positivas.
+El tamaño de lo que se dibuja queda acotado sin importar el tamaño del dataset
+"""
+import numpy as np
+import pandas as pd
+
+# Modos de mapa y su etiqueta en la interfaz
+MAP_MODES = {
+    'auto': 'Automático',
+    'points': 'Puntos',
+    'grid': 'Cuadrícula',
+    'hexbin': 'Hexágonos'
+}
+
+# Máximo de puntos individuales y de celdas agregadas que se envían al mapa
+MAX_POINTS = 5000
+MAX_CELLS = 2500
+
+# Teselas web de 256 px: a zoom z el mundo mide 256 * 2**z píxeles de ancho
+TILE_SIZE = 256
+# Ancho aproximado de una celda agregada en pantalla y alto del mapa
+CELL_PIXELS = 24
+MAP_PIXELS = 600
+MAX_ZOOM = 16
+# Menor zoom ofrecido como nivel de detalle explícito
+MIN_DETAIL_ZOOM = 8
+
+# Columnas de la capa de celdas
+CELL_COLUMNS = ['lat', 'lon', 'total', 'positivas', 'negativas', 'positividad']
+
+
+def map_coordinates(data):
+    """
+    Coordenadas válidas y estado de cada vivienda.
+
+    Returns:
+        Tupla (posiciones de las filas con coordenadas, latitud, longitud, positiva)
+    """
+    # georeferencia_X guarda la latitud y georeferencia_Y la longitud
+    lat = pd.to_numeric(data['georeferencia_X'], errors='coerce').to_numpy(dtype=np.float64)
+    lon = pd.to_numeric(data['georeferencia_Y'], errors='coerce').to_numpy(dtype=np.float64)
+    # process_data rellena las coordenadas faltantes con 0: no son una ubicación real
+    positions = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon) & (lat != 0) & (lon != 0))
+    if 'viv_positiva' in data.columns:
+        positive = (data['viv_positiva'].to_numpy() == 1)[positions]
+    else:
+        positive = np.zeros(len(positions), dtype=bool)
+    return positions, lat[positions], lon[positions], positive
+
+
+def fit_zoom(lat, lon):
+    """Zoom que encuadra la extensión de los puntos (como el zoom de mapas web)"""
+    lat_span = np.ptp(lat) if len(lat) else 0.0
+    lon_span = np.ptp(lon) * np.cos(np.radians(np.mean(lat))) if len(lon) else 0.0
+    span = max(lat_span, lon_span)
+    if span <= 0:
+        return MAX_ZOOM - 2
+    # Mayor zoom en el que la extensión cabe en MAP_PIXELS
+    return int(np.clip(np.floor(np.log2(360.0 * MAP_PIXELS / (TILE_SIZE * span))), 1, MAX_ZOOM))
+
+
+def viewport_mask(lat, lon, center, zoom):
+    """
+    Puntos dentro del área visible del mapa a un zoom dado.
+
+    Se toma un margen de MAP_PIXELS alrededor del centro en cada dirección,
+    de modo que el área incluye la vista y un desplazamiento corto.
+    """
+    degrees = 360.0 / (TILE_SIZE * 2.0 ** zoom) * MAP_PIXELS
+    lon_degrees = degrees / max(np.cos(np.radians(center[0])), 1e-6)
+    return (np.abs(lat - center[0]) <= degrees) & (np.abs(lon - center[1]) <= lon_degrees)
+
+
+def facility_center(data, facility):
+    """Centro (lat, lon) de las viviendas georreferenciadas de un establecimiento (None si no tiene)"""
+    if 'localidad_eess' not in data.columns:
+        return None
+    positions, lat, lon, _ = map_coordinates(data)
+    selected = (data['localidad_eess'].to_numpy() == facility)[positions]
+    if not selected.any():
+        return None
+    return float(lat[selected].mean()), float(lon[selected].mean())
+
+
+def cell_size_for_zoom(zoom, cell_pixels=CELL_PIXELS):
+    """Lado de la celda en grados para que ocupe cell_pixels en pantalla al zoom dado"""
+    return 360.0 / (TILE_SIZE * 2.0 ** zoom) * cell_pixels
+
+
+def sample_points(positive, max_points=MAX_POINTS, seed=0):
+    """
+    Muestra acotada de puntos que conserva primero las viviendas positivas.
+
+    Las negativas completan el cupo restante. Si las positivas solas superan
+    max_points, se muestrean también para mantener el límite.
+
+    Returns:
+        Posiciones (ordenadas) de los puntos elegidos
+    """
+    if len(positive) <= max_points:
+        return np.arange(len(positive))
+    rng = np.random.default_rng(seed)
+    positives = np.flatnonzero(positive)
+    negatives = np.flatnonzero(~positive)
+    if len(positives) >= max_points:
+        return np.sort(rng.choice(positives, max_points, replace=False))
+    chosen = rng.choice(negatives, max_points - len(positives), replace=False)
+    return np.sort(np.concatenate([positives, chosen]))
+
+
+def _cell_table(keys, positive, centers):
+    """Conteos por celda a partir de la clave de celda de cada punto"""
+    cells, index = np.unique(keys, return_inverse=True)
+    total = np.bincount(index, minlength=len(cells))
+    positives = np.bincount(index, weights=positive, minlength=len(cells)).astype(np.int64)
+    center_lat, center_lon = centers(cells)
+    return pd.DataFrame({
+        'lat': center_lat,
+        'lon': center_lon,
+        'total': total,
+        'positivas': positives,
+        'negativas': total - positives,
+        'positividad': positives / total * 100
+    })
+
+
+def aggregate_grid(lat, lon, positive, cell_size):
+    """Agrega los puntos en una cuadrícula regular de cell_size grados"""
+    rows = np.floor(lat / cell_size).astype(np.int64)
+    cols = np.floor(lon / cell_size).astype(np.int64)
+    row_min, col_min = rows.min(), cols.min()
+    width = int(cols.max() - col_min) + 1
+    keys = (rows - row_min) * width + (cols - col_min)
+
+    def centers(cells):
+        return ((cells // width + row_min + 0.5) * cell_size,
+                (cells % width + col_min + 0.5) * cell_size)
+
+    return _cell_table(keys, positive, centers)
+
+
+def aggregate_hexbin(lat, lon, positive, cell_size):
+    """
+    Agrega los puntos en hexágonos (vértice arriba) de cell_size grados de radio.
+
+    La longitud se escala por el coseno de la latitud media para que los
+    hexágonos tengan un área similar en el terreno.
+    """
+    scale = np.cos(np.radians(np.mean(lat)))
+    x = lon * scale
+    y = lat
+
+    # Coordenadas axiales fraccionarias y redondeo cúbico al hexágono más cercano
+    q = (np.sqrt(3) / 3 * x - y / 3) / cell_size
+    r = (2.0 / 3 * y) / cell_size
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq).astype(np.int64)
+    rr = np.where(fix_r, -rq - rs, rr).astype(np.int64)
+
+    q_min, r_min = rq.min(), rr.min()
+    width = int(rq.max() - q_min) + 1
+    keys = (rr - r_min) * width + (rq - q_min)
+
+    def centers(cells):
+        cell_q = cells % width + q_min
+        cell_r = cells // width + r_min
+        center_x = cell_size * np.sqrt(3) * (cell_q + cell_r / 2)
+        center_y = cell_size * 1.5 * cell_r
+        return center_y, center_x / scale
+
+    return _cell_table(keys, positive, centers)
+
+
+def prepare_map_data(data, mode='auto', zoom=None, center=None, max_points=MAX_POINTS, max_cells=MAX_CELLS):
+    """
+    Capa acotada para dibujar en el mapa.
+
+    Con un zoom explícito solo se consideran los puntos del área visible
+    (viewport_mask): al acercarse, las celdas se achican y la muestra de puntos
+    se concentra en la zona mirada, sin superar max_cells ni max_points.
+
+    Args:
+        data: Filas con georeferencia_X (latitud), georeferencia_Y (longitud) y viv_positiva
+        mode: 'auto' (puntos si caben en max_points, si no hexágonos), 'points', 'grid' o 'hexbin'
+        zoom: Zoom del mapa para el nivel de detalle (None: encuadre de todos los puntos)
+        center: Centro (lat, lon) del mapa (None: centro de los puntos)
+        max_points: Máximo de puntos individuales
+        max_cells: Máximo de celdas agregadas; si se supera, las celdas se agrandan
+
+    Returns:
+        Diccionario con mode, zoom, center (lat, lon), total_points (puntos en el
+        área) y, según el modo, 'points' (posiciones de data a dibujar) o 'cells'
+        (DataFrame con CELL_COLUMNS); None si no hay coordenadas válidas en el área
+    """
+    if mode not in MAP_MODES:
+        raise ValueError(f"Modo de mapa no soportado: {mode}")
+
+    positions, lat, lon, positive = map_coordinates(data)
+    if len(positions) == 0:
+        return None
+
+    if center is None:
+        center = (float(lat.mean()), float(lon.mean()))
+    if zoom is None:
+        zoom = fit_zoom(lat, lon)
+    else:
+        visible = viewport_mask(lat, lon, center, zoom)
+        positions, lat, lon, positive = positions[visible], lat[visible], lon[visible], positive[visible]
+        if len(positions) == 0:
+            return None
+    if mode == 'auto':
+        mode = 'points' if len(positions) <= max_points else 'hexbin'
+
+    layer = {
+        'mode': mode,
+        'zoom': zoom,
+        'center': center,
+        'total_points': len(positions)
+    }
+
+    if mode == 'points':
+        layer['points'] = positions[sample_points(positive, max_points)]
+        return layer
+
+    # Nivel de detalle: celdas del tamaño de CELL_PIXELS al zoom de referencia,
+    # duplicadas mientras superen max_cells
+    aggregate = aggregate_grid if mode == 'grid' else aggregate_hexbin
+    cell_size = cell_size_for_zoom(zoom)
+    cells = aggregate(lat, lon, positive, cell_size)
+    while len(cells) > max_cells:
+        cell_size *= 2
+        cells = aggregate(lat, lon, positive, cell_size)
+    layer['cells'] = cells
+    layer['cell_size'] = cell_size
+    return layer
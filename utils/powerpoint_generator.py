@@ -30,20 +30,33 @@ class PowerPointGenerator:
             }
         }
     
-    def generate_presentation(self, filtered_data):
-        """Genera una presentación PowerPoint con datos organizados por redes de salud"""
+    def generate_presentation(self, filtered_data, progress=None):
+        """
+        Genera una presentación PowerPoint con datos organizados por redes de salud
+        
+        Args:
+            filtered_data: Filas filtradas de la pestaña
+            progress: Función opcional progress(fracción, mensaje) llamada antes de cada paso
+                      (Job.report cuando la presentación se genera en segundo plano)
+        """
+        if progress is None:
+            progress = lambda fraction, message: None
+        steps = len(self.health_networks) + 2
         
         # Crear presentación
         prs = Presentation()
         
         # Diapositiva de título
+        progress(0 / steps, "Diapositiva de título")
         self._add_title_slide(prs, filtered_data)
         
         # Diapositiva resumen general
+        progress(1 / steps, "Resumen general")
         self._add_summary_slide(prs, filtered_data)
         
         # Diapositivas por red de salud
-        for network_name, network_data in self.health_networks.items():
+        for step, (network_name, network_data) in enumerate(self.health_networks.items(), start=2):
+            progress(step / steps, network_name)
             network_filtered_data = self._filter_data_by_network(filtered_data, network_data["establecimientos"])
             if not network_filtered_data.empty:
                 self._add_network_slide(prs, network_name, network_data, network_filtered_data)
@@ -198,39 +211,17 @@ class PowerPointGenerator:
         total_viviendas = len(data[data['atencion_vivienda_indicador'] == 1])
         consumo_total = data['consumo_larvicida'].sum()
         
-        # Obtener todas las columnas de contenedores organizadas por tipo
-        container_types = self.data_processor.get_container_columns()
+        # Totales de recipientes tipo × estado en una sola reducción sobre el bloque
+        container_totals = self.data_processor.get_container_totals(data)
         
         # Contenedores tratados (suma de todos los tratamientos)
-        treated_columns = []
-        inspected_columns = []
-        positive_columns = []
-        
-        for container_type_cols in container_types.values():
-            for col in container_type_cols:
-                if col.endswith('_TQ') or col.endswith('_TF'):
-                    treated_columns.append(col)
-                elif col.endswith('_I'):
-                    inspected_columns.append(col)
-                elif col.endswith('_P'):
-                    positive_columns.append(col)
-        
-        contenedores_tratados = 0
-        for col in treated_columns:
-            if col in data.columns:
-                contenedores_tratados += data[col].sum()
+        contenedores_tratados = container_totals[['_TQ', '_TF']].to_numpy().sum()
         
         # Total inspeccionados
-        total_inspeccionados = 0
-        for col in inspected_columns:
-            if col in data.columns:
-                total_inspeccionados += data[col].sum()
+        total_inspeccionados = container_totals['_I'].sum()
         
         # Total positivos
-        total_positivos = 0
-        for col in positive_columns:
-            if col in data.columns:
-                total_positivos += data[col].sum()
+        total_positivos = container_totals['_P'].sum()
         
         inspectores_activos = data['usuario_registra'].nunique()
         
@@ -267,40 +258,17 @@ class PowerPointGenerator:
         consumo_total = network_data['consumo_larvicida'].sum()
         inspectores_activos = network_data['usuario_registra'].nunique()
         
-        # Obtener todas las columnas de contenedores organizadas por tipo
-        container_types = self.data_processor.get_container_columns()
-        
-        # Separar columnas por tipo
-        treated_columns = []
-        inspected_columns = []
-        positive_columns = []
-        
-        for container_type_cols in container_types.values():
-            for col in container_type_cols:
-                if col.endswith('_TQ') or col.endswith('_TF'):
-                    treated_columns.append(col)
-                elif col.endswith('_I'):
-                    inspected_columns.append(col)
-                elif col.endswith('_P'):
-                    positive_columns.append(col)
+        # Totales de recipientes tipo × estado en una sola reducción sobre el bloque
+        container_totals = self.data_processor.get_container_totals(network_data)
         
         # Contenedores tratados
-        contenedores_tratados = 0
-        for col in treated_columns:
-            if col in network_data.columns:
-                contenedores_tratados += network_data[col].sum()
+        contenedores_tratados = container_totals[['_TQ', '_TF']].to_numpy().sum()
         
         # Total inspeccionados
-        total_inspeccionados = 0
-        for col in inspected_columns:
-            if col in network_data.columns:
-                total_inspeccionados += network_data[col].sum()
+        total_inspeccionados = container_totals['_I'].sum()
         
         # Total positivos
-        total_positivos = 0
-        for col in positive_columns:
-            if col in network_data.columns:
-                total_positivos += network_data[col].sum()
+        total_positivos = container_totals['_P'].sum()
         
         # Cobertura promedio para la red
         cobertura_promedio = 0
@@ -346,14 +314,22 @@ class PowerPointGenerator:
                     })
         return details
     
-    def save_presentation(self, presentation, filename="reporte_vigilancia.pptx"):
-        """Guarda la presentación"""
+    def save_presentation(self, presentation, filename="reporte_vigilancia.pptx", tag=None):
+        """
+        Guarda la presentación
+        
+        Args:
+            presentation: Presentación generada
+            tag: Sufijo opcional del nombre (p.ej. el id del trabajo) para que dos
+                 presentaciones guardadas en el mismo segundo no se sobrescriban
+        """
         # Crear directorio de reportes si no existe
         os.makedirs("reportes", exist_ok=True)
         
         # Generar nombre único con timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"reportes/reporte_vigilancia_{timestamp}.pptx"
+        suffix = f"_{tag}" if tag else ""
+        unique_filename = f"reportes/reporte_vigilancia_{timestamp}{suffix}.pptx"
         
         presentation.save(unique_filename)
         return unique_filename
\ No newline at end of file
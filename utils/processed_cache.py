@@ -0,0 +1,215 @@
+"""
+Caché local en disco de datos ya procesados
+Guarda el DataFrame resultante de DataProcessor.process_data en Parquet,
+indexado por el hash del archivo subido, con desalojo LRU por tamaño
+"""
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils import csv_ingestion, schema
+from utils.data_processor import DataProcessor
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'processed')
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+
+# Bloque de lectura para calcular el hash sin cargar el archivo completo en memoria
+HASH_BLOCK_SIZE = 8 * 1024 * 1024  # 8MB
+
+# Parquet requiere pyarrow; sin él la caché queda deshabilitada
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+
+def _compute_processing_version():
+    """
+    Huella del código que produce los datos procesados.
+
+    Cambia cuando se modifica la lectura del CSV, el esquema de tipos o
+    DataProcessor.process_data, invalidando automáticamente las entradas previas.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"schema-v{schema.SCHEMA_VERSION}".encode())
+    for source in (inspect.getsource(csv_ingestion),
+                   inspect.getsource(schema),
+                   inspect.getsource(DataProcessor.process_data)):
+        digest.update(source.encode())
+    return digest.hexdigest()[:12]
+
+
+PROCESSING_VERSION = _compute_processing_version()
+
+
+class ProcessedDataCache:
+    """Caché de DataFrames procesados con desalojo LRU acotado por tamaño en disco"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = PROCESSING_VERSION
+        self.enabled = PARQUET_AVAILABLE
+
+        if self.enabled:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"Caché de datos deshabilitada: {e}")
+                self.enabled = False
+
+    @staticmethod
+    def compute_key(file_obj):
+        """
+        Calcula el hash SHA-256 del contenido del archivo leyendo por bloques.
+
+        Args:
+            file_obj: Objeto tipo archivo en modo binario
+
+        Returns:
+            Hash hexadecimal del contenido
+        """
+        digest = hashlib.sha256()
+        file_obj.seek(0)
+        while True:
+            block = file_obj.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+        file_obj.seek(0)
+        return digest.hexdigest()
+
+    def _entry_paths(self, key):
+        """Rutas del archivo Parquet y de sus metadatos para una clave"""
+        base = os.path.join(self.cache_dir, f"{key}_{self.version}")
+        return base + '.parquet', base + '.json'
+
+    def get(self, key):
+        """
+        Obtiene un DataFrame procesado de la caché.
+
+        Returns:
+            Tupla (DataFrame, metadatos) o None si no existe una entrada vigente
+        """
+        if not self.enabled:
+            return None
+
+        data_path, meta_path = self._entry_paths(key)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            data = pd.read_parquet(data_path)
+        except Exception as e:
+            print(f"Entrada de caché inválida, se descarta: {e}")
+            self._remove_entry(data_path)
+            return None
+
+        # Marcar como usada recientemente para el orden LRU
+        now = time.time()
+        os.utime(data_path, (now, now))
+        return data, metadata
+
+    def put(self, key, data, metadata=None):
+        """
+        Guarda un DataFrame procesado y aplica el límite de tamaño.
+
+        Returns:
+            True si la entrada se guardó correctamente
+        """
+        if not self.enabled:
+            return False
+
+        data_path, meta_path = self._entry_paths(key)
+        metadata = dict(metadata or {})
+        metadata.update({
+            'processing_version': self.version,
+            'rows': len(data),
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+
+        # Escritura a archivo temporal y renombrado atómico: otra sesión nunca lee una entrada a medias
+        tmp_suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_data_path = f"{data_path}.{tmp_suffix}"
+        tmp_meta_path = f"{meta_path}.{tmp_suffix}"
+        try:
+            data.to_parquet(tmp_data_path, index=False)
+            with open(tmp_meta_path, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, ensure_ascii=False, default=str)
+            os.replace(tmp_data_path, data_path)
+            os.replace(tmp_meta_path, meta_path)
+        except Exception as e:
+            print(f"No se pudo guardar en caché: {e}")
+            for path in (tmp_data_path, tmp_meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return False
+
+        self.evict()
+        return True
+
+    def _list_entries(self):
+        """Lista (ruta, tamaño, último uso) de los archivos Parquet en caché"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.parquet'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _remove_entry(self, data_path):
+        """Elimina una entrada (datos y metadatos)"""
+        meta_path = data_path[:-len('.parquet')] + '.json'
+        for path in (data_path, meta_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Elimina entradas de versiones anteriores y las menos usadas hasta respetar max_bytes"""
+        if not self.enabled:
+            return
+
+        current = []
+        for path, size, last_used in self._list_entries():
+            if not path.endswith(f"_{self.version}.parquet"):
+                self._remove_entry(path)
+            else:
+                current.append((path, size, last_used))
+
+        total = sum(size for _, size, _ in current)
+        for path, size, _ in sorted(current, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            self._remove_entry(path)
+            total -= size
+
+    def clear(self):
+        """Vacía la caché completa"""
+        if not self.enabled:
+            return
+        for path, _, _ in self._list_entries():
+            self._remove_entry(path)
+
+    def get_stats(self):
+        """Resumen del uso de la caché"""
+        if not self.enabled:
+            return {'enabled': False, 'entries': 0, 'size_bytes': 0, 'version': self.version}
+        entries = self._list_entries()
+        return {
+            'enabled': True,
+            'entries': len(entries),
+            'size_bytes': sum(size for _, size, _ in entries),
+            'version': self.version
+        }
@@ -0,0 +1,253 @@
+"""
+Registro versionado del esquema de 91 columnas de los CSV de inspección
+Define tipos compactos por columna y reporta las conversiones aplicadas
+"""
+import numpy as np
+import pandas as pd
+
+SCHEMA_VERSION = 1
+
+# Tipo de destino por clase de columna (None = se conserva el tipo inferido por pandas)
+KIND_DTYPES = {
+    'flag': 'int8',          # Indicadores 0/1 y códigos de estado 1-4
+    'counter': 'uint16',     # Conteos de recipientes, residentes y febriles
+    'category': 'category',  # Textos con pocos valores distintos (geografía, actividad)
+    'decimal': None,         # Se mantiene float64 para no perder precisión en sumas
+    'coordinate': None,      # Coordenadas geográficas en float64
+    'datetime': None,        # Se convierten en DataProcessor.process_data
+    'text': None,
+    'numeric': None          # Identificadores y códigos numéricos
+}
+
+CONTAINER_COUNTER_COLUMNS = [
+    'tanque_alto_I', 'tanque_alto_P', 'tanque_alto_TQ', 'tanque_alto_TF',
+    'tanque_bajo_I', 'tanque_bajo_P', 'tanque_bajo_TQ', 'tanque_bajo_TF',
+    'barril_cilindro_I', 'barril_cilindro_P', 'barril_cilindro_TQ', 'barril_cilindro_TF',
+    'sanson_bidon_I', 'sanson_bidon_P', 'sanson_bidon_TQ', 'sanson_bidon_TF',
+    'baldes_bateas_tinajas_I', 'baldes_bateas_tinajas_P', 'baldes_bateas_tinajas_TQ', 'baldes_bateas_tinajas_TF',
+    'llantas_I', 'llantas_P', 'llantas_TQ', 'llantas_TF',
+    'floreros_maceteros_I', 'floreros_maceteros_P', 'floreros_maceteros_TQ', 'floreros_maceteros_TF',
+    'latas_botellas_I', 'latas_botellas_D', 'latas_botellas_P', 'latas_botellas_TQ', 'latas_botellas_TF',
+    'otros_I', 'otros_P', 'otros_TQ', 'otros_TF', 'otros_D',
+    'inservibles_I', 'inservibles_P', 'inservibles_TQ', 'inservibles_TF'
+]
+
+# Versión 1: los 91 campos documentados del export de inspecciones, en orden de archivo
+INSPECTION_SCHEMA_V1 = {
+    '_id_x': 'numeric',
+    '_uid': 'text',
+    '_createdAt_x': 'datetime',
+    'sector': 'text',
+    'fecha_inspeccion': 'datetime',
+    'nombre_inspector': 'text',
+    'tipoActividadInspeccion': 'category',
+    'hora_ingreso': 'datetime',
+    'hora_salida': 'datetime',
+    'usuario_registra': 'numeric',
+    'estado_inspeccion': 'text',
+    'estado_x': 'numeric',
+    'nombre_de_la_inspeccion': 'numeric',
+    'localidad_eess': 'category',
+    '_id_y': 'numeric',
+    '_createdAt_y': 'datetime',
+    'fidInspeccion': 'text',
+    'georeferencia_X': 'coordinate',
+    'georeferencia_Y': 'coordinate',
+    'codigo_manzana': 'text',
+    'dirección': 'text',
+    'persona_atiende': 'text',
+    'numero_residentes': 'counter',
+    'tanque_alto_I': 'counter',
+    'tanque_alto_P': 'counter',
+    'tanque_alto_TQ': 'counter',
+    'tanque_alto_TF': 'counter',
+    'tanque_bajo_I': 'counter',
+    'tanque_bajo_P': 'counter',
+    'tanque_bajo_TQ': 'counter',
+    'tanque_bajo_TF': 'counter',
+    'barril_cilindro_I': 'counter',
+    'barril_cilindro_P': 'counter',
+    'barril_cilindro_TQ': 'counter',
+    'barril_cilindro_TF': 'counter',
+    'sanson_bidon_I': 'counter',
+    'sanson_bidon_P': 'counter',
+    'sanson_bidon_TQ': 'counter',
+    'sanson_bidon_TF': 'counter',
+    'baldes_bateas_tinajas_I': 'counter',
+    'baldes_bateas_tinajas_P': 'counter',
+    'baldes_bateas_tinajas_TQ': 'counter',
+    'llantas_I': 'counter',
+    'llantas_P': 'counter',
+    'llantas_TQ': 'counter',
+    'llantas_TF': 'counter',
+    'floreros_maceteros_I': 'counter',
+    'floreros_maceteros_P': 'counter',
+    'latas_botellas_P': 'counter',
+    'latas_botellas_TQ': 'counter',
+    'latas_botellas_TF': 'counter',
+    'otros_I': 'counter',
+    'otros_P': 'counter',
+    'otros_TQ': 'counter',
+    'otros_TF': 'counter',
+    'otros_D': 'counter',
+    'consumo_larvicida': 'decimal',
+    'febriles': 'counter',
+    'atencion_vivienda_indicador': 'flag',
+    'usuario_registro': 'numeric',
+    'estado_y': 'numeric',
+    'baldes_bateas_tinajas_TF': 'counter',
+    'floreros_maceteros_TQ': 'counter',
+    'floreros_maceteros_TF': 'counter',
+    'latas_botellas_I': 'counter',
+    'latas_botellas_D': 'counter',
+    'viv_positiva': 'flag',
+    'fecha_creacion': 'datetime',
+    'nombreFamilia': 'text',
+    'referencia': 'text',
+    'usuario_asignado': 'text',
+    'inservibles_I': 'counter',
+    'inservibles_P': 'counter',
+    'inservibles_TQ': 'counter',
+    'inservibles_TF': 'counter',
+    'recuperacion_fecha': 'datetime',
+    'recuperacion_fecha_asignacion': 'datetime',
+    'recuperacion_usuario_asignado': 'text',
+    'recuperacion_vivienda_indicador_ini': 'decimal',
+    'recuperacion_X': 'coordinate',
+    'recuperacion_Y': 'coordinate',
+    'recuperada': 'flag',
+    'cod_renipress': 'numeric',
+    'ubigeo': 'numeric',
+    'cod_dep': 'numeric',
+    'departamento_x': 'category',
+    'departamento_y': 'numeric',
+    'nombre_prov': 'category',
+    'cod_prov': 'numeric',
+    'provincia': 'numeric',
+    'distrito': 'category'
+}
+
+SCHEMAS = {
+    1: INSPECTION_SCHEMA_V1
+}
+
+
+def get_schema(version=SCHEMA_VERSION):
+    """Obtiene el esquema {columna: clase} de una versión registrada"""
+    if version not in SCHEMAS:
+        raise ValueError(f"Versión de esquema no registrada: {version}")
+    return SCHEMAS[version]
+
+
+def _coerce_integer(series, dtype):
+    """
+    Convierte una serie a un entero compacto solo si la conversión no pierde información.
+
+    Returns:
+        Tupla (serie convertida o None, motivo si no se convirtió)
+    """
+    if not pd.api.types.is_numeric_dtype(series):
+        numeric = pd.to_numeric(series, errors='coerce')
+        if numeric.isna().sum() > series.isna().sum():
+            return None, "valores no numéricos"
+        series = numeric
+
+    # Los nulos se rellenan con 0 igual que en DataProcessor.process_data
+    values = series.fillna(0).to_numpy()
+    info = np.iinfo(dtype)
+
+    if len(values) > 0:
+        if values.min() < info.min or values.max() > info.max:
+            return None, f"valores fuera de rango para {dtype}"
+        if values.dtype.kind == 'f' and not np.array_equal(values, np.floor(values)):
+            return None, "valores decimales"
+
+    return pd.Series(values.astype(dtype), index=series.index, name=series.name), None
+
+
+def _coerce_category(series):
+    """Convierte una columna de texto a categórica rellenando nulos con cadena vacía"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series, None
+    return series.fillna('').astype(str).astype('category'), None
+
+
+def apply_schema(data, version=SCHEMA_VERSION):
+    """
+    Aplica los tipos compactos del esquema a un DataFrame.
+
+    Args:
+        data: DataFrame leído del CSV (se modifica en el lugar)
+        version: Versión del esquema a aplicar
+
+    Returns:
+        Tupla (DataFrame, reporte) donde el reporte contiene:
+            version, coerced {columna: 'origen → destino'},
+            skipped {columna: motivo}, missing [columnas], extra [columnas]
+    """
+    schema = get_schema(version)
+    report = {
+        'version': version,
+        'coerced': {},
+        'skipped': {},
+        'missing': [col for col in schema if col not in data.columns],
+        'extra': [col for col in data.columns if col not in schema]
+    }
+
+    for col, kind in schema.items():
+        target = KIND_DTYPES.get(kind)
+        if target is None or col not in data.columns:
+            continue
+
+        original_dtype = str(data[col].dtype)
+        if original_dtype == target:
+            continue
+
+        if target == 'category':
+            converted, reason = _coerce_category(data[col])
+        else:
+            converted, reason = _coerce_integer(data[col], target)
+
+        if converted is None:
+            report['skipped'][col] = reason
+        else:
+            data[col] = converted
+            report['coerced'][col] = f"{original_dtype} → {target}"
+
+    return data, report
+
+
+class SchemaCoercer:
+    """Aplica el esquema bloque a bloque durante la ingesta y acumula un reporte único"""
+
+    def __init__(self, version=SCHEMA_VERSION):
+        self.version = version
+        self._coerced = {}
+        self._skipped = {}
+        self._missing = None
+        self._extra = None
+
+    def coerce(self, chunk):
+        """Convierte un bloque; pensado como chunk_transform de load_csv_in_chunks"""
+        chunk, chunk_report = apply_schema(chunk, self.version)
+
+        if self._missing is None:
+            self._missing = chunk_report['missing']
+            self._extra = chunk_report['extra']
+
+        self._skipped.update(chunk_report['skipped'])
+        for col, change in chunk_report['coerced'].items():
+            self._coerced.setdefault(col, change)
+
+        return chunk
+
+    @property
+    def report(self):
+        """Reporte consolidado: una columna omitida en cualquier bloque no cuenta como convertida"""
+        return {
+            'version': self.version,
+            'coerced': {col: change for col, change in self._coerced.items() if col not in self._skipped},
+            'skipped': dict(self._skipped),
+            'missing': list(self._missing or []),
+            'extra': list(self._extra or [])
+        }
@@ -0,0 +1,224 @@
+"""
+Índice espacial de inspecciones
+Cuadrícula uniforme en NumPy sobre georeferencia_X (latitud) y georeferencia_Y
+(longitud), construida una vez por dataset. Responde consultas por radio, por
+rectángulo y de k vecinos más cercanos, y el cruce por lotes de "viviendas
+alrededor de cada positiva" del cerco, revisando solo las celdas cercanas en
+lugar de recorrer todo el dataset
+"""
+import numpy as np
+import pandas as pd
+
+from utils.map_preparation import map_coordinates
+
+# Radio medio de la Tierra (m)
+EARTH_RADIUS_M = 6371000.0
+
+# Lado de las celdas de la cuadrícula (m)
+DEFAULT_CELL_SIZE_M = 200.0
+
+PAIR_COLUMNS = ['posicion_positiva', 'posicion_vecina', 'distancia_m']
+
+
+class SpatialIndex:
+    """Cuadrícula uniforme de las filas con coordenadas válidas"""
+
+    def __init__(self, data, cell_size_m=DEFAULT_CELL_SIZE_M):
+        """
+        Args:
+            data: DataFrame procesado por DataProcessor
+            cell_size_m: Lado de las celdas en metros
+        """
+        self.cell_size = float(cell_size_m)
+        self.size = len(data)
+
+        # Las mismas coordenadas válidas que se dibujan en el mapa
+        if 'georeferencia_X' in data.columns and 'georeferencia_Y' in data.columns:
+            positions, lat, lon, _ = map_coordinates(data)
+        else:
+            positions, lat, lon = np.array([], dtype=np.int64), np.array([]), np.array([])
+
+        # Proyección equirectangular local (metros) centrada en la latitud media:
+        # error despreciable a la escala de una región
+        self.reference_lat = float(lat.mean()) if len(lat) else 0.0
+        self._lon_scale = np.cos(np.radians(self.reference_lat))
+        x, y = self.project(lat, lon)
+
+        self.origin = (float(x.min()), float(y.min())) if len(x) else (0.0, 0.0)
+        cells_x, cells_y = self._cell_coordinates(x, y)
+        self.width = int(cells_x.max()) + 1 if len(x) else 1
+        keys = cells_y * self.width + cells_x
+
+        # Filas ordenadas por celda: cada celda es un tramo contiguo
+        order = np.argsort(keys, kind='stable')
+        self.positions = positions[order].astype(np.int64)
+        self.x = x[order]
+        self.y = y[order]
+        self.cell_keys, self.cell_starts = np.unique(keys[order], return_index=True)
+        self.cell_starts = self.cell_starts.astype(np.int64)
+        self.cell_ends = np.append(self.cell_starts[1:], len(order)).astype(np.int64)
+
+    def __len__(self):
+        """Cantidad de filas indexadas (con coordenadas válidas)"""
+        return len(self.positions)
+
+    def project(self, lat, lon):
+        """Convierte latitud/longitud (grados) a metros en la proyección local"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        return (EARTH_RADIUS_M * np.radians(lon) * self._lon_scale,
+                EARTH_RADIUS_M * np.radians(lat))
+
+    def _cell_coordinates(self, x, y):
+        """Columna y fila de celda de puntos proyectados"""
+        return (np.floor((x - self.origin[0]) / self.cell_size).astype(np.int64),
+                np.floor((y - self.origin[1]) / self.cell_size).astype(np.int64))
+
+    def _cell_ranges(self, cells_x, cells_y):
+        """Tramos [inicio, fin) de las celdas pedidas (vacíos si la celda no tiene filas)"""
+        cells_x = np.asarray(cells_x, dtype=np.int64)
+        cells_y = np.asarray(cells_y, dtype=np.int64)
+        starts = np.zeros(len(cells_x), dtype=np.int64)
+        ends = np.zeros(len(cells_x), dtype=np.int64)
+        if len(self.cell_keys) == 0:
+            return starts, ends
+        keys = cells_y * self.width + cells_x
+        found = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        present = (cells_x >= 0) & (cells_x < self.width) & (cells_y >= 0) & (self.cell_keys[found] == keys)
+        starts[present] = self.cell_starts[found[present]]
+        ends[present] = self.cell_ends[found[present]]
+        return starts, ends
+
+    @staticmethod
+    def _expand(starts, ends):
+        """Índices de todos los tramos concatenados y el tramo al que pertenece cada uno"""
+        counts = ends - starts
+        owners = np.repeat(np.arange(len(starts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(starts, counts) + offsets, owners
+
+    def _slots_in_box(self, x_min, x_max, y_min, y_max):
+        """Índices internos de las filas en las celdas que cubren un rectángulo proyectado"""
+        (cx0, cx1), (cy0, cy1) = self._cell_coordinates(np.array([x_min, x_max]), np.array([y_min, y_max]))
+        cx0, cy0 = max(cx0, 0), max(cy0, 0)
+        cx1 = min(cx1, self.width - 1)
+        if cx1 < cx0 or cy1 < cy0 or len(self) == 0:
+            return np.array([], dtype=np.int64)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cell_keys):
+            # Rectángulo grande: se filtran las celdas ocupadas en lugar de enumerar el rectángulo
+            occupied_x, occupied_y = self.cell_keys % self.width, self.cell_keys // self.width
+            inside = (occupied_x >= cx0) & (occupied_x <= cx1) & (occupied_y >= cy0) & (occupied_y <= cy1)
+            return self._expand(self.cell_starts[inside], self.cell_ends[inside])[0]
+        grid_x, grid_y = np.meshgrid(np.arange(cx0, cx1 + 1), np.arange(cy0, cy1 + 1))
+        starts, ends = self._cell_ranges(grid_x.ravel(), grid_y.ravel())
+        return self._expand(starts, ends)[0]
+
+    def query_radius(self, lat, lon, radius_m, return_distance=False):
+        """
+        Filas a menos de radius_m metros de un punto.
+
+        Returns:
+            Posiciones de fila (orden ascendente); con return_distance, tupla
+            (posiciones, distancias en metros)
+        """
+        x, y = self.project(lat, lon)
+        slots = self._slots_in_box(x - radius_m, x + radius_m, y - radius_m, y + radius_m)
+        distances = np.hypot(self.x[slots] - x, self.y[slots] - y)
+        keep = distances <= radius_m
+        positions, distances = self.positions[slots[keep]], distances[keep]
+        order = np.argsort(positions)
+        if return_distance:
+            return positions[order], distances[order]
+        return positions[order]
+
+    def query_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Filas dentro de un rectángulo de latitud/longitud (posiciones en orden ascendente)"""
+        x_min, y_min = self.project(lat_min, lon_min)
+        x_max, y_max = self.project(lat_max, lon_max)
+        slots = self._slots_in_box(x_min, x_max, y_min, y_max)
+        keep = (self.x[slots] >= x_min) & (self.x[slots] <= x_max) & (self.y[slots] >= y_min) & (self.y[slots] <= y_max)
+        return np.sort(self.positions[slots[keep]])
+
+    def query_knn(self, lat, lon, k=1):
+        """
+        Los k vecinos más cercanos a un punto.
+
+        Se revisan anillos de celdas crecientes hasta que el k-ésimo candidato
+        está más cerca que el borde del área revisada.
+
+        Returns:
+            Tupla (posiciones, distancias en metros) ordenada por distancia
+        """
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.array([], dtype=np.int64), np.array([])
+        x, y = self.project(lat, lon)
+        # Distancia del punto a la cuadrícula: los anillos empiezan donde hay celdas
+        grid_width = self.width * self.cell_size
+        grid_height = (self.cell_keys[-1] // self.width + 1) * self.cell_size
+        gap = np.hypot(max(self.origin[0] - x, 0, x - self.origin[0] - grid_width),
+                       max(self.origin[1] - y, 0, y - self.origin[1] - grid_height))
+        reach = gap + self.cell_size
+        while True:
+            slots = self._slots_in_box(x - reach, x + reach, y - reach, y + reach)
+            if len(slots) >= k:
+                distances = np.hypot(self.x[slots] - x, self.y[slots] - y)
+                nearest = np.argpartition(distances, k - 1)[:k]
+                # Correcto si el k-ésimo está dentro del círculo inscrito en el área revisada
+                if distances[nearest].max() <= reach or len(slots) == len(self):
+                    nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+                    return self.positions[slots[nearest]], distances[nearest]
+            reach *= 2
+
+    def pairs_within(self, center_positions, radius_m, candidates=None):
+        """
+        Cruce por lotes: filas a menos de radius_m de cada centro.
+
+        Args:
+            center_positions: Posiciones de fila de los centros (p.ej. viviendas positivas)
+            radius_m: Radio en metros
+            candidates: Máscara booleana (sobre todas las filas) de las vecinas admitidas;
+                        None admite todas las filas indexadas
+
+        Returns:
+            DataFrame con PAIR_COLUMNS ordenado por centro y distancia; cada centro
+            admitido como candidata aparece también como su propia vecina (distancia 0).
+            Los centros sin coordenadas no generan pares
+        """
+        center_positions = np.asarray(center_positions, dtype=np.int64)
+        lookup = np.full(self.size, -1, dtype=np.int64)
+        lookup[self.positions] = np.arange(len(self))
+        center_slots = lookup[center_positions] if len(center_positions) else np.array([], dtype=np.int64)
+        indexed = center_slots >= 0
+        center_positions, center_slots = center_positions[indexed], center_slots[indexed]
+        if len(center_slots) == 0:
+            return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype
+                                 in zip(PAIR_COLUMNS, ['int64', 'int64', 'float64'])})
+
+        center_x, center_y = self.x[center_slots], self.y[center_slots]
+        cells_x, cells_y = self._cell_coordinates(center_x, center_y)
+        reach = int(np.ceil(radius_m / self.cell_size))
+        if candidates is not None:
+            candidates = np.asarray(candidates, dtype=bool)
+
+        # Un desplazamiento de celda a la vez, vectorizado sobre todos los centros
+        found_centers, found_slots, found_distances = [], [], []
+        for dy in range(-reach, reach + 1):
+            for dx in range(-reach, reach + 1):
+                starts, ends = self._cell_ranges(cells_x + dx, cells_y + dy)
+                slots, owners = self._expand(starts, ends)
+                distances = np.hypot(self.x[slots] - center_x[owners], self.y[slots] - center_y[owners])
+                keep = distances <= radius_m
+                if candidates is not None:
+                    keep &= candidates[self.positions[slots]]
+                found_centers.append(owners[keep])
+                found_slots.append(slots[keep])
+                found_distances.append(distances[keep])
+
+        owners = np.concatenate(found_centers)
+        pairs = pd.DataFrame({
+            'posicion_positiva': center_positions[owners],
+            'posicion_vecina': self.positions[np.concatenate(found_slots)],
+            'distancia_m': np.concatenate(found_distances)
+        })
+        return pairs.sort_values(['posicion_positiva', 'distancia_m'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,130 @@
+"""
+Agregación de inspecciones por intervalos de tiempo
+Calcula en una sola pasada vectorizada, por mes, semana o semana epidemiológica
+(de cualquier tamaño), las viviendas inspeccionadas y positivas, los días
+trabajados, el consumo de larvicida y el índice aédico, sin modificar los datos
+de entrada
+"""
+import numpy as np
+import pandas as pd
+
+from utils.aggregation_cube import epidemiological_week, is_cube_cells
+
+# Frecuencias soportadas: meses calendario, semanas de lunes a domingo y
+# semanas epidemiológicas (domingo a sábado)
+FREQUENCIES = ('M', 'W', 'SE')
+
+# 1970-01-01 fue jueves: desplazamientos para que las semanas empiecen en lunes o domingo
+_WEEK_OFFSETS = {'W': 3, 'SE': 4}
+
+BUCKET_COLUMNS = ['inicio', 'fin', 'viviendas_inspeccionadas', 'viviendas_positivas',
+                  'dias_trabajados', 'consumo_larvicida', 'indice_aedico']
+
+
+def _daily_measures(data):
+    """
+    Reduce filas de inspección o celdas del cubo a arreglos por registro.
+
+    Returns:
+        Tupla (días desde 1970-01-01, inspeccionadas, positivas, larvicida) sin fechas nulas
+    """
+    if is_cube_cells(data):
+        dates = data['fecha']
+        inspected = data['viviendas_inspeccionadas'].to_numpy(dtype=np.int64)
+        positive = data['viviendas_positivas'].to_numpy(dtype=np.int64)
+    else:
+        dates = pd.to_datetime(data['fecha_inspeccion'], errors='coerce')
+        status = data['atencion_vivienda_indicador'].to_numpy() if 'atencion_vivienda_indicador' in data.columns else np.zeros(len(data))
+        is_inspected = status == 1
+        is_positive = data['viv_positiva'].to_numpy() == 1 if 'viv_positiva' in data.columns else np.zeros(len(data), dtype=bool)
+        inspected = is_inspected.astype(np.int64)
+        positive = (is_inspected & is_positive).astype(np.int64)
+
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_localize(None)
+    if 'consumo_larvicida' in data.columns:
+        larvicide = pd.to_numeric(data['consumo_larvicida'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    else:
+        larvicide = np.zeros(len(data))
+
+    valid = dates.notna().to_numpy()
+    days = dates.to_numpy(dtype='datetime64[ns]')[valid].astype('datetime64[D]').astype(np.int64)
+    return days, inspected[valid], positive[valid], larvicide[valid]
+
+
+def _bucket_codes(days, freq, size):
+    """Número de intervalo de cada día (anclado en 1970, estable ante cualquier filtro)"""
+    if freq == 'M':
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return months // size
+    return (days + _WEEK_OFFSETS[freq]) // (7 * size)
+
+
+def _bucket_bounds(codes, freq, size):
+    """Fecha de inicio y fin (inclusive) de cada intervalo"""
+    if freq == 'M':
+        start = (codes * size).astype('datetime64[M]')
+        end = ((codes + 1) * size).astype('datetime64[M]').astype('datetime64[D]') - 1
+        return pd.to_datetime(start.astype('datetime64[D]')), pd.to_datetime(end)
+    start_days = codes * 7 * size - _WEEK_OFFSETS[freq]
+    start = start_days.astype('datetime64[D]')
+    return pd.to_datetime(start), pd.to_datetime(start + 7 * size - 1)
+
+
+def aggregate_by_period(data, freq='M', size=1):
+    """
+    Agrega inspecciones por intervalos de tiempo.
+
+    Args:
+        data: Filas filtradas de DataProcessor o celdas del cubo de agregación
+        freq: 'M' (meses), 'W' (semanas de lunes a domingo) o 'SE' (semanas epidemiológicas)
+        size: Cantidad de meses o semanas por intervalo
+
+    Returns:
+        DataFrame ordenado por inicio con BUCKET_COLUMNS; para 'SE' incluye además
+        epi_year y epi_week del inicio de cada intervalo
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Frecuencia no soportada: {freq}")
+    size = int(size)
+    if size < 1:
+        raise ValueError("El tamaño del intervalo debe ser al menos 1")
+
+    date_column = 'fecha' if is_cube_cells(data) else 'fecha_inspeccion'
+    if date_column not in data.columns:
+        return pd.DataFrame(columns=BUCKET_COLUMNS)
+
+    days, inspected, positive, larvicide = _daily_measures(data)
+    if len(days) == 0:
+        return pd.DataFrame(columns=BUCKET_COLUMNS)
+
+    codes, bucket_index = np.unique(_bucket_codes(days, freq, size), return_inverse=True)
+    buckets = len(codes)
+    inspected_total = np.bincount(bucket_index, weights=inspected, minlength=buckets).astype(np.int64)
+    positive_total = np.bincount(bucket_index, weights=positive, minlength=buckets).astype(np.int64)
+    larvicide_total = np.bincount(bucket_index, weights=larvicide, minlength=buckets)
+
+    # Días distintos con registros: cada día pertenece a un único intervalo
+    unique_days = np.unique(days)
+    day_buckets = np.searchsorted(codes, _bucket_codes(unique_days, freq, size))
+    working_days = np.bincount(day_buckets, minlength=buckets)
+
+    aedic = np.where(inspected_total > 0, positive_total / np.maximum(inspected_total, 1) * 100, 0.0)
+
+    start, end = _bucket_bounds(codes, freq, size)
+    result = pd.DataFrame({
+        'inicio': start,
+        'fin': end,
+        'viviendas_inspeccionadas': inspected_total,
+        'viviendas_positivas': positive_total,
+        'dias_trabajados': working_days,
+        'consumo_larvicida': larvicide_total,
+        'indice_aedico': aedic
+    })
+
+    if freq == 'SE':
+        epi = epidemiological_week(result['inicio'])
+        result['epi_year'] = epi['epi_year']
+        result['epi_week'] = epi['epi_week']
+
+    return result
@@ -3,6 +3,8 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
 import pandas as pd
+import numpy as np
+from utils.map_preparation import MAP_PIXELS, MAX_POINTS, prepare_map_data
 
 class VisualizationHelper:
     def __init__(self):
@@ -277,8 +279,15 @@ class VisualizationHelper:
         
         return fig
     
-    def create_map_visualization(self, filtered_data):
-        """Create map visualization with georeferenced data"""
+    def create_map_visualization(self, filtered_data, mode='auto', max_points=MAX_POINTS, zoom=None, center=None):
+        """Create map visualization with georeferenced data
+        
+        The points are reduced server-side (utils.map_preparation): up to max_points
+        individual houses, positives first, or grid/hexagon cells with positive and
+        negative counts, so the figure payload stays bounded for any dataset size.
+        An explicit zoom (and optional center) limits the layer to the visible area
+        and refines the cells to that zoom.
+        """
         if filtered_data.empty or 'georeferencia_X' not in filtered_data.columns:
             return go.Figure().add_annotation(
                 text="No hay datos de georeferenciación disponibles",
@@ -286,44 +295,85 @@ class VisualizationHelper:
                 x=0.5, y=0.5, showarrow=False
             )
         
-        # Filter data with valid coordinates
-        map_data = filtered_data[
-            (filtered_data['georeferencia_X'].notna()) & 
-            (filtered_data['georeferencia_Y'].notna())
-        ].copy()
+        # Bounded layer: sampled points or aggregated cells
+        layer = prepare_map_data(filtered_data, mode=mode, zoom=zoom, center=center, max_points=max_points)
         
-        if map_data.empty:
+        if layer is None:
             return go.Figure().add_annotation(
-                text="No hay coordenadas válidas disponibles",
+                text="No hay coordenadas válidas disponibles" if zoom is None else "No hay coordenadas válidas en el área seleccionada",
                 xref="paper", yref="paper",
                 x=0.5, y=0.5, showarrow=False
             )
         
-        # Create color coding based on positive houses
-        map_data['color'] = map_data['viv_positiva'].map({0: 'green', 1: 'red'})
-        map_data['status'] = map_data['viv_positiva'].map({0: 'Negativa', 1: 'Positiva'})
-        
-        fig = px.scatter_mapbox(
-            map_data,
-            lat='georeferencia_X',
-            lon='georeferencia_Y',
-            color='status',
-            hover_data=['localidad_eess', 'direccion', 'persona_atiende'],
-            title='Distribución Geográfica de Inspecciones',
-            zoom=10,
-            height=600,
-            color_discrete_map={'Negativa': 'green', 'Positiva': 'red'}
-        )
+        title = 'Distribución Geográfica de Inspecciones'
+        fig = go.Figure()
+        
+        if layer['mode'] == 'points':
+            map_data = filtered_data.take(layer['points'])
+            positive = (map_data['viv_positiva'] == 1).to_numpy() if 'viv_positiva' in map_data.columns else np.zeros(len(map_data), dtype=bool)
+            hover_columns = [col for col in ['localidad_eess', 'direccion', 'persona_atiende'] if col in map_data.columns]
+            hover_values = map_data[hover_columns].astype(str).to_numpy() if hover_columns else None
+            hovertemplate = '<br>'.join(
+                [f"{col}=%{{customdata[{i}]}}" for i, col in enumerate(hover_columns)]
+                + ['lat=%{lat}', 'lon=%{lon}']
+            )
+            
+            # One WebGL trace per status with float32 coordinates (binary-encoded arrays)
+            for status, mask, color in [('Negativa', ~positive, 'green'), ('Positiva', positive, 'red')]:
+                if not mask.any():
+                    continue
+                fig.add_trace(go.Scattermapbox(
+                    lat=map_data['georeferencia_X'].to_numpy(dtype=np.float32)[mask],
+                    lon=map_data['georeferencia_Y'].to_numpy(dtype=np.float32)[mask],
+                    mode='markers',
+                    name=status,
+                    marker=dict(color=color, size=7),
+                    customdata=hover_values[mask] if hover_values is not None else None,
+                    hovertemplate=f"status={status}<br>{hovertemplate}<extra></extra>"
+                ))
+            
+            if len(map_data) < layer['total_points']:
+                title += f" (muestra de {len(map_data):,} de {layer['total_points']:,} puntos, positivas primero)"
+        else:
+            cells = layer['cells']
+            # Marker area proportional to the number of houses in the cell
+            sizes = 6 + 24 * np.sqrt(cells['total'] / cells['total'].max())
+            fig.add_trace(go.Scattermapbox(
+                lat=cells['lat'].to_numpy(dtype=np.float32),
+                lon=cells['lon'].to_numpy(dtype=np.float32),
+                mode='markers',
+                name='Viviendas',
+                marker=dict(
+                    size=sizes.to_numpy(dtype=np.float32),
+                    color=cells['positividad'].to_numpy(dtype=np.float32),
+                    colorscale='RdYlGn_r',
+                    cmin=0,
+                    cmax=100,
+                    opacity=0.7,
+                    colorbar=dict(title='% Positivas')
+                ),
+                customdata=cells[['total', 'positivas', 'negativas']].to_numpy(dtype=np.int32),
+                hovertemplate=(
+                    'Viviendas: %{customdata[0]}<br>'
+                    'Positivas: %{customdata[1]}<br>'
+                    'Negativas: %{customdata[2]}<br>'
+                    'Positividad: %{marker.color:.1f}%<extra></extra>'
+                )
+            ))
+            shape = 'celdas' if layer['mode'] == 'grid' else 'hexágonos'
+            title += f" ({layer['total_points']:,} puntos agregados en {len(cells):,} {shape})"
+        
+        fig.update_layout(title=title, height=MAP_PIXELS)
         
         # Enhanced map configuration with improved zoom controls
         fig.update_layout(
             mapbox_style="open-street-map",
             mapbox=dict(
                 center=dict(
-                    lat=map_data['georeferencia_X'].mean(),
-                    lon=map_data['georeferencia_Y'].mean()
+                    lat=layer['center'][0],
+                    lon=layer['center'][1]
                 ),
-                zoom=12
+                zoom=layer['zoom']
             ),
             margin={"r":0,"t":50,"l":0,"b":0},
             # Enable zoom controls